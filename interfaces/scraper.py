@@ -18,6 +18,6 @@ class Scraper(ABC):
             url (str): The URL to scrape content from.
         
         Returns:
-            str: The scraped content.
+            str: The HTML of the page. The article body is picked out of it before it is stored.
         """
         pass
@@ -3,12 +3,16 @@
 
 import sys
 import os
+import calendar
 import feedparser 
 # Add the project root directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from interfaces.url_fetcher import URLFetcher
 from utils.url_fetch_utils import process_feeds
+from utils.feed_state_utils import is_entry_seen, watermark_config
+from utils.content_extraction_utils import html_to_text, is_full_article_text
+from utils.fingerprint_utils import content_fingerprint
 
 class FeedparserFetcher(URLFetcher):
     def fetch_and_store_urls(self):
@@ -16,27 +20,85 @@ class FeedparserFetcher(URLFetcher):
         success = process_feeds(parse_feed=self.parse_feed, script_name=os.path.basename(__file__))
         return success
 
-    def parse_feed(self, feed_url):
+    def parse_feed(self, feed_source, watermark=None):
         """
-        Parse an RSS feed URL to extract entries.
+        Parse an RSS feed to extract entries, skipping the ones at or behind the feed's watermark.
 
         Args:
-            feed_url (str): The URL of the RSS feed to be parsed.
+            feed_source (str or bytes): The URL of the RSS feed, or the feed body already downloaded by process_feeds.
+            watermark (dict, optional): The feed's watermark from the previous poll.
+
+        Raises:
+            ValueError: If the feed is malformed and no entries could be read from it.
 
         Returns:
-            list: A list of entries from the RSS feed.
+            list: A list of new entries from the RSS feed, with 'content' set when the feed embeds the full article.
+                  '_published' and '_entry_id' are used for scheduling and watermarks and are not stored.
         """
-        newsfeed = feedparser.parse(feed_url)
-        entries = [
-            {
+        # feedparser parses the whole document whatever the watermark, so the watermark saves the per-entry work
+        # (text extraction and fingerprinting) on entries already handled, not the parse itself.
+        newsfeed = feedparser.parse(feed_source)
+        # feedparser doesn't raise on broken XML, so a feed it couldn't read at all is reported as an error here and counts against the feed's health.
+        if newsfeed.bozo and not newsfeed.entries:
+            raise ValueError(f"Malformed feed: {newsfeed.get('bozo_exception')}")
+        stop_after_known = watermark_config.get('stop_after_known_entries', 5)
+        # Only a newest-first feed can be cut short: in an oldest-first feed the new entries come after the known ones.
+        timestamps = [timestamp for timestamp in map(self.entry_timestamp, newsfeed.entries) if timestamp is not None]
+        newest_first = all(earlier >= later for earlier, later in zip(timestamps, timestamps[1:]))
+        entries = []
+        known_in_a_row = 0
+        for entry in newsfeed.entries:
+            if not entry.get('link'):
+                continue
+            published = self.entry_timestamp(entry)
+            entry_id = entry.get('id') or entry.get('link')
+            if is_entry_seen(watermark, entry_id, published):
+                known_in_a_row += 1
+                if newest_first and known_in_a_row >= stop_after_known:
+                    break
+                continue
+            known_in_a_row = 0
+            content = self.entry_content(entry)
+            entries.append({
                 'url': entry.get('link'),
                 'ArticleTitle': entry.get('title', 'No Title Provided'),
-                'scraped': False
-            }
-            for entry in newsfeed.entries if entry.get('link')
-        ]
+                # Entries that carry the full article are stored as already scraped, so they go straight to summarization.
+                'content': content,
+                'content_fingerprint': content_fingerprint(content),
+                'scraped': content is not None,
+                '_published': published,
+                '_entry_id': entry_id
+            })
         return entries
 
+    def entry_content(self, entry):
+        """
+        Get the full article text embedded in a feed entry, from its content:encoded body or a long summary.
+
+        Args:
+            entry (feedparser.FeedParserDict): The feed entry.
+
+        Returns:
+            str or None: The article text, or None if the entry only carries a teaser and the article needs scraping.
+        """
+        bodies = [content.get('value', '') for content in entry.get('content', [])]
+        bodies.append(entry.get('summary', ''))
+        text = max((html_to_text(body) for body in bodies if body), key=len, default='')
+        return text if is_full_article_text(text) else None
+
+    def entry_timestamp(self, entry):
+        """
+        Get the publish time of a feed entry, falling back to its update time.
+
+        Args:
+            entry (feedparser.FeedParserDict): The feed entry.
+
+        Returns:
+            int or None: The time as a Unix timestamp, or None if the entry has no usable date.
+        """
+        parsed_time = entry.get('published_parsed') or entry.get('updated_parsed')
+        return calendar.timegm(parsed_time) if parsed_time else None
+
 if __name__ == "__main__":
     fetcher = FeedparserFetcher()
     success = fetcher.fetch_and_store_urls()
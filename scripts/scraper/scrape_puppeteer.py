@@ -11,13 +11,25 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from interfaces.scraper import Scraper
 from utils.scraping_util import run_puppeteer_scraper
-from pyppeteer import launch
+from utils.browser_pool_utils import BrowserPool
+from utils.request_blocking_utils import RequestBlocker, javascript_disabled_for
+from utils.domain_limits_utils import scrape_time_left
 
 class PuppeteerScraper(Scraper):
     """
     Scraper implementation using Pyppeteer to scrape content from URLs.
     """
 
+    def __init__(self, browser_pool=None):
+        """
+        Initialize the scraper.
+
+        Args:
+            browser_pool (BrowserPool, optional): The pool to take pages from. A pool is created on first use if not given.
+        """
+        self.browser_pool = browser_pool
+        self.request_totals = {}
+
     async def scrape(self, url):
         """
         Scrape content from the given URL using Pyppeteer.
@@ -26,35 +38,72 @@ class PuppeteerScraper(Scraper):
             url (str): The URL to scrape content from.
         
         Returns:
-            str: The scraped content.
+            str: The rendered HTML of the page.
         """
         logger = logging.getLogger("PuppeteerScraper")
         logger.info(f"Starting scrape for URL: {url}")
-        browser = await launch(headless=True, args=["--no-sandbox", "--disable-setuid-sandbox"])
-        page = await browser.newPage()
-        try:
-            logger.info(f"Navigating to URL: {url}")
-            await page.goto(url, {'waitUntil': 'domcontentloaded', 'timeout': 10000})
-            logger.info(f"Page loaded for URL: {url}")
-        except Exception as e:
-            logger.error(f"Error navigating to URL {url}: {e}")
-            await browser.close()
-            raise e
-        try:
-            content = await page.evaluate('''() => document.body.innerText || "No content found"''')
-            logger.info(f"Content scraped for URL: {url}")
-        except Exception as e:
-            logger.error(f"Error evaluating page content for URL {url}: {e}")
-            await browser.close()
-            raise e
-        await browser.close()
+        if self.browser_pool is None:
+            self.browser_pool = BrowserPool()
+        blocker = RequestBlocker()
+        async with self.browser_pool.page() as page:
+            await blocker.attach(page)
+            if javascript_disabled_for(url):
+                logger.info(f"Loading {url} with JavaScript disabled")
+                await page.setJavaScriptEnabled(False)
+            try:
+                try:
+                    logger.info(f"Navigating to URL: {url}")
+                    # Navigation gets the time left of the domain's scrape timeout, keeping a second to read the page.
+                    goto_timeout = max(scrape_time_left(default=10) - 1, 1)
+                    await page.goto(url, {'waitUntil': 'domcontentloaded', 'timeout': int(goto_timeout * 1000)})
+                    logger.info(f"Page loaded for URL: {url}")
+                except Exception as e:
+                    logger.error(f"Error navigating to URL {url}: {e}")
+                    raise e
+                try:
+                    # Returns the rendered HTML rather than innerText, so scrape_record can pick out the article body.
+                    content = await page.content()
+                    logger.info(f"Content scraped for URL: {url}")
+                except Exception as e:
+                    logger.error(f"Error evaluating page content for URL {url}: {e}")
+                    raise e
+            finally:
+                self.record_request_stats(url, blocker.stats())
         return content
 
+    def record_request_stats(self, url, stats):
+        """
+        Log the requests loaded and blocked for a page and add them to the totals for the run.
+
+        Args:
+            url (str): The scraped URL.
+            stats (dict): The page's request counts from RequestBlocker.stats().
+        """
+        logger = logging.getLogger("PuppeteerScraper")
+        logger.info(
+            f"Requests for {url}: {stats['requests_loaded']} loaded ({stats['bytes_loaded'] / 1024:.0f} KB), "
+            f"{stats['requests_blocked']} blocked (~{stats['estimated_bytes_saved'] / 1024:.0f} KB saved)"
+        )
+        for key, value in stats.items():
+            self.request_totals[key] = self.request_totals.get(key, 0) + value
+
+    async def close(self):
+        """
+        Close the browsers in the pool, if one was started.
+        """
+        if self.browser_pool is not None:
+            await self.browser_pool.close()
+        if self.request_totals:
+            logging.getLogger("PuppeteerScraper").info(f"Request totals for this run: {self.request_totals}")
+
     async def run(self):
         """
         Run the scraping process for all URLs that need to be scraped.
         """
-        success = await run_puppeteer_scraper(self.scrape, script_name=os.path.basename(__file__))
+        try:
+            success = await run_puppeteer_scraper(self.scrape, script_name=os.path.basename(__file__))
+        finally:
+            await self.close()
         return success
     
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+# scripts/scraper/scrape_tiered.py
+# This script scrapes article content with a plain HTTP fetch, and only uses the Pyppeteer scraper for pages that need JavaScript.
+import sys
+import os
+import time
+import asyncio
+import logging
+import httpx
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from interfaces.scraper import Scraper
+from utils.scraping_util import run_puppeteer_scraper
+from utils.content_extraction_utils import html_to_text, looks_like_js_shell, static_scrape_config
+from utils.domain_state_utils import url_domain, get_domain_state, update_domain_state, domain_state_lock
+from utils.domain_limits_utils import scrape_time_left
+from scripts.scraper.scrape_puppeteer import PuppeteerScraper
+
+STATIC_TIER = "static"
+BROWSER_TIER = "browser"
+
+class TieredScraper(Scraper):
+    """
+    Scraper implementation that tries a static HTTP fetch before falling back to headless Chromium.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.browser_scraper = PuppeteerScraper()
+        self.logger = logging.getLogger("TieredScraper")
+
+    def get_client(self):
+        """
+        Return the shared HTTP client, creating it on first use so connections are reused across URLs.
+
+        Returns:
+            httpx.AsyncClient: The HTTP client.
+        """
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=static_scrape_config.get('timeout_seconds', 10),
+                follow_redirects=True,
+                headers={"User-Agent": static_scrape_config.get('user_agent', 'Mozilla/5.0 (compatible; article-summarizer/1.0)')},
+                limits=httpx.Limits(max_connections=static_scrape_config.get('max_connections', 20))
+            )
+        return self.client
+
+    def preferred_tier(self, domain):
+        """
+        Return the tier remembered for a domain. A remembered browser tier expires after static_scraping.tier_ttl_hours,
+        so domains that move to server-side rendering get another chance at the cheaper tier.
+
+        Args:
+            domain (str): The domain of the URL.
+
+        Returns:
+            str: "static" or "browser".
+        """
+        state = get_domain_state(domain)
+        if state.get('scrape_tier') == BROWSER_TIER:
+            age_hours = (time.time() - state.get('scrape_tier_set_at', 0)) / 3600
+            if age_hours < static_scrape_config.get('tier_ttl_hours', 168):
+                return BROWSER_TIER
+        return STATIC_TIER
+
+    async def scrape_static(self, url):
+        """
+        Fetch a page over plain HTTP and extract its text.
+
+        Args:
+            url (str): The URL to scrape content from.
+
+        Returns:
+            tuple: The page HTML (or None if the static page isn't usable), the reason it isn't usable,
+                   and whether that reason is that the page needs JavaScript to render its content.
+        """
+        # Leaves at least half of the domain's scrape timeout for the browser, in case the static page turns out not to be usable.
+        timeout = min(static_scrape_config.get('timeout_seconds', 10), scrape_time_left(default=20) / 2)
+        response = await self.get_client().get(url, timeout=timeout)
+        if response.status_code >= 400:
+            return None, f"HTTP {response.status_code}", False
+        if "html" not in response.headers.get('content-type', 'text/html'):
+            return None, f"content type {response.headers.get('content-type')}", False
+        html = response.text
+        text = html_to_text(html)
+        reason = looks_like_js_shell(html, text)
+        return (None, reason, True) if reason else (html, None, False)
+
+    def record_static_result(self, domain, needs_js):
+        """
+        Count a domain's static scrapes that needed JavaScript in a row, and move the domain to the browser tier
+        once there are static_scraping.browser_after_js_pages of them. A usable static page resets the count.
+
+        Args:
+            domain (str): The domain of the URL.
+            needs_js (bool): Whether the static page needed JavaScript to render its content.
+        """
+        with domain_state_lock:
+            state = get_domain_state(domain)
+            if not needs_js:
+                if state.get('scrape_tier') != STATIC_TIER or state.get('js_pages_in_a_row'):
+                    update_domain_state(domain, {"scrape_tier": STATIC_TIER, "scrape_tier_set_at": time.time(), "js_pages_in_a_row": 0})
+                return
+            js_pages = state.get('js_pages_in_a_row', 0) + 1
+            values = {"js_pages_in_a_row": js_pages}
+            if js_pages >= static_scrape_config.get('browser_after_js_pages', 3):
+                values.update({"scrape_tier": BROWSER_TIER, "scrape_tier_set_at": time.time(), "js_pages_in_a_row": 0})
+            update_domain_state(domain, values)
+
+    async def scrape(self, url):
+        """
+        Scrape content from the given URL, using the cheapest tier that works for its domain.
+
+        Args:
+            url (str): The URL to scrape content from.
+
+        Returns:
+            str: The HTML of the page.
+        """
+        domain = url_domain(url)
+        # Domain state is read and written in a thread, so a busy state database doesn't stall the other scrapes.
+        if await asyncio.to_thread(self.preferred_tier, domain) == STATIC_TIER:
+            try:
+                content, reason, needs_js = await self.scrape_static(url)
+            except Exception as e:
+                content, reason, needs_js = None, str(e), False
+            if content is not None or needs_js:
+                await asyncio.to_thread(self.record_static_result, domain, needs_js)
+            if content is not None:
+                self.logger.info(f"Scraped {url} without a browser")
+                return content
+            self.logger.info(f"Static scrape not usable for {url} ({reason}), falling back to the browser")
+
+        return await self.browser_scraper.scrape(url)
+
+    async def close(self):
+        """
+        Close the HTTP client and the browser pool.
+        """
+        if self.client is not None:
+            await self.client.aclose()
+        await self.browser_scraper.close()
+
+    async def run(self):
+        """
+        Run the scraping process for all URLs that need to be scraped.
+        """
+        try:
+            success = await run_puppeteer_scraper(self.scrape, script_name=os.path.basename(__file__))
+        finally:
+            await self.close()
+        return success
+
+if __name__ == "__main__":
+    scraper = TieredScraper()
+    success = asyncio.run(scraper.run())
+    sys.exit(0 if success else 1)
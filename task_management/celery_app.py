@@ -8,6 +8,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from celery import Celery, chain
 from celery.schedules import crontab
+from datetime import timedelta
 from config.config_loader import load_config
 import subprocess
 
@@ -16,6 +17,10 @@ config = load_config()
 # Initialize the Celery app with the broker URL from the configuration
 app = Celery('tasks', broker=config['celery']['broker_url'])
 
+# How often fetch_urls wakes up. Each run only polls the feeds that are due (see utils/feed_schedule_utils.py), so this is a tick rather than a poll interval.
+# It is scheduled as an interval rather than a crontab, since '*/N' minutes only divides the hour evenly for some N and fails for N of 60 or more.
+fetch_tick_minutes = config.get('feed_scheduling', {}).get('tick_minutes', 1)
+
 # Update Celery app configuration with result backend, serializers, timezone, and beat schedule
 app.conf.update(
     result_backend=config['celery']['result_backend'],
@@ -25,10 +30,10 @@ app.conf.update(
     timezone='UTC',
     enable_utc=True,
     beat_schedule={
-        # Runs fetch url task every 2 minutes
-        'fetch-urls-every-2-minutes': {
+        # Runs fetch url task every tick, which polls only the feeds that are due
+        'fetch-urls-every-tick': {
             'task': 'task_management.celery_app.fetch_urls',
-            'schedule': crontab(minute='*/2'),
+            'schedule': timedelta(minutes=fetch_tick_minutes),
         },
         # Sdds execute additional tasks (the remaining tasks) to a queue every 30 minutes
         'check-execute-additional-tasks-every-30-minutes': {
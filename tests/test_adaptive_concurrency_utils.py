@@ -0,0 +1,90 @@
+# tests/test_adaptive_concurrency_utils.py
+
+import threading
+from unittest.mock import patch
+from utils.adaptive_concurrency_utils import AdaptiveLimit, is_timeout_error
+
+SETTINGS = {"enabled": True, "min_limit": 1, "max_limit": 8, "decrease_factor": 0.5, "cooldown_seconds": 5,
+            "latency_tolerance": 2.0, "min_latency_samples": 5}
+
+def complete_calls(limit, count, elapsed=1.0, **outcome):
+    for _ in range(count):
+        limit.acquire()
+        limit.release(elapsed, **outcome)
+
+def test_limit_grows_additively_while_calls_succeed():
+    """
+    Test that the limit grows by one for each limit's worth of calls within the latency target, up to max_limit.
+    """
+    limit = AdaptiveLimit("groq", 4, SETTINGS)
+    complete_calls(limit, 4)
+    assert limit.stats()["limit"] == 4
+    complete_calls(limit, 1)
+    assert limit.stats()["limit"] == 5
+    complete_calls(limit, 200)
+    stats = limit.stats()
+    assert stats["limit"] == 8 and stats["increases"] == 4
+    assert stats["events"][-1]["reason"] == "calls within latency target"
+
+def test_limit_halved_on_rate_limit_once_per_cooldown():
+    """
+    Test that a 429 halves the limit, and overloads reported within the cooldown don't cut it again.
+    """
+    limit = AdaptiveLimit("groq", 8, SETTINGS)
+    with patch('utils.adaptive_concurrency_utils.time.monotonic', side_effect=[100.0, 101.0, 110.0]):
+        complete_calls(limit, 2, overloaded=True, succeeded=False)
+        assert limit.stats()["limit"] == 4
+        complete_calls(limit, 1, overloaded=True, succeeded=False)
+    stats = limit.stats()
+    assert stats["limit"] == 2 and stats["decreases"] == 2
+
+def test_limit_cut_when_latency_rises():
+    """
+    Test that a sustained rise in latency cuts the limit, while a single slow call and other errors leave it alone.
+    """
+    limit = AdaptiveLimit("gemini", 8, {**SETTINGS, "max_limit": 32, "latency_window": 3})
+    complete_calls(limit, 5, elapsed=1.0)
+    complete_calls(limit, 3, elapsed=0.5, succeeded=False)
+    before = limit.stats()["limit"]
+    complete_calls(limit, 1, elapsed=10.0)
+    assert limit.stats()["limit"] == before
+    complete_calls(limit, 2, elapsed=10.0)
+    assert limit.stats()["limit"] == before // 2
+    assert limit.stats()["events"][-1]["reason"].startswith("median latency")
+
+def test_long_calls_judged_per_token():
+    """
+    Test that calls of very different lengths at the same speed per token don't count as congestion.
+    """
+    limit = AdaptiveLimit("groq", 4, {**SETTINGS, "latency_window": 3})
+    for _ in range(10):
+        complete_calls(limit, 1, elapsed=1.0, tokens=500)
+        complete_calls(limit, 1, elapsed=16.0, tokens=8000)
+    stats = limit.stats()
+    assert stats["decreases"] == 0 and stats["limit"] > 4
+    assert stats["baseline_latency_seconds"] == 2.0
+
+def test_calls_wait_for_a_free_slot():
+    """
+    Test that no more calls than the limit are in flight at once.
+    """
+    limit = AdaptiveLimit("groq", 2, {**SETTINGS, "enabled": False})
+    limit.acquire()
+    limit.acquire()
+    third = threading.Thread(target=limit.acquire)
+    third.start()
+    third.join(timeout=0.1)
+    assert third.is_alive()
+    limit.release(1.0)
+    third.join(timeout=1)
+    assert not third.is_alive() and limit.stats()["in_flight"] == 2
+
+def test_timeouts_detected():
+    """
+    Test that timeouts are recognised from the exception type or message.
+    """
+    class APITimeoutError(Exception):
+        pass
+    assert is_timeout_error(APITimeoutError())
+    assert is_timeout_error(Exception("Request timed out."))
+    assert not is_timeout_error(ValueError("Error parsing Gemini response"))
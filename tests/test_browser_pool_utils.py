@@ -0,0 +1,76 @@
+# tests/test_browser_pool_utils.py
+
+import asyncio
+from unittest.mock import patch
+from utils.browser_pool_utils import BrowserPool, PooledBrowser
+
+class FakeBrowser:
+    process = None
+
+    def on(self, event, callback):
+        pass
+
+    async def createIncognitoBrowserContext(self):
+        return FakeContext()
+
+class FakeContext:
+    async def newPage(self):
+        return object()
+
+    async def close(self):
+        await asyncio.sleep(10)
+
+async def slow_launch(**kwargs):
+    await asyncio.sleep(10)
+
+def test_cancelled_launch_returns_the_slot():
+    """
+    Test that a scrape timing out while its browser launches doesn't take the slot out of the pool.
+    """
+    async def run():
+        pool = BrowserPool(size=1)
+        with patch('utils.browser_pool_utils.launch', side_effect=slow_launch):
+            for _ in range(3):
+                try:
+                    await asyncio.wait_for(pool.checkout_browser(), timeout=0.01)
+                except asyncio.TimeoutError:
+                    pass
+        return pool.available.qsize()
+    assert asyncio.run(run()) == 1
+
+def test_cancelled_context_close_returns_the_browser():
+    """
+    Test that a scrape timing out while its incognito context closes still returns the browser to the pool.
+    """
+    async def use_page(pool):
+        async with pool.page():
+            pass
+
+    async def run():
+        pool = BrowserPool(size=1)
+        async def launch(**kwargs):
+            return FakeBrowser()
+        with patch('utils.browser_pool_utils.launch', side_effect=launch):
+            try:
+                await asyncio.wait_for(use_page(pool), timeout=0.01)
+            except asyncio.TimeoutError:
+                pass
+        return pool.available.qsize()
+    assert asyncio.run(run()) == 1
+
+def test_memory_checked_every_few_pages():
+    """
+    Test that a browser's memory is only read from /proc once every memory_check_pages pages.
+    """
+    class Process:
+        pid = 1
+        def poll(self):
+            return None
+    browser = FakeBrowser()
+    browser.process = Process()
+    pooled_browser = PooledBrowser(browser)
+    with patch('utils.browser_pool_utils.process_tree_memory_mb', return_value=100) as memory:
+        for _ in range(25):
+            pooled_browser.pages_served += 1
+            assert pooled_browser.needs_recycling(0, 1024, 10) is None
+    assert memory.call_count == 2
@@ -0,0 +1,61 @@
+# tests/test_content_extraction_utils.py
+
+from utils.content_extraction_utils import extract_main_content, html_to_text, looks_like_js_shell, is_full_article_text, NON_TEXT_TAGS
+
+STORY = " ".join(["The council voted on Tuesday, after a long debate, to approve the new budget for the coming year."] * 3)
+
+PAGE = f"""
+<html><body>
+<div class="cookie-banner">We use cookies, and by using this site you agree to our cookie policy, privacy policy and terms.</div>
+<nav><a href="/">Home</a> <a href="/news">News</a></nav>
+<div id="wrapper">
+  <div class="menu"><a href="/a">Politics, elections and government</a> <a href="/b">Business, markets and the economy</a></div>
+  <article>
+    <div class="story-body">
+      <p>{STORY}</p>
+      <p>{STORY}</p>
+      <div class="related-links"><a href="/x">Related: the council's previous budget, which was approved last spring</a></div>
+      <p>{STORY}</p>
+    </div>
+  </article>
+  <section class="comments"><p>Great article, thanks for writing it, I agree with every word, really.</p></section>
+</div>
+<footer>Copyright 2024, all rights reserved, registered office, company number</footer>
+</body></html>
+"""
+
+def test_extract_main_content_keeps_only_the_article():
+    """
+    Test that the article paragraphs are kept and the banner, menus, related links, comments and footer are dropped.
+    """
+    text, sizes = extract_main_content(PAGE, {"min_extracted_chars": 100})
+    assert text.split("\n") == [STORY, STORY, STORY]
+    assert sizes["content_extracted_chars"] == len(text)
+    assert sizes["content_original_chars"] > sizes["content_extracted_chars"]
+
+def test_extract_main_content_falls_back_to_full_text():
+    """
+    Test that the page's full text is stored when extraction is disabled or finds too little.
+    """
+    full_text = html_to_text(PAGE, NON_TEXT_TAGS)
+    assert extract_main_content(PAGE, {"enabled": False})[0] == full_text
+    assert extract_main_content(PAGE, {"min_extracted_chars": 100000})[0] == full_text
+
+def test_js_shell_and_teaser_detection():
+    """
+    Test that empty app shells need a browser and short or "read more" feed text is treated as a teaser.
+    """
+    assert looks_like_js_shell('<div id="root"></div><p>Loading</p>', "Loading", min_chars=500) == "JavaScript shell"
+    assert looks_like_js_shell(PAGE, html_to_text(PAGE), min_chars=100) is None
+    assert is_full_article_text(STORY, {"min_chars": 100})
+    assert not is_full_article_text(STORY + " Read more", {"min_chars": 100, "truncation_markers": ["read more"]})
+    assert not is_full_article_text("Short teaser.", {"min_chars": 100})
+
+def test_unclosed_paragraphs_dont_nest():
+    """
+    Test that a page of thousands of unclosed <p> tags is extracted without hitting the recursion limit,
+    as each <p> closes the one before it.
+    """
+    html = f"<html><body><div class='menu'>Politics, business, sport</div><div class='story'>{('<p>' + STORY) * 3000}</div></body></html>"
+    text, _ = extract_main_content(html, {"min_extracted_chars": 100})
+    assert text.split("\n") == [STORY] * 3000
@@ -0,0 +1,51 @@
+# tests/test_domain_limits_utils.py
+
+import asyncio
+import pytest
+from unittest.mock import patch
+import utils.domain_state_utils as domain_state_utils
+from utils.domain_limits_utils import DomainRateLimiter, domain_scrape_timeout, record_scrape_time
+
+SETTINGS = {
+    "timeout_seconds": 20,
+    "timeout_multiplier": 1.5,
+    "min_timeout_seconds": 5,
+    "max_timeout_seconds": 45,
+    "latency_samples": 20,
+    "min_latency_samples": 5,
+}
+
+@pytest.fixture
+def local_state(tmp_path):
+    with patch.dict('utils.local_state_utils.local_state_config', {'path': str(tmp_path / 'state.db')}), \
+         patch.object(domain_state_utils, '_domain_states', None):
+        yield
+
+def test_timeout_follows_domain_p95_within_limits(local_state):
+    """
+    Test that domains get the default timeout until they have enough samples, then 1.5x their p95, capped at both ends.
+    """
+    assert domain_scrape_timeout("fast.example", SETTINGS) == 20
+    for _ in range(10):
+        record_scrape_time("fast.example", 1.0, settings=SETTINGS)
+        record_scrape_time("medium.example", 8.0, settings=SETTINGS)
+        record_scrape_time("slow.example", 40.0, timed_out=True, settings=SETTINGS)
+    assert domain_scrape_timeout("fast.example", SETTINGS) == 5
+    assert domain_scrape_timeout("medium.example", SETTINGS) == 12
+    assert domain_scrape_timeout("slow.example", SETTINGS) == 45
+    assert domain_state_utils.get_domain_state("slow.example")["scrape_timeouts"] == 10
+
+def test_rate_limiter_spaces_requests_after_burst():
+    """
+    Test that the first burst of requests to a domain start at once, later ones wait, and other domains are unaffected.
+    """
+    limiter = DomainRateLimiter({"requests_per_minute_per_domain": 600, "domain_burst": 2})
+
+    async def acquire_all():
+        waits = [await limiter.acquire("example.com") for _ in range(4)]
+        return waits, await limiter.acquire("other.example")
+
+    waits, other_wait = asyncio.run(acquire_all())
+    assert waits[:2] == [0, 0]
+    assert all(wait > 0 for wait in waits[2:])
+    assert other_wait == 0
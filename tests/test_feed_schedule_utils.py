@@ -0,0 +1,62 @@
+# tests/test_feed_schedule_utils.py
+
+from utils.feed_schedule_utils import is_feed_due, estimate_publish_interval, schedule_next_poll
+
+SETTINGS = {
+    "enabled": True,
+    "min_interval_minutes": 2,
+    "max_interval_minutes": 240,
+    "poll_fraction": 0.5,
+    "empty_poll_backoff": 1.5,
+    "jitter_fraction": 0,
+}
+
+NOW = 1_700_000_000
+
+def test_new_and_due_feeds_are_polled():
+    """
+    Test that feeds without a schedule, or whose next poll time has passed, are due.
+    """
+    assert is_feed_due({}, NOW, SETTINGS)
+    assert is_feed_due({"next_poll_at": NOW - 1}, NOW, SETTINGS)
+    assert not is_feed_due({"next_poll_at": NOW + 60}, NOW, SETTINGS)
+    assert is_feed_due({"next_poll_at": NOW + 60}, NOW, {**SETTINGS, "enabled": False})
+
+def test_publish_interval_is_median_gap():
+    """
+    Test that the publish interval ignores a single unusual gap.
+    """
+    timestamps = [NOW, NOW - 3600, NOW - 7200, NOW - 10800, NOW - 100000]
+    assert estimate_publish_interval(timestamps) == 3600
+    assert estimate_publish_interval([NOW]) is None
+
+def test_hourly_feed_with_new_entries_is_polled_every_half_hour():
+    """
+    Test that a feed posting hourly is scheduled at half its publish interval.
+    """
+    timestamps = [NOW - i * 3600 for i in range(10)]
+    update = schedule_next_poll({}, timestamps, 1, NOW, SETTINGS)
+    assert update["poll_interval_seconds"] == 1800
+    assert update["next_poll_at"] == NOW + 1800
+    assert update["empty_polls"] == 0
+
+def test_empty_polls_back_off_within_bounds():
+    """
+    Test that empty polls grow the interval, never past max_interval_minutes.
+    """
+    state = {"poll_interval_seconds": 600}
+    update = schedule_next_poll(state, [], 0, NOW, SETTINGS)
+    assert update["poll_interval_seconds"] == 900
+    assert update["empty_polls"] == 1
+
+    state = {"poll_interval_seconds": 14000}
+    update = schedule_next_poll(state, [], 0, NOW, SETTINGS)
+    assert update["poll_interval_seconds"] == 240 * 60
+
+def test_fast_feed_never_polled_below_minimum():
+    """
+    Test that a feed posting every few seconds is still polled no more often than min_interval_minutes.
+    """
+    timestamps = [NOW - i * 10 for i in range(10)]
+    update = schedule_next_poll({}, timestamps, 5, NOW, SETTINGS)
+    assert update["poll_interval_seconds"] == 120
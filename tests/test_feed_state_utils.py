@@ -0,0 +1,52 @@
+# tests/test_feed_state_utils.py
+
+import pytest
+from unittest.mock import patch
+from utils.feed_state_utils import load_feed_states, save_feed_states, is_entry_seen, advance_watermark
+
+NOW = 1_700_000_000
+
+@pytest.fixture
+def local_state(tmp_path):
+    with patch.dict('utils.local_state_utils.local_state_config', {'path': str(tmp_path / 'state.db')}):
+        yield
+
+def test_saved_state_is_merged(local_state):
+    """
+    Test that saving state merges new values into what was stored before.
+    """
+    save_feed_states({"https://example.com/feed": {"etag": "abc"}})
+    save_feed_states({"https://example.com/feed": {"next_poll_at": NOW}})
+    states = load_feed_states(["https://example.com/feed", "https://example.com/other"])
+    assert states["https://example.com/feed"] == {"etag": "abc", "next_poll_at": NOW}
+    assert states["https://example.com/other"] == {}
+
+def test_entries_behind_watermark_are_seen():
+    """
+    Test that known IDs and entries well before the watermark are treated as seen, with a grace period for late entries.
+    """
+    watermark = {"published": NOW, "entry_ids": ["guid-1"]}
+    with patch.dict('utils.feed_state_utils.watermark_config', {'timestamp_grace_minutes': 60}):
+        assert is_entry_seen(watermark, "guid-1", NOW + 100)
+        assert is_entry_seen(watermark, "guid-2", NOW - 7200)
+        assert not is_entry_seen(watermark, "guid-3", NOW - 600)
+        assert not is_entry_seen(watermark, "guid-4", None)
+        assert not is_entry_seen(None, "guid-1", NOW - 7200)
+
+def test_advance_watermark_keeps_newest_ids_first():
+    """
+    Test that the watermark moves to the newest entry and keeps a bounded list of recent IDs.
+    """
+    watermark = {"published": NOW - 3600, "entry_ids": ["old-1", "old-2"]}
+    entries = [{"_entry_id": "new-1", "_published": NOW - 60}, {"_entry_id": "new-2", "_published": None}]
+    with patch.dict('utils.feed_state_utils.watermark_config', {'max_entry_ids': 3}):
+        advanced = advance_watermark(watermark, entries)
+    assert advanced == {"published": NOW - 60, "entry_ids": ["new-1", "new-2", "old-1"]}
+
+def test_advance_watermark_ignores_future_dates():
+    """
+    Test that an entry dated in the future doesn't push the watermark past the current time.
+    """
+    with patch('utils.feed_state_utils.time.time', return_value=NOW):
+        advanced = advance_watermark(None, [{"_entry_id": "x", "_published": NOW + 86400}])
+    assert advanced["published"] == NOW
@@ -0,0 +1,29 @@
+# tests/test_fetch_urls_feedparser.py
+
+import time
+from unittest.mock import patch
+from scripts.fetch_urls.fetch_urls_feedparser import FeedparserFetcher
+
+NOW = 1_700_000_000
+
+def feed(offsets):
+    items = "".join(
+        f"<item><title>Story {offset}</title><link>https://example.com/{offset}</link><guid>guid-{offset}</guid>"
+        f"<pubDate>{time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(NOW + offset * 3600))}</pubDate></item>"
+        for offset in offsets
+    )
+    return f"<?xml version='1.0'?><rss version='2.0'><channel><title>Feed</title>{items}</channel></rss>".encode()
+
+def test_known_entries_stop_only_newest_first_feeds():
+    """
+    Test that a newest-first feed stops after a run of known entries, and an oldest-first feed is read in full,
+    so new entries after the known ones are still found.
+    """
+    watermark = {"published": NOW, "entry_ids": [f"guid-{offset}" for offset in range(-7, 1)]}
+    fetcher = FeedparserFetcher()
+    with patch.dict('scripts.fetch_urls.fetch_urls_feedparser.watermark_config', {'stop_after_known_entries': 3}), \
+         patch.dict('utils.feed_state_utils.watermark_config', {'timestamp_grace_minutes': 60}):
+        newest_first = fetcher.parse_feed(feed([2, 1, 0, -1, -2, -3, -4]), watermark)
+        oldest_first = fetcher.parse_feed(feed([-4, -3, -2, -1, 0, 1, 2]), watermark)
+    assert [entry['_entry_id'] for entry in newest_first] == ["guid-2", "guid-1"]
+    assert [entry['_entry_id'] for entry in oldest_first] == ["guid-1", "guid-2"]
@@ -0,0 +1,92 @@
+# tests/test_fingerprint_utils.py
+
+import pytest
+from unittest.mock import patch
+from utils.fingerprint_utils import FingerprintIndex, content_fingerprint, hamming_distance
+
+SETTINGS = {"enabled": True, "min_chars": 100, "shingle_words": 3}
+
+STORY = " ".join(
+    f"Officials said on day {i} that the new budget, approved after a long debate, would fund {i * 10} more teachers."
+    for i in range(40)
+)
+SYNDICATED = "LONDON (Wire) - " + STORY.replace("long debate", "lengthy debate", 1) + " Reporting by A. Writer; editing by B. Editor."
+OTHER_STORY = " ".join(f"The home side won match {i} by {i % 4} goals to nil in front of a crowd of {i * 1000}." for i in range(40))
+
+@pytest.fixture
+def local_state(tmp_path):
+    with patch.dict('utils.local_state_utils.local_state_config', {'path': str(tmp_path / 'state.db')}):
+        yield
+
+def test_syndicated_copies_have_close_fingerprints():
+    """
+    Test that a lightly edited copy of a story stays within a few bits, while a different story does not.
+    """
+    original = content_fingerprint(STORY, SETTINGS)
+    assert hamming_distance(original, content_fingerprint(SYNDICATED, SETTINGS)) <= 3
+    assert hamming_distance(original, content_fingerprint(OTHER_STORY, SETTINGS)) > 10
+    assert content_fingerprint("Too short.", SETTINGS) is None
+
+def test_index_finds_near_duplicates(local_state):
+    """
+    Test that the index returns the closest summarized article within the distance, and ignores the article itself.
+    """
+    index = FingerprintIndex()
+    index.add(1, "00000000000000ff")
+    index.add(2, "ffffffffffff0000")
+    try:
+        assert index.find_duplicate("00000000000000fe", max_distance=3) == (1, 1)
+        assert index.find_duplicate("00000000000000ff", exclude_id=1, max_distance=3) is None
+        # Too far from article 1, and shares no band with article 2, so article 2 is never even compared.
+        assert index.find_duplicate("0000000000000000", max_distance=3) is None
+    finally:
+        index.close()
+
+    reopened = FingerprintIndex()
+    try:
+        assert len(reopened) == 2
+    finally:
+        reopened.close()
+
+class FakeQuery:
+    """
+    Returns the given pages in turn, and records the filters applied to each query.
+    """
+    def __init__(self, pages, filters):
+        self.pages = pages
+        self.filters = filters
+
+    def __getattr__(self, name):
+        if name == "not_":
+            return self
+        def apply(*args):
+            self.filters.append(name)
+            return self
+        return apply
+
+    def execute(self):
+        return type("Response", (), {"data": self.pages.pop(0) if self.pages else []})
+
+class FakeSupabase:
+    def __init__(self, pages):
+        self.pages = pages
+        self.filters = []
+
+    def table(self, name):
+        return FakeQuery(self.pages, self.filters)
+
+def test_first_sync_without_summarized_at_isnt_repeated(local_state):
+    """
+    Test that a backfill of rows summarized before summarized_at existed still records where the next sync starts from.
+    """
+    index = FingerprintIndex()
+    try:
+        supabase = FakeSupabase([[{"id": 1, "content_fingerprint": "00000000000000ff", "summarized_at": None},
+                                  {"id": 2, "content_fingerprint": "ffffffffffff0000", "summarized_at": None}]])
+        with patch.dict('utils.fingerprint_utils.fingerprint_config', {'sync_page_size': 1000}):
+            assert index.sync(supabase, "summarizer_flow") == 2
+            assert len(index) == 2 and index.synced_until is not None
+            index.sync(supabase, "summarizer_flow")
+        assert "gte" in supabase.filters
+    finally:
+        index.close()
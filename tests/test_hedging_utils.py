@@ -0,0 +1,87 @@
+# tests/test_hedging_utils.py
+
+import time
+import pytest
+from utils.hedging_utils import RequestHedger, mark_request_sent
+
+SETTINGS = {"enabled": True, "latency_percentile": 0.9, "min_samples": 5, "max_hedge_fraction": 1.0}
+
+def warmed_up(settings=SETTINGS, seconds=0.05):
+    hedger = RequestHedger(settings)
+    for _ in range(10):
+        hedger.record("slow/model", seconds)
+    return hedger
+
+def answer(value, delay=0.0):
+    def request():
+        mark_request_sent()
+        time.sleep(delay)
+        return value
+    return request
+
+def fail(delay=0.0):
+    def request():
+        mark_request_sent()
+        time.sleep(delay)
+        raise RuntimeError("provider error")
+    return request
+
+def test_no_hedge_without_enough_samples():
+    """
+    Test that requests go to the first provider only until it has min_samples latencies recorded.
+    """
+    hedger = RequestHedger(SETTINGS)
+    assert hedger.hedge_delay("slow/model") is None
+    assert hedger.call(answer("primary", 0.1), "slow/model", answer("backup")) == ("primary", 0)
+    assert hedger.stats()["hedged"] == 0
+
+def test_fast_primary_is_not_hedged():
+    """
+    Test that a request answered within the hedge delay isn't sent to the backup.
+    """
+    hedger = warmed_up(seconds=0.5)
+    assert hedger.call(answer("primary"), "slow/model", answer("backup")) == ("primary", 0)
+    assert hedger.stats()["hedged"] == 0
+
+def test_hedge_delay_starts_when_request_is_sent():
+    """
+    Test that time a request spends queued before it is sent to the provider doesn't count towards the hedge delay.
+    """
+    def queued_then_fast():
+        time.sleep(0.3)
+        mark_request_sent()
+        time.sleep(0.01)
+        return "primary"
+    hedger = warmed_up()
+    assert hedger.call(queued_then_fast, "slow/model", answer("backup")) == ("primary", 0)
+    assert hedger.stats()["hedged"] == 0
+
+def test_slow_primary_hedged_and_backup_wins():
+    """
+    Test that a request slower than the hedge delay is also sent to the backup, whose earlier answer is used.
+    """
+    hedger = warmed_up()
+    assert hedger.call(answer("primary", 1.0), "slow/model", answer("backup")) == ("backup", 1)
+    stats = hedger.stats()
+    assert (stats["hedged"], stats["backup_wins"]) == (1, 1)
+
+def test_failed_backup_waits_for_primary():
+    """
+    Test that if the hedged backup fails, the primary's answer is still used and the backup's failure is reported,
+    and if both fail the primary's error is raised.
+    """
+    hedger = warmed_up()
+    failed = []
+    assert hedger.call(answer("primary", 0.3), "slow/model", fail(), failed) == ("primary", 0)
+    assert failed == [1]
+    with pytest.raises(RuntimeError):
+        hedger.call(fail(0.3), "slow/model", fail())
+
+def test_budget_caps_hedged_fraction():
+    """
+    Test that no more than max_hedge_fraction of requests are hedged.
+    """
+    hedger = warmed_up({**SETTINGS, "max_hedge_fraction": 0.5})
+    results = [hedger.call(answer("primary", 0.2), "slow/model", answer("backup")) for _ in range(4)]
+    assert results.count(("backup", 1)) == 2
+    assert hedger.stats()["hedged_fraction"] == 0.5
@@ -0,0 +1,70 @@
+# tests/test_llm_cache_utils.py
+
+import pytest
+from unittest.mock import patch
+from utils.llm_cache_utils import LLMResponseCache, llm_cache_key, is_cacheable
+
+@pytest.fixture
+def local_state(tmp_path):
+    with patch.dict('utils.local_state_utils.local_state_config', {'path': str(tmp_path / 'state.db')}):
+        yield
+
+def test_key_depends_on_every_request_setting():
+    """
+    Test that changing the provider, model, sampling settings, system prompt or content changes the key.
+    """
+    request = ("groq", "llama3-8b-8192", 4000, 0, "Summarize this.", "Article text")
+    key = llm_cache_key(*request)
+    assert key == llm_cache_key(*request)
+    for position, value in enumerate(["anthropic", "llama3-70b", 2000, 1, "Tag this.", "Other text"]):
+        changed = list(request)
+        changed[position] = value
+        assert llm_cache_key(*changed) != key
+
+def test_nonzero_temperature_opt_out():
+    """
+    Test that requests with a temperature above 0 are only cached when cache_nonzero_temperature is on.
+    """
+    assert is_cacheable(1, {"cache_nonzero_temperature": True})
+    assert not is_cacheable(1, {"cache_nonzero_temperature": False})
+    assert is_cacheable(0, {"cache_nonzero_temperature": False})
+    assert not is_cacheable(0, {"enabled": False})
+
+def test_hits_misses_and_discard(local_state):
+    """
+    Test that stored responses are returned and counted as hits until they are discarded.
+    """
+    cache = LLMResponseCache({})
+    assert cache.get("key") is None
+    cache.put("key", "IntroParagraph: ...")
+    assert cache.get("key") == "IntroParagraph: ..."
+    cache.discard("key")
+    assert cache.get("key") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 2, 1)
+
+def test_expired_responses_miss(local_state):
+    """
+    Test that responses older than ttl_hours are not returned.
+    """
+    cache = LLMResponseCache({"ttl_hours": 1})
+    with patch('utils.llm_cache_utils.time.time', return_value=1000.0):
+        cache.put("key", "response")
+    with patch('utils.llm_cache_utils.time.time', return_value=1000.0 + 3601):
+        assert cache.get("key") is None
+
+def test_least_recently_used_evicted_over_size(local_state):
+    """
+    Test that the least recently used responses are evicted once the cache is over max_size_mb.
+    """
+    cache = LLMResponseCache({"max_size_mb": 1})
+    response = "x" * (400 * 1024)
+    with patch('utils.llm_cache_utils.time.time', side_effect=[1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]):
+        cache.put("first", response)
+        cache.put("second", response)
+        cache.get("first")
+        cache.put("third", response)
+        assert cache.get("second") is None
+        assert cache.get("first") == response
+        assert cache.get("third") == response
+    assert cache.stats()["evictions"] == 1
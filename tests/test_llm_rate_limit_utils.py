@@ -0,0 +1,77 @@
+# tests/test_llm_rate_limit_utils.py
+
+import pytest
+from unittest.mock import patch
+from utils.llm_rate_limit_utils import LLMRateLimiter, LLMRateLimitExceeded, take_from_buckets, retry_after_seconds
+
+LIMITS = {"requests_per_minute": 60, "tokens_per_minute": 600}
+
+@pytest.fixture
+def local_state(tmp_path):
+    with patch.dict('utils.local_state_utils.local_state_config', {'path': str(tmp_path / 'state.db')}):
+        yield
+
+def test_buckets_start_full_and_refill():
+    """
+    Test that new buckets allow a full minute's requests at once, then refill at the per-minute rate.
+    """
+    state, wait = take_from_buckets(None, LIMITS, 500, now=0)
+    assert wait == 0 and state["tokens"] == 100 and state["requests"] == 59
+    state, wait = take_from_buckets(state, LIMITS, 200, now=0)
+    assert wait == pytest.approx(10)
+    state, wait = take_from_buckets(state, LIMITS, 200, now=10)
+    assert wait == 0 and state["tokens"] == pytest.approx(0)
+
+def test_oversized_request_waits_for_full_bucket():
+    """
+    Test that a request estimated at more than a minute's tokens is let through once the bucket is full.
+    """
+    state, wait = take_from_buckets(None, LIMITS, 5000, now=0)
+    assert wait == 0 and state["tokens"] == 0
+
+def test_limiter_shared_through_store_and_rejects_after_max_wait(local_state):
+    """
+    Test that limiters in different processes share buckets through the local state database, and give up after max_wait_seconds.
+    """
+    settings = {"per_provider": {"groq": {"requests_per_minute": 2}}, "max_wait_seconds": 5}
+    first, second = LLMRateLimiter(settings), LLMRateLimiter(settings)
+    assert first.acquire("groq", 10) == 0
+    assert second.acquire("groq", 10) == 0
+    with pytest.raises(LLMRateLimitExceeded):
+        first.acquire("groq", 10)
+    assert first.stats()["rejected"] == 1
+    assert second.acquire("anthropic", 10) == 0
+
+def test_limiter_waits_briefly_for_capacity(local_state):
+    """
+    Test that a call queues for the time until capacity frees up instead of failing.
+    """
+    clock = {"now": 1000.0}
+    limiter = LLMRateLimiter({"per_provider": {"groq": {"requests_per_minute": 6}}, "max_wait_seconds": 15})
+    with patch('utils.llm_rate_limit_utils.time.time', side_effect=lambda: clock["now"]), \
+         patch('utils.llm_rate_limit_utils.time.sleep', side_effect=lambda seconds: clock.update(now=clock["now"] + seconds)):
+        for _ in range(6):
+            assert limiter.acquire("groq", 0) == 0
+        assert limiter.acquire("groq", 0) == pytest.approx(10)
+    assert limiter.stats()["waits"] == 1
+
+def test_retry_after_pauses_provider(local_state):
+    """
+    Test that a Retry-After header is read from the SDK's error, and a pause holds every call back until it ends.
+    """
+    class Response:
+        headers = {"retry-after": "20"}
+    class RateLimitError(Exception):
+        response = Response()
+    assert retry_after_seconds(RateLimitError()) == 20
+    assert retry_after_seconds(ValueError()) is None
+
+    limiter = LLMRateLimiter({"per_provider": {"groq": {"requests_per_minute": 60}}, "max_wait_seconds": 5})
+    limiter.pause("groq", 20)
+    with pytest.raises(LLMRateLimitExceeded):
+        limiter.acquire("groq", 10)
+    # Providers without configured limits are paused as well.
+    assert limiter.acquire("replicate", 10) == 0
+    limiter.pause("replicate", 20)
+    with pytest.raises(LLMRateLimitExceeded):
+        limiter.acquire("replicate", 10)
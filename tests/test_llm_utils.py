@@ -0,0 +1,18 @@
+# tests/test_llm_utils.py
+
+from utils.llm_utils import fallback_providers
+
+def test_fallbacks_follow_the_running_script():
+    """
+    Test that a script's fallbacks are the providers after it under interfaces.
+    """
+    fallbacks = [name for name, _ in fallback_providers('summarizer', 'summarizer_groq_llama8b.py')]
+    assert "summarizer_gemini_flash.py" not in fallbacks
+    assert fallbacks[0] == "summarizer_replicate_llama8b.py"
+
+def test_unknown_script_gets_no_fallbacks():
+    """
+    Test that a script not listed under interfaces, such as a test, isn't retried on the configured providers.
+    """
+    assert fallback_providers('summarizer', 'test_script.py') == []
+    assert fallback_providers('tagging', None) == []
@@ -0,0 +1,96 @@
+# tests/test_provider_router_utils.py
+
+import random
+import pytest
+from unittest.mock import patch
+from utils.provider_router_utils import ProviderRouter, is_rate_limit_error
+
+SETTINGS = {"ewma_alpha": 0.5, "exploration_rate": 0, "min_samples": 3, "error_weight": 4, "rate_limit_weight": 8}
+PROVIDERS = ["gemini", "groq", "replicate", "anthropic"]
+KEYS = ["gemini/flash", "groq/llama", "replicate/llama", "anthropic/haiku"]
+
+@pytest.fixture
+def local_state(tmp_path):
+    with patch.dict('utils.local_state_utils.local_state_config', {'path': str(tmp_path / 'state.db')}):
+        yield
+
+def record_calls(router, provider, count, seconds, succeeded=True, rate_limited=False):
+    for _ in range(count):
+        router.record(provider, seconds, succeeded, rate_limited)
+
+def test_configured_order_until_enough_samples(local_state):
+    """
+    Test that providers keep their configured order while they have fewer than min_samples calls recorded.
+    """
+    router = ProviderRouter(SETTINGS)
+    record_calls(router, "groq/llama", 2, 0.5)
+    assert router.order(PROVIDERS, KEYS) == (PROVIDERS, "configured")
+
+def test_slow_and_rate_limited_providers_move_back(local_state):
+    """
+    Test that scored providers are sorted by score among their own places, and unscored providers keep theirs.
+    """
+    router = ProviderRouter(SETTINGS)
+    record_calls(router, "gemini/flash", 5, 6.0)
+    record_calls(router, "groq/llama", 5, 1.0, succeeded=False, rate_limited=True)
+    record_calls(router, "anthropic/haiku", 5, 2.0)
+    ordered, decision = router.order(PROVIDERS, KEYS)
+    assert decision == "reordered"
+    assert ordered == ["anthropic", "gemini", "replicate", "groq"]
+
+def test_exploration_tries_another_provider_first(local_state):
+    """
+    Test that with an exploration rate of 1, a provider other than the configured first is tried first.
+    """
+    router = ProviderRouter({**SETTINGS, "exploration_rate": 1}, rng=random.Random(1))
+    ordered, decision = router.order(PROVIDERS, KEYS)
+    assert decision == "explored"
+    assert ordered[0] != "gemini" and sorted(ordered) == sorted(PROVIDERS)
+    assert router.stats()["decisions"]["explored"] == 1
+
+def test_averages_saved_for_next_run(local_state):
+    """
+    Test that saved averages are loaded by a new router, and scores grow with the error rate.
+    """
+    router = ProviderRouter(SETTINGS)
+    record_calls(router, "groq/llama", 4, 1.0)
+    healthy = router.score("groq/llama")
+    router.record("groq/llama", 1.0, False)
+    router.save()
+    reloaded = ProviderRouter(SETTINGS)
+    assert reloaded.score("groq/llama") == pytest.approx(router.score("groq/llama"))
+    assert reloaded.score("groq/llama") > healthy
+
+def test_rate_limit_errors_detected():
+    """
+    Test that 429 responses are recognised from the status code or the message.
+    """
+    class StatusError(Exception):
+        status_code = 429
+    assert is_rate_limit_error(StatusError("limited"))
+    assert is_rate_limit_error(Exception("Error code: 429 - Rate limit reached"))
+    assert not is_rate_limit_error(ValueError("Error parsing Gemini response"))
+
+def test_latency_judged_per_response_token(local_state):
+    """
+    Test that a provider given longer responses isn't ranked behind one that is as fast per token.
+    """
+    router = ProviderRouter(SETTINGS)
+    for _ in range(5):
+        router.record("gemini/flash", 8.0, True, tokens=2000)
+        router.record("groq/llama", 1.0, True, tokens=200)
+    assert router.score("gemini/flash") == pytest.approx(4.0)
+    assert router.score("gemini/flash") < router.score("groq/llama")
+
+def test_overlapping_runs_merge_on_save(local_state):
+    """
+    Test that two runs saving the same provider keep both runs' calls, instead of the last one overwriting the other.
+    """
+    first, second = ProviderRouter(SETTINGS), ProviderRouter(SETTINGS)
+    record_calls(first, "groq/llama", 4, 1.0)
+    record_calls(second, "groq/llama", 4, 1.0, succeeded=False)
+    first.save()
+    second.save()
+    merged = ProviderRouter(SETTINGS)
+    assert merged.stats()["providers"]["groq/llama"]["samples"] == 8
+    assert merged.stats()["providers"]["groq/llama"]["error_rate"] == pytest.approx(0.5)
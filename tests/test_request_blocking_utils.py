@@ -0,0 +1,56 @@
+# tests/test_request_blocking_utils.py
+
+import asyncio
+from utils.request_blocking_utils import RequestBlocker, javascript_disabled_for
+
+SETTINGS = {
+    "enabled": True,
+    "block_resource_types": ["image", "font", "stylesheet"],
+    "block_domains": ["doubleclick.net", "google-analytics.com"],
+    "javascript_disabled_domains": ["static.example.com"],
+    "estimated_bytes_per_type": {"image": 1000, "script": 300},
+}
+
+class FakeRequest:
+    def __init__(self, resource_type, url):
+        self.resourceType = resource_type
+        self.url = url
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = "aborted"
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+def test_blocks_resource_types_and_ad_domains():
+    """
+    Test that blocked resource types and ad domains (including subdomains) are aborted and everything else continues.
+    """
+    blocker = RequestBlocker(SETTINGS)
+    requests = {
+        "document": FakeRequest("document", "https://news.example.com/story"),
+        "image": FakeRequest("image", "https://news.example.com/photo.jpg"),
+        "tracker": FakeRequest("script", "https://stats.g.doubleclick.net/dc.js"),
+        "app": FakeRequest("script", "https://news.example.com/app.js"),
+        "lookalike": FakeRequest("script", "https://notdoubleclick.net/x.js"),
+    }
+    for request in requests.values():
+        asyncio.run(blocker.handle_request(request))
+
+    assert {name: request.outcome for name, request in requests.items()} == {
+        "document": "continued",
+        "image": "aborted",
+        "tracker": "aborted",
+        "app": "continued",
+        "lookalike": "continued",
+    }
+    assert blocker.stats()["requests_blocked"] == 2
+    assert blocker.stats()["estimated_bytes_saved"] == 1300
+
+def test_javascript_disabled_domains():
+    """
+    Test that only listed domains are loaded with JavaScript disabled.
+    """
+    assert javascript_disabled_for("https://static.example.com/a", SETTINGS)
+    assert not javascript_disabled_for("https://example.com/a", SETTINGS)
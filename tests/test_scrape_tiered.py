@@ -0,0 +1,52 @@
+# tests/test_scrape_tiered.py
+
+import asyncio
+import time
+import pytest
+from unittest.mock import patch, AsyncMock
+from scripts.scraper.scrape_tiered import TieredScraper, STATIC_TIER, BROWSER_TIER
+from utils.domain_state_utils import get_domain_state, update_domain_state
+
+URL = "https://example.com/story"
+
+@pytest.fixture
+def scraper(tmp_path):
+    with patch.dict('utils.local_state_utils.local_state_config', {'path': str(tmp_path / 'state.db')}), \
+         patch('utils.domain_state_utils._domain_states', None), \
+         patch.dict('scripts.scraper.scrape_tiered.static_scrape_config', {'browser_after_js_pages': 2, 'tier_ttl_hours': 1}):
+        scraper = TieredScraper()
+        scraper.browser_scraper = AsyncMock()
+        scraper.browser_scraper.scrape.return_value = "<html>rendered</html>"
+        yield scraper
+
+def scrape_with(scraper, static_result):
+    side_effect = static_result if isinstance(static_result, Exception) else None
+    with patch.object(scraper, 'scrape_static', AsyncMock(return_value=static_result, side_effect=side_effect)):
+        return asyncio.run(scraper.scrape(URL))
+
+def test_errors_dont_move_domain_to_browser(scraper):
+    """
+    Test that network errors and error responses fall back to the browser for that URL only, without moving the domain.
+    """
+    scrape_with(scraper, ConnectionError("connection reset"))
+    scrape_with(scraper, (None, "HTTP 429", False))
+    scrape_with(scraper, (None, "HTTP 503", False))
+    assert scraper.browser_scraper.scrape.await_count == 3
+    assert scraper.preferred_tier("example.com") == STATIC_TIER
+
+def test_js_pages_in_a_row_move_domain_to_browser(scraper):
+    """
+    Test that a domain moves to the browser tier after browser_after_js_pages JavaScript pages in a row,
+    a usable static page in between resets the count, and the browser tier expires after tier_ttl_hours.
+    """
+    scrape_with(scraper, (None, "JavaScript shell", True))
+    scrape_with(scraper, ("<html>article</html>", None, False))
+    scrape_with(scraper, (None, "JavaScript shell", True))
+    assert scraper.preferred_tier("example.com") == STATIC_TIER
+    scrape_with(scraper, (None, "no text", True))
+    assert scraper.preferred_tier("example.com") == BROWSER_TIER
+    assert scrape_with(scraper, ("<html>article</html>", None, False)) == "<html>rendered</html>"
+
+    update_domain_state("example.com", {"scrape_tier_set_at": time.time() - 7200})
+    assert scraper.preferred_tier("example.com") == STATIC_TIER
+    assert get_domain_state("example.com")["scrape_tier"] == BROWSER_TIER
@@ -0,0 +1,80 @@
+# tests/test_seen_url_utils.py
+
+import pytest
+from unittest.mock import patch
+from utils.seen_url_utils import SeenUrlIndex
+from utils.url_canonical_utils import canonical_url_key
+
+class FakeQuery:
+    """
+    Minimal stand-in for a Supabase query builder, returning rows ordered by created_at.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.minimum = None
+        self.page_size = None
+
+    def select(self, columns):
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, page_size):
+        self.page_size = page_size
+        return self
+
+    def gte(self, column, value):
+        self.minimum = value
+        return self
+
+    def execute(self):
+        rows = [row for row in self.rows if self.minimum is None or row['created_at'] >= self.minimum]
+        return type("Response", (), {"data": rows[:self.page_size]})()
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, table_name):
+        return FakeQuery(self.rows)
+
+@pytest.fixture
+def local_state(tmp_path):
+    with patch.dict('utils.local_state_utils.local_state_config', {'path': str(tmp_path / 'state.db')}):
+        yield
+
+def test_added_keys_persist_between_runs(local_state):
+    """
+    Test that URL keys added to the index are still known after reopening it.
+    """
+    index = SeenUrlIndex()
+    index.add([canonical_url_key("https://example.com/a")])
+    index.close()
+
+    reopened = SeenUrlIndex()
+    assert canonical_url_key("https://example.com/a") in reopened
+    assert canonical_url_key("https://example.com/b") not in reopened
+    reopened.close()
+
+def test_sync_pages_from_high_water_mark(local_state):
+    """
+    Test that sync backfills across several pages and then only reads rows at or after the high-water mark.
+    """
+    rows = [{"url": f"https://example.com/{i}", "created_at": f"2024-01-01T00:00:{i:02d}"} for i in range(5)]
+    supabase = FakeSupabase(rows)
+
+    with patch.dict('utils.seen_url_utils.seen_url_config', {'sync_page_size': 2}):
+        index = SeenUrlIndex()
+        index.sync(supabase, "summarizer_flow")
+        assert len(index) == 5
+        assert index.high_water_mark == "2024-01-01T00:00:04"
+        index.close()
+
+        rows.append({"url": "https://example.com/new", "created_at": "2024-01-01T00:00:05"})
+        reopened = SeenUrlIndex()
+        rows_read = reopened.sync(supabase, "summarizer_flow")
+        # Only the boundary row and the new row are read (the boundary row twice, as the second page starts on it).
+        assert rows_read == 3
+        assert canonical_url_key("http://www.example.com/new/?utm_source=feed") in reopened
+        reopened.close()
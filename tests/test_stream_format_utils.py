@@ -0,0 +1,56 @@
+# tests/test_stream_format_utils.py
+
+import pytest
+from utils.stream_format_utils import SummaryStreamValidator, StreamFormatError
+
+SETTINGS = {"max_preamble_chars": 20, "max_section_chars": 200}
+
+SUMMARY = (
+    "IntroParagraph: The council approved the budget.\n\n"
+    'BulletPointSummary: {\n  "bulletPoints": [\n    {"point": "Teachers get a raise."}\n  ]\n}\n\n'
+    "ConcludingParagraph: The budget takes effect in April."
+)
+
+def stream(text, settings=SETTINGS, chunk_size=7):
+    validator = SummaryStreamValidator(settings)
+    for i in range(0, len(text), chunk_size):
+        validator.feed(text[i:i + chunk_size])
+    return validator
+
+def test_well_formed_summary_passes():
+    """
+    Test that a summary in the expected format is accepted however it is split into chunks.
+    """
+    for chunk_size in (1, 5, len(SUMMARY)):
+        assert stream(SUMMARY, chunk_size=chunk_size).text == SUMMARY
+    assert stream("  **" + SUMMARY).text.startswith("  **IntroParagraph:")
+
+def test_missing_intro_label_aborts_early():
+    """
+    Test that a response that doesn't start with IntroParagraph: is stopped once it is past the allowed preamble.
+    """
+    validator = SummaryStreamValidator(SETTINGS)
+    validator.feed("Sure! Here is a")
+    with pytest.raises(StreamFormatError, match="IntroParagraph"):
+        validator.feed(" summary of the article you sent:")
+
+def test_bullets_must_be_json():
+    """
+    Test that BulletPointSummary: followed by anything but JSON is stopped at its first character.
+    """
+    with pytest.raises(StreamFormatError, match="JSON"):
+        stream("IntroParagraph: Intro.\nBulletPointSummary:\n- First point")
+
+def test_sections_out_of_order_abort():
+    """
+    Test that a ConcludingParagraph: before BulletPointSummary: is stopped.
+    """
+    with pytest.raises(StreamFormatError, match="before BulletPointSummary"):
+        stream("IntroParagraph: Intro.\nConcludingParagraph: Outro.")
+
+def test_section_running_on_aborts():
+    """
+    Test that an intro running past max_section_chars without the next label is stopped.
+    """
+    with pytest.raises(StreamFormatError, match="ran on"):
+        stream("IntroParagraph: " + "word " * 100)
@@ -2,7 +2,8 @@
 
 import pytest
 from unittest.mock import patch
-from utils.summarizer_utils import process_articles
+from utils.summarizer_utils import process_articles, request_summary, config
+from utils.token_utils import estimate_tokens
 from tests.mocks.mock_llm import mock_llm_api_success, mock_llm_api_error, mock_llm_api_empty
 
 @pytest.fixture
@@ -71,3 +72,24 @@ def test_summarize_article_with_empty_response(mock_llm_empty):
     
     result_status = process_articles(script_name, api_call_func=api_call_func)
     assert result_status in ["Success", "Partial", "Error"]  # Depending on your implementation
+
+def test_request_summary_fits_provider_budget_and_keeps_every_chunk():
+    """
+    Test that an article too long for the provider's context window is split into chunks that fit it, and that notes too many
+    for one reduce request are merged over extra passes rather than any chunk being left out.
+    """
+    requests = []
+
+    def call(content, systemPrompt):
+        requests.append((content, systemPrompt))
+        return f"note {len(requests)}"
+
+    settings = {"max_input_tokens": 12000, "chunk_tokens": 6000, "max_notes_per_reduce": 3, "context_fill": 1.0, "reduce_preamble": "Notes:"}
+    content = "\n\n".join(f"Paragraph {number}. " + "word " * 150 for number in range(40))
+    response, chunk_count = request_summary(content, "Summarize.", call, settings, token_budget=estimate_tokens(config['systemPrompt-Chunk']) + 500)
+    chunks = [text for text, prompt in requests if prompt == config['systemPrompt-Chunk'] and text.startswith("Paragraph")]
+    assert chunk_count == len(chunks) > 8
+    assert all(len(chunk) <= 500 * 4 for chunk in chunks)
+    assert "".join(chunks).count("Paragraph") == 40
+    assert requests[-1][1] == "Summarize." and requests[-1][0].count("Part ") <= 3
+    assert response == f"note {len(requests)}"
@@ -0,0 +1,39 @@
+# tests/test_token_utils.py
+
+from utils.token_utils import estimate_tokens, split_into_chunks
+
+PARAGRAPHS = [f"Paragraph {i} says the council approved the plan after a vote on day {i}." * 3 for i in range(30)]
+ARTICLE = "\n\n".join(PARAGRAPHS)
+
+def test_estimate_tokens_from_length():
+    """
+    Test that tokens are estimated from the text length, rounding up.
+    """
+    assert estimate_tokens("", chars_per_token=4) == 0
+    assert estimate_tokens("abcde", chars_per_token=4) == 2
+    assert estimate_tokens(None, chars_per_token=4) == 0
+
+def test_chunks_fit_budget_and_break_between_paragraphs():
+    """
+    Test that every chunk fits the token budget, chunks end between paragraphs, and no text is lost.
+    """
+    chunks = split_into_chunks(ARTICLE, chunk_tokens=200, chars_per_token=4)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk, chars_per_token=4) <= 200 for chunk in chunks)
+    assert [paragraph for chunk in chunks for paragraph in chunk.split("\n\n")] == PARAGRAPHS
+
+def test_long_paragraph_split_between_sentences():
+    """
+    Test that a paragraph longer than a chunk is split between sentences, and a sentence longer than a chunk is sliced.
+    """
+    paragraph = " ".join(f"Sentence number {i} is here." for i in range(100)) + " " + "x" * 500
+    chunks = split_into_chunks(paragraph, chunk_tokens=50, chars_per_token=4)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert chunks[0].startswith("Sentence number 0 is here.")
+    assert "".join(chunks).replace("\n\n", "").replace(" ", "") == paragraph.replace(" ", "")
+
+def test_short_text_is_one_chunk():
+    """
+    Test that a text within the budget stays in one chunk.
+    """
+    assert split_into_chunks("One short paragraph.", chunk_tokens=100, chars_per_token=4) == ["One short paragraph."]
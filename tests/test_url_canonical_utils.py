@@ -0,0 +1,60 @@
+# tests/test_url_canonical_utils.py
+
+from utils.url_canonical_utils import canonicalize_url, canonical_url_key, canonicalize_entries
+
+RULES = {
+    "enabled": True,
+    "force_https": True,
+    "strip_www": True,
+    "strip_trailing_slash": True,
+    "strip_params": ["utm_*", "fbclid"],
+    "domain_rules": {
+        "example.org": {"keep_params": ["id"]},
+        "legacy.example.net": {"force_https": False},
+    },
+}
+
+def test_variants_share_one_canonical_url():
+    """
+    Test that tracking parameters, fragments, trailing slashes, www and http/https differences are removed.
+    """
+    variants = [
+        "https://example.com/story",
+        "http://example.com/story",
+        "https://www.example.com/story/",
+        "https://example.com/story?utm_source=rss&utm_medium=feed",
+        "https://EXAMPLE.com:443/story#comments",
+        "  https://example.com/story?fbclid=abc  ",
+    ]
+    assert {canonicalize_url(url, RULES) for url in variants} == {"https://example.com/story"}
+    assert len({canonical_url_key(url, RULES) for url in variants}) == 1
+
+def test_remaining_query_parameters_are_kept_and_sorted():
+    """
+    Test that parameters that identify the article are kept, in a stable order.
+    """
+    assert canonicalize_url("https://example.com/view?b=2&a=1&utm_campaign=x", RULES) == "https://example.com/view?a=1&b=2"
+
+def test_domain_rules_override_defaults():
+    """
+    Test per-domain keep_params and force_https rules, including subdomain matching.
+    """
+    assert canonicalize_url("https://news.example.org/article?id=7&page=2", RULES) == "https://news.example.org/article?id=7"
+    assert canonicalize_url("http://legacy.example.net/post", RULES) == "http://legacy.example.net/post"
+
+def test_canonicalize_entries_keeps_original_url():
+    """
+    Test that entries keep the feed's URL for scraping and gain the canonical URL and key.
+    """
+    entries = canonicalize_entries([{"url": " http://example.com/a?utm_source=x ", "ArticleTitle": "A"}], RULES)
+    assert entries[0]["url"] == "http://example.com/a?utm_source=x"
+    assert entries[0]["canonical_url"] == "https://example.com/a"
+    assert entries[0]["url_key"] == canonical_url_key("https://example.com/a", RULES)
+    assert len(entries[0]["url_key"]) == 16
+
+def test_malformed_port_keeps_raw_url():
+    """
+    Test that a URL whose port isn't a valid number is kept as it is instead of raising.
+    """
+    assert canonicalize_url(" https://example.com:abc/story?utm_source=x ", RULES) == "https://example.com:abc/story?utm_source=x"
+    assert canonicalize_url("https://example.com:99999/story", RULES) == "https://example.com:99999/story"
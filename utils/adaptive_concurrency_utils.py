@@ -0,0 +1,159 @@
+# utils/adaptive_concurrency_utils.py
+# This module adjusts each LLM provider's limit on calls in flight with AIMD (additive increase, multiplicative decrease),
+# cutting it when calls are rate limited, time out or slow down and growing it while they succeed.
+
+import time
+import threading
+import statistics
+from collections import deque
+from datetime import datetime, timezone
+from config.config_loader import load_config
+
+config = load_config()
+adaptive_config = config.get('llm_concurrency', {}).get('adaptive', {})
+
+def is_timeout_error(error):
+    """
+    Check whether an exception from a provider's SDK means the request timed out.
+
+    Args:
+        error (Exception): The exception.
+
+    Returns:
+        bool: True if the request timed out or its deadline passed.
+    """
+    if isinstance(error, TimeoutError) or any(name in type(error).__name__ for name in ('Timeout', 'DeadlineExceeded')):
+        return True
+    return 'timed out' in str(error).lower()
+
+class AdaptiveLimit:
+    """
+    A limit on a provider's calls in flight that adjusts itself. Used like a semaphore: acquire() before a call, and release()
+    after it with how long it took and whether the provider was overloaded.
+    """
+    def __init__(self, provider, limit, settings=None):
+        """
+        Initialize the limit.
+
+        Args:
+            provider (str): The provider's client type, used in adjustment events.
+            limit (int): The starting limit.
+            settings (dict, optional): The adaptive settings. Defaults to llm_concurrency.adaptive from config.yaml.
+        """
+        settings = adaptive_config if settings is None else settings
+        self.provider = provider
+        self.adaptive = settings.get('enabled', True)
+        self.min_limit = settings.get('min_limit', 1)
+        self.max_limit = settings.get('max_limit', 32)
+        self.decrease_factor = settings.get('decrease_factor', 0.5)
+        self.cooldown_seconds = settings.get('cooldown_seconds', 5)
+        self.latency_tolerance = settings.get('latency_tolerance', 2.0)
+        self.latency_target = settings.get('latency_target_per_1k_tokens', {}).get(provider)
+        self.min_samples = settings.get('min_latency_samples', 5)
+        self.recent_latencies = deque(maxlen=settings.get('latency_window', 5))
+        self.limit = float(min(max(limit, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.baseline_latency = None
+        self.latency_samples = 0
+        self.last_decrease = None
+        self.increases = 0
+        self.decreases = 0
+        self.events = deque(maxlen=settings.get('events_kept', 20))
+
+    def acquire(self):
+        """
+        Wait until the provider has fewer calls in flight than its current limit, then count this call in.
+        """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, elapsed, overloaded=False, succeeded=True, tokens=None):
+        """
+        Count a call out and adjust the limit from its outcome.
+
+        Args:
+            elapsed (float): How long the call took, in seconds.
+            overloaded (bool): Whether the call was rate limited or timed out.
+            succeeded (bool): Whether the call returned a response. Other failures, such as bad requests, don't change the limit.
+            tokens (int, optional): The tokens the call used, prompt and response, so its latency can be compared per 1,000 tokens.
+                                    Without it, latency is compared per call.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if self.adaptive:
+                if overloaded:
+                    self.decrease("rate limited or timed out")
+                elif succeeded:
+                    self.observe_latency(elapsed * 1000 / tokens if tokens else elapsed)
+            self.condition.notify_all()
+
+    def latency_limit(self):
+        if self.latency_target:
+            return self.latency_target
+        if self.latency_samples < self.min_samples:
+            return None
+        return self.baseline_latency * self.latency_tolerance
+
+    def observe_latency(self, latency):
+        # The baseline follows latency slowly, so a sudden rise counts as congestion but a provider that is always slow doesn't.
+        latency_limit = self.latency_limit()
+        self.baseline_latency = latency if self.baseline_latency is None else self.baseline_latency + 0.1 * (latency - self.baseline_latency)
+        self.latency_samples += 1
+        self.recent_latencies.append(latency)
+        # Only a rise sustained over a full window counts, and the window starts again after a cut so the same calls don't cut twice.
+        if latency_limit is not None and len(self.recent_latencies) == self.recent_latencies.maxlen:
+            recent_latency = statistics.median(self.recent_latencies)
+            if recent_latency > latency_limit:
+                self.recent_latencies.clear()
+                self.decrease(f"median latency {recent_latency:.2f}s over {latency_limit:.2f}s")
+                return
+        if latency_limit is not None and latency > latency_limit:
+            # A slow call that isn't (yet) part of a sustained rise neither cuts nor grows the limit.
+            return
+        # One more call in flight for every limit's worth of calls within the target.
+        previous = int(self.limit)
+        self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+        if int(self.limit) > previous:
+            self.increases += 1
+            self.record_event(previous, int(self.limit), "calls within latency target")
+
+    def decrease(self, reason):
+        # Calls already in flight report the same overload, so the limit is only cut once per cooldown.
+        now = time.monotonic()
+        if self.last_decrease is not None and now - self.last_decrease < self.cooldown_seconds:
+            return
+        previous = int(self.limit)
+        self.limit = max(self.limit * self.decrease_factor, self.min_limit)
+        self.last_decrease = now
+        if int(self.limit) < previous:
+            self.decreases += 1
+            self.record_event(previous, int(self.limit), reason)
+
+    def record_event(self, previous, limit, reason):
+        self.events.append({
+            "at": datetime.now(timezone.utc).isoformat(),
+            "from": previous,
+            "to": limit,
+            "reason": reason
+        })
+
+    def stats(self):
+        """
+        Return the limit's current state and adjustments.
+
+        Returns:
+            dict: The current limit, calls in flight, the number of increases and decreases, the baseline latency (per 1,000 tokens)
+                  and the latest adjustment events.
+        """
+        with self.condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "baseline_latency_seconds": round(self.baseline_latency, 3) if self.baseline_latency is not None else None,
+                "events": list(self.events)
+            }
@@ -0,0 +1,208 @@
+# utils/browser_pool_utils.py
+# This module keeps a pool of warm headless Chromium browsers for the Pyppeteer scraper, opening each page in its own incognito context
+# and replacing browsers that have crashed, served too many pages or use too much memory.
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from pyppeteer import launch
+from config.config_loader import load_config
+
+config = load_config()
+browser_pool_config = config.get('browser_pool', {})
+
+logger = logging.getLogger("BrowserPool")
+
+def process_tree_memory_mb(pid):
+    """
+    Return the resident memory of a process and all of its descendants, read from /proc.
+    Chromium runs each renderer in a child process, so the main process alone understates its memory use.
+
+    Args:
+        pid (int): The ID of the root process.
+
+    Returns:
+        float: The total resident memory in megabytes, or 0 if /proc is not available.
+    """
+    if not os.path.isdir('/proc'):
+        return 0
+    children = {}
+    rss_pages = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as stat_file:
+                # The command name can contain spaces, so fields are read after its closing bracket.
+                fields = stat_file.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        child_pid, parent_pid = int(entry), int(fields[1])
+        children.setdefault(parent_pid, []).append(child_pid)
+        rss_pages[child_pid] = int(fields[21])
+
+    total_pages = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total_pages += rss_pages.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+class PooledBrowser:
+    """
+    One Chromium instance in the pool, with the number of pages it has served.
+    """
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages_served = 0
+        self.memory_checked_at = 0
+        self.crashed = False
+        browser.on('disconnected', self.mark_crashed)
+
+    def mark_crashed(self, *args):
+        self.crashed = True
+
+    def needs_recycling(self, max_pages, max_memory_mb, memory_check_pages=1):
+        """
+        Check whether this browser should be replaced before serving another page.
+
+        Args:
+            max_pages (int): The number of pages after which a browser is replaced.
+            max_memory_mb (int): The memory use in megabytes after which a browser is replaced.
+            memory_check_pages (int): Pages served between memory checks, as each one reads all of /proc.
+
+        Returns:
+            str or None: The reason for recycling, or None if the browser can keep going.
+        """
+        process = self.browser.process
+        if self.crashed or (process is not None and process.poll() is not None):
+            return "crashed"
+        if max_pages and self.pages_served >= max_pages:
+            return f"served {self.pages_served} pages"
+        if max_memory_mb and process is not None and self.pages_served - self.memory_checked_at >= memory_check_pages:
+            self.memory_checked_at = self.pages_served
+            memory_mb = process_tree_memory_mb(process.pid)
+            if memory_mb > max_memory_mb:
+                return f"using {memory_mb:.0f}MB"
+        return None
+
+class BrowserPool:
+    """
+    A pool of warm Chromium browsers that hands out pages in fresh incognito contexts.
+    Browsers are launched lazily on first use, so an empty scrape run never starts Chromium.
+    """
+    def __init__(self, size=None, max_pages_per_browser=None, max_memory_mb=None, launch_args=None):
+        """
+        Initialize the pool. Any argument left as None is read from browser_pool in config.yaml.
+
+        Args:
+            size (int, optional): The number of browsers in the pool. Defaults to scraping.concurrency if browser_pool.size isn't set.
+            max_pages_per_browser (int, optional): Pages served before a browser is replaced.
+            max_memory_mb (int, optional): Memory use in megabytes before a browser is replaced.
+            launch_args (list, optional): Command-line arguments passed to Chromium.
+        """
+        # Each browser serves one page at a time, so by default there is one per concurrent scrape.
+        self.size = size or browser_pool_config.get('size', config.get('scraping', {}).get('concurrency', 4))
+        self.max_pages = max_pages_per_browser or browser_pool_config.get('max_pages_per_browser', 50)
+        self.max_memory_mb = max_memory_mb or browser_pool_config.get('max_memory_mb', 1024)
+        self.memory_check_pages = browser_pool_config.get('memory_check_pages', 10)
+        self.launch_args = launch_args or browser_pool_config.get('launch_args', ["--no-sandbox", "--disable-setuid-sandbox"])
+        self.available = asyncio.Queue()
+        for _ in range(self.size):
+            self.available.put_nowait(None)
+        self.browsers_launched = 0
+        self.browsers_recycled = 0
+
+    async def launch_browser(self):
+        """
+        Start a new Chromium instance.
+
+        Returns:
+            PooledBrowser: The new browser.
+        """
+        browser = await launch(headless=True, args=self.launch_args)
+        self.browsers_launched += 1
+        return PooledBrowser(browser)
+
+    async def close_browser(self, pooled_browser):
+        """
+        Close a browser, ignoring errors from one that has already crashed.
+
+        Args:
+            pooled_browser (PooledBrowser): The browser to close.
+        """
+        try:
+            await pooled_browser.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {e}")
+
+    async def checkout_browser(self):
+        """
+        Take a browser from the pool, replacing it first if it has crashed, served too many pages or uses too much memory.
+
+        Returns:
+            PooledBrowser: A browser ready to serve a page.
+        """
+        pooled_browser = await self.available.get()
+        try:
+            if pooled_browser is not None:
+                reason = pooled_browser.needs_recycling(self.max_pages, self.max_memory_mb, self.memory_check_pages)
+                if reason:
+                    logger.info(f"Recycling browser: {reason}")
+                    self.browsers_recycled += 1
+                    await self.close_browser(pooled_browser)
+                    pooled_browser = None
+            if pooled_browser is None:
+                pooled_browser = await self.launch_browser()
+            return pooled_browser
+        except BaseException:
+            # Returns the slot so a failed or cancelled launch (e.g. a scrape timing out) doesn't shrink the pool.
+            self.available.put_nowait(None)
+            raise
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Yield a page in a new incognito context on one of the pool's browsers, restarting the browser once if it has died.
+
+        Yields:
+            Page: A Pyppeteer page.
+        """
+        pooled_browser = await self.checkout_browser()
+        context = None
+        try:
+            try:
+                context = await pooled_browser.browser.createIncognitoBrowserContext()
+                page = await context.newPage()
+            except Exception as e:
+                logger.warning(f"Browser failed to open a page, restarting it: {e}")
+                self.browsers_recycled += 1
+                pooled_browser.crashed = True
+                await self.close_browser(pooled_browser)
+                pooled_browser = await self.launch_browser()
+                context = await pooled_browser.browser.createIncognitoBrowserContext()
+                page = await context.newPage()
+            pooled_browser.pages_served += 1
+            yield page
+        finally:
+            # The slot is returned even if the scrape is cancelled while the context closes.
+            try:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.warning(f"Error closing incognito context: {e}")
+                        pooled_browser.crashed = True
+            finally:
+                self.available.put_nowait(pooled_browser)
+
+    async def close(self):
+        """
+        Close every browser in the pool.
+        """
+        while not self.available.empty():
+            pooled_browser = self.available.get_nowait()
+            if pooled_browser is not None:
+                await self.close_browser(pooled_browser)
@@ -0,0 +1,409 @@
+# utils/content_extraction_utils.py
+# This module turns raw HTML into readable article text without a browser, picks out the main article body,
+# and spots pages that are only a JavaScript shell or RSS entries that are only a teaser.
+
+import re
+from html.parser import HTMLParser
+from config.config_loader import load_config
+
+config = load_config()
+static_scrape_config = config.get('static_scraping', {})
+feed_content_config = config.get('feed_content', {})
+extraction_config = config.get('content_extraction', {})
+
+# Elements whose text is never part of the article.
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer", "aside", "form", "button", "select"}
+
+# Elements that never hold visible text, skipped even when measuring the whole page.
+NON_TEXT_TAGS = {"script", "style", "noscript", "template", "svg", "iframe"}
+
+# Elements that start a new line of text.
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+              "blockquote", "pre", "table", "tr", "td", "th", "br", "figcaption", "dd", "dt"}
+
+# Markers of pages that render everything client-side and ship an empty body.
+JS_SHELL_PATTERNS = [
+    r"enable javascript",
+    r"javascript is (?:required|disabled)",
+    r"<div[^>]+id=[\"'](?:root|app|__next)[\"'][^>]*>\s*</div>",
+]
+
+class TextExtractor(HTMLParser):
+    """
+    Collects the visible text of an HTML document, one line per block element.
+    """
+    def __init__(self, skipped_tags=SKIPPED_TAGS):
+        super().__init__(convert_charrefs=True)
+        self.skipped_tags = skipped_tags
+        self.lines = []
+        self.current = []
+        self.skip_depth = 0
+        self.title = ""
+        self.in_title = False
+
+    def flush(self):
+        line = " ".join("".join(self.current).split())
+        if line:
+            self.lines.append(line)
+        self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skipped_tags:
+            self.skip_depth += 1
+        elif tag == "title":
+            self.in_title = True
+        if tag in BLOCK_TAGS:
+            self.flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.skipped_tags and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag == "title":
+            self.in_title = False
+        if tag in BLOCK_TAGS:
+            self.flush()
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        elif not self.skip_depth:
+            self.current.append(data)
+
+    def close(self):
+        super().close()
+        self.flush()
+
+def html_to_text(html, skipped_tags=SKIPPED_TAGS):
+    """
+    Extract the visible text of an HTML page.
+
+    Args:
+        html (str): The HTML document.
+        skipped_tags (set, optional): Elements whose text is left out. Defaults to scripts, styles and page furniture.
+
+    Returns:
+        str: The page text, with one line per block element and the skipped elements removed.
+    """
+    extractor = TextExtractor(skipped_tags)
+    extractor.feed(html)
+    extractor.close()
+    return "\n".join(extractor.lines)
+
+def looks_like_js_shell(html, text, min_chars=None):
+    """
+    Check whether statically fetched HTML is missing its content, so the page needs a browser to render.
+
+    Args:
+        html (str): The raw HTML document.
+        text (str): The text extracted from it.
+        min_chars (int, optional): The shortest text accepted as an article. Defaults to static_scraping.min_text_chars.
+
+    Returns:
+        str or None: Why the page needs a browser, or None if the static text can be used.
+    """
+    min_chars = min_chars or static_scrape_config.get('min_text_chars', 500)
+    if not text.strip():
+        return "no text"
+    if len(text) < min_chars:
+        # Only check for shell markers on short pages; long articles may mention JavaScript in passing.
+        lowered = html.lower()
+        for pattern in JS_SHELL_PATTERNS:
+            if re.search(pattern, lowered):
+                return "JavaScript shell"
+        return f"text shorter than {min_chars} characters"
+    return None
+
+def is_full_article_text(text, settings=None):
+    """
+    Check whether text embedded in a feed entry is the whole article rather than a teaser, so the article doesn't need scraping.
+
+    Args:
+        text (str): The entry text, already converted from HTML.
+        settings (dict, optional): The feed content settings. Defaults to feed_content from config.yaml.
+
+    Returns:
+        bool: True if the text is at least feed_content.min_chars long and doesn't end with a "read more" style marker.
+    """
+    settings = feed_content_config if settings is None else settings
+    if not settings.get('enabled', True) or not text:
+        return False
+    if len(text) < settings.get('min_chars', 1500):
+        return False
+    ending = text[-200:].lower()
+    return not any(marker.lower() in ending for marker in settings.get('truncation_markers', []))
+
+# Elements that never have children, so they are not pushed onto the tree.
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+
+# Elements closed by the start of another element, as HTML's implied end tags do: each tag's start closes the nearest open
+# element of the listed tags, unless one of the scope tags is nearer. Without this, pages that never close their <p> or <li>
+# tags build a tree as deep as the page is long.
+IMPLIED_END_TAGS = {
+    "p": ({"p"}, {"div", "section", "article", "main", "blockquote", "li", "td", "th", "table"}),
+    "li": ({"li"}, {"ul", "ol"}),
+    "dt": ({"dt", "dd"}, {"dl"}),
+    "dd": ({"dt", "dd"}, {"dl"}),
+    "tr": ({"tr"}, {"table"}),
+    "td": ({"td", "th"}, {"tr", "table"}),
+    "th": ({"td", "th"}, {"tr", "table"}),
+    "option": ({"option"}, {"select"}),
+}
+
+# Elements whose text counts as a paragraph of the article.
+PARAGRAPH_TAGS = {"p", "pre", "blockquote", "td"}
+
+# Class and ID patterns of elements that are (or aren't) likely to hold the article body.
+POSITIVE_PATTERN = re.compile(r"article|body|content|entry|main|page|post|story|text", re.I)
+NEGATIVE_PATTERN = re.compile(
+    r"comment|cookie|consent|banner|related|recommend|share|social|newsletter|subscribe|promo|sponsor|sidebar|widget|"
+    r"popup|modal|masthead|breadcrumb|byline|author-bio|tags|advert|\bads?\b", re.I
+)
+
+# Starting scores by element type, as in Readability.
+TAG_SCORES = {"article": 10, "main": 10, "div": 5, "section": 5, "pre": 3, "td": 3, "blockquote": 3,
+              "ol": -3, "ul": -3, "dl": -3, "li": -3, "form": -3, "h1": -5, "h2": -5, "h3": -5, "h4": -5, "th": -5}
+
+class Node:
+    """
+    An element of a parsed HTML document, holding its child elements and text in document order.
+    """
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.parent = parent
+        self.children = []
+        attrs = dict(attrs)
+        self.class_and_id = f"{attrs.get('class') or ''} {attrs.get('id') or ''}"
+        self.score = None
+
+    def text(self):
+        return "".join(item for kind, item in walk(self) if kind == "text")
+
+    def link_text_length(self):
+        if self.tag == "a":
+            return len(" ".join(self.text().split()))
+        length = 0
+        link = None
+        parts = []
+        for kind, item in walk(self):
+            if kind == "start" and item.tag == "a" and link is None:
+                link = item
+                parts = []
+            elif kind == "text" and link is not None:
+                parts.append(item)
+            elif kind == "end" and item is link:
+                length += len(" ".join("".join(parts).split()))
+                link = None
+        return length
+
+    def lines(self):
+        """
+        Render the element's text as lines, starting a new line at each block element, in the same way as html_to_text.
+        """
+        lines = []
+        current = []
+
+        def flush():
+            line = " ".join("".join(current).split())
+            if line:
+                lines.append(line)
+            current.clear()
+
+        for kind, item in walk(self):
+            if kind == "text":
+                current.append(item)
+            elif item.tag in BLOCK_TAGS:
+                flush()
+        flush()
+        return lines
+
+def walk(node):
+    """
+    Yield the contents of an element in document order: ('text', string), and ('start', Node) and ('end', Node) around each child.
+    Uses a stack rather than recursion, as broken pages can nest thousands deep.
+    """
+    stack = [(node, iter(node.children))]
+    while stack:
+        parent, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if parent is not node:
+                yield "end", parent
+        elif isinstance(child, str):
+            yield "text", child
+        else:
+            yield "start", child
+            stack.append((child, iter(child.children)))
+
+class TreeBuilder(HTMLParser):
+    """
+    Builds a tree of Nodes from an HTML document, leaving out scripts, styles, page furniture and elements
+    whose class or ID marks them as comments, banners, share buttons and the like.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("root", [])
+        self.current = self.root
+        self.skip_depth = 0
+        self.skip_tags = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag == "br" and not self.skip_depth:
+                self.current.children.append(Node(tag, attrs, self.current))
+            return
+        if self.skip_depth:
+            if tag == self.skip_tags[-1]:
+                self.skip_depth += 1
+            return
+        if tag in IMPLIED_END_TAGS:
+            self.close_implied(tag)
+        node = Node(tag, attrs, self.current)
+        unlikely = NEGATIVE_PATTERN.search(node.class_and_id) and not POSITIVE_PATTERN.search(node.class_and_id)
+        if tag in SKIPPED_TAGS or (unlikely and tag not in ("html", "body", "article", "main")):
+            self.skip_tags.append(tag)
+            self.skip_depth = 1
+            return
+        self.current.children.append(node)
+        self.current = node
+
+    def close_implied(self, tag):
+        closed_tags, scope_tags = IMPLIED_END_TAGS[tag]
+        node = self.current
+        while node is not self.root and node.tag not in scope_tags:
+            if node.tag in closed_tags:
+                self.current = node.parent
+                return
+            node = node.parent
+
+    def handle_endtag(self, tag):
+        if self.skip_depth:
+            if tag == self.skip_tags[-1]:
+                self.skip_depth -= 1
+                if not self.skip_depth:
+                    self.skip_tags.pop()
+            return
+        # Closes the nearest open element with this tag, which also closes any elements left unclosed inside it.
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.current.children.append(data)
+
+def class_weight(node):
+    weight = 0
+    if NEGATIVE_PATTERN.search(node.class_and_id):
+        weight -= 25
+    if POSITIVE_PATTERN.search(node.class_and_id):
+        weight += 25
+    return weight
+
+def link_density(node, text_length):
+    return node.link_text_length() / text_length if text_length else 0
+
+def iter_nodes(node):
+    for kind, item in walk(node):
+        if kind == "start":
+            yield item
+
+def is_paragraph(node):
+    """
+    Paragraph elements, and divs or sections that only hold text and inline elements (many sites don't use <p>).
+    """
+    if node.tag in PARAGRAPH_TAGS:
+        return True
+    if node.tag in ("div", "section"):
+        return not any(isinstance(child, Node) and child.tag in BLOCK_TAGS and child.tag != "br" for child in node.children)
+    return False
+
+def find_article_node(root, settings):
+    """
+    Score the elements of a page by their paragraph text and link density, as Readability does,
+    and return the one most likely to hold the article body.
+
+    Returns:
+        tuple: The best candidate Node (or None) and the list of scored candidates.
+    """
+    min_paragraph_chars = settings.get('min_paragraph_chars', 25)
+    candidates = []
+    for node in iter_nodes(root):
+        if not is_paragraph(node):
+            continue
+        text = " ".join(node.text().split())
+        if len(text) < min_paragraph_chars:
+            continue
+        paragraph_score = 1 + text.count(",") + min(len(text) // 100, 3)
+        for ancestor, share in ((node.parent, 1), (node.parent.parent if node.parent else None, 0.5)):
+            if ancestor is None or ancestor is root:
+                continue
+            if ancestor.score is None:
+                ancestor.score = TAG_SCORES.get(ancestor.tag, 0) + class_weight(ancestor)
+                candidates.append(ancestor)
+            ancestor.score += paragraph_score * share
+
+    best = None
+    for candidate in candidates:
+        text_length = len(" ".join(candidate.text().split()))
+        candidate.score *= 1 - link_density(candidate, text_length)
+        if best is None or candidate.score > best.score:
+            best = candidate
+    return best, candidates
+
+def find_main_text(html, settings):
+    """
+    Return the text of the article body and the siblings kept with it, or None if extraction is disabled,
+    nothing scores or the text is shorter than content_extraction.min_extracted_chars.
+    """
+    text = None
+    if settings.get('enabled', True):
+        builder = TreeBuilder()
+        builder.feed(html)
+        builder.close()
+        best, _ = find_article_node(builder.root, settings)
+        if best is not None and best.parent is not None:
+            threshold = max(10, best.score * settings.get('sibling_score_ratio', 0.2))
+            lines = []
+            for sibling in best.parent.children:
+                if not isinstance(sibling, Node):
+                    continue
+                keep = sibling is best or (sibling.score is not None and sibling.score >= threshold)
+                if not keep and sibling.tag == "p":
+                    sibling_text = " ".join(sibling.text().split())
+                    keep = len(sibling_text) > 80 and link_density(sibling, len(sibling_text)) < 0.25
+                if keep:
+                    lines.extend(sibling.lines())
+            text = "\n".join(lines)
+        if text is not None and len(text) < settings.get('min_extracted_chars', 250):
+            text = None
+    return text
+
+def extract_main_content(html, settings=None):
+    """
+    Keep only the article body of a scraped page.
+
+    The best-scoring element is kept along with any siblings that score at least content_extraction.sibling_score_ratio of it
+    or are long paragraphs with few links, since articles are often split across several containers. If nothing scores or the
+    extracted text is shorter than content_extraction.min_extracted_chars, the page's full text is used instead.
+
+    Args:
+        html (str): The HTML of the page.
+        settings (dict, optional): The extraction settings. Defaults to content_extraction from config.yaml.
+
+    Returns:
+        tuple: The text to store, and a dictionary with the page's full text length ('content_original_chars')
+               and the stored text length ('content_extracted_chars'), in characters.
+    """
+    settings = extraction_config if settings is None else settings
+    full_text = html_to_text(html, NON_TEXT_TAGS)
+    try:
+        text = find_main_text(html, settings)
+    except Exception:
+        # Extraction is only an improvement on the full text, so a page it can't handle is stored whole rather than lost.
+        text = None
+    if text is None:
+        text = full_text
+    return text, {"content_original_chars": len(full_text), "content_extracted_chars": len(text)}
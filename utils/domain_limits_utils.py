@@ -0,0 +1,131 @@
+# utils/domain_limits_utils.py
+# This module provides per-domain scrape timeouts, derived from each domain's recent scrape times, and a per-domain rate limiter.
+
+import math
+import time
+import asyncio
+from contextvars import ContextVar
+from utils.domain_state_utils import get_domain_state, update_domain_state, domain_state_lock
+from config.config_loader import load_config
+
+config = load_config()
+scraping_config = config.get('scraping', {})
+
+# The event loop time by which the current scrape must finish, set by scrape_record so scrapers can size their own timeouts to fit.
+scrape_deadline = ContextVar('scrape_deadline', default=None)
+
+def percentile(values, fraction):
+    """
+    Return the value below which the given fraction of values fall (nearest-rank method).
+
+    Args:
+        values (list): The values.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The percentile value.
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+def domain_scrape_timeout(domain, settings=None):
+    """
+    Return the timeout for scraping a URL from a domain: its p95 scrape time times scraping.timeout_multiplier,
+    kept between scraping.min_timeout_seconds and scraping.max_timeout_seconds.
+
+    Args:
+        domain (str): The domain.
+        settings (dict, optional): The scraping settings. Defaults to scraping from config.yaml.
+
+    Returns:
+        float: The timeout in seconds. Domains with fewer than scraping.min_latency_samples scrapes get scraping.timeout_seconds.
+    """
+    settings = scraping_config if settings is None else settings
+    samples = get_domain_state(domain).get('scrape_seconds', [])
+    if len(samples) < settings.get('min_latency_samples', 5):
+        return settings.get('timeout_seconds', 20)
+    timeout = percentile(samples, 0.95) * settings.get('timeout_multiplier', 1.5)
+    return min(max(timeout, settings.get('min_timeout_seconds', 5)), settings.get('max_timeout_seconds', 45))
+
+def record_scrape_time(domain, seconds, timed_out=False, settings=None):
+    """
+    Add a scrape's duration to a domain's recent scrape times. A scrape that timed out is recorded at the timeout it hit,
+    which pushes the domain's p95 and so its next timeout up, until scraping.max_timeout_seconds.
+
+    Args:
+        domain (str): The domain.
+        seconds (float): How long the scrape took, or the timeout it hit.
+        timed_out (bool): Whether the scrape timed out.
+        settings (dict, optional): The scraping settings. Defaults to scraping from config.yaml.
+
+    Returns:
+        None
+    """
+    settings = scraping_config if settings is None else settings
+    with domain_state_lock:
+        state = get_domain_state(domain)
+        samples = (state.get('scrape_seconds', []) + [round(seconds, 2)])[-settings.get('latency_samples', 50):]
+        update_domain_state(domain, {
+            "scrape_seconds": samples,
+            "scrape_timeouts": state.get('scrape_timeouts', 0) + (1 if timed_out else 0)
+        })
+
+def scrape_time_left(default):
+    """
+    Return the seconds left before the current scrape's deadline.
+
+    Args:
+        default (float): The value returned when no deadline is set.
+
+    Returns:
+        float: The seconds left, or default outside scrape_record.
+    """
+    deadline = scrape_deadline.get()
+    if deadline is None:
+        return default
+    return max(deadline - asyncio.get_running_loop().time(), 0)
+
+class DomainRateLimiter:
+    """
+    Spaces out requests to each domain to at most its requests per minute (scraping.requests_per_minute_per_domain), after a short burst.
+    """
+    def __init__(self, settings=None):
+        """
+        Initialize the limiter.
+
+        Args:
+            settings (dict, optional): The scraping settings. Defaults to scraping from config.yaml.
+        """
+        settings = scraping_config if settings is None else settings
+        self.default_rate = settings.get('requests_per_minute_per_domain', 30)
+        self.domain_rates = settings.get('domain_requests_per_minute', {})
+        self.burst = settings.get('domain_burst', 2)
+        self.next_slot = {}
+        self.seconds_waited = 0
+
+    def interval(self, domain):
+        rate = self.domain_rates.get(domain, self.default_rate)
+        return 60 / rate if rate else 0
+
+    async def acquire(self, domain):
+        """
+        Wait until a request to the domain is allowed. Slots are handed out in the order requests arrive.
+
+        Args:
+            domain (str): The domain.
+
+        Returns:
+            float: The seconds waited.
+        """
+        interval = self.interval(domain)
+        if not interval:
+            return 0
+        now = time.monotonic()
+        # Up to burst requests may start at once, after which they are spaced interval seconds apart.
+        slot = max(self.next_slot.get(domain, now - interval * self.burst), now - interval * (self.burst - 1))
+        self.next_slot[domain] = slot + interval
+        wait = max(slot - now, 0)
+        if wait:
+            self.seconds_waited += wait
+            await asyncio.sleep(wait)
+        return wait
@@ -0,0 +1,80 @@
+# utils/domain_state_utils.py
+# This module stores per-domain scraping state as JSON objects in the local state database, cached in memory for the run.
+
+import json
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from utils.local_state_utils import get_local_state_connection, ensure_table
+
+DOMAIN_STATE_TABLE = """
+CREATE TABLE IF NOT EXISTS domain_state (
+    domain TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+_domain_states = None
+# Held while reading or updating domain states. Callers that read a state and write back a value derived from it hold it throughout.
+domain_state_lock = threading.RLock()
+
+def url_domain(url):
+    """
+    Return the domain of a URL, without any leading "www.".
+
+    Args:
+        url (str): The URL.
+
+    Returns:
+        str: The lowercased domain.
+    """
+    host = (urlsplit(url).hostname or "").lower()
+    return host[len("www."):] if host.startswith("www.") else host
+
+def get_domain_state(domain):
+    """
+    Return the stored state for a domain, loading all domain states from disk on first use.
+
+    Args:
+        domain (str): The domain.
+
+    Returns:
+        dict: The domain's state, or an empty dictionary if nothing is stored.
+    """
+    global _domain_states
+    with domain_state_lock:
+        if _domain_states is None:
+            connection = get_local_state_connection()
+            try:
+                ensure_table(connection, DOMAIN_STATE_TABLE)
+                _domain_states = {row['domain']: json.loads(row['state']) for row in connection.execute("SELECT domain, state FROM domain_state")}
+            finally:
+                connection.close()
+        return _domain_states.get(domain, {})
+
+def update_domain_state(domain, values):
+    """
+    Merge new values into a domain's state and persist it.
+
+    Args:
+        domain (str): The domain.
+        values (dict): The state values to merge in.
+
+    Returns:
+        dict: The domain's updated state.
+    """
+    with domain_state_lock:
+        state = {**get_domain_state(domain), **values}
+        _domain_states[domain] = state
+        connection = get_local_state_connection()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO domain_state (domain, state, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(domain) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                    (domain, json.dumps(state), datetime.now(timezone.utc).isoformat())
+                )
+        finally:
+            connection.close()
+        return state
@@ -0,0 +1,135 @@
+# utils/feed_health_utils.py
+# This module tracks each RSS feed's failures and response times in the rss_feed_health table, and backs off from feeds that keep failing.
+
+from datetime import datetime, timedelta, timezone
+from utils.db_utils import get_supabase_client, fetch_table_data
+from config.config_loader import load_config
+
+config = load_config()
+table_names = config.get('tables', {})
+health_config = config.get('feed_health', {})
+
+def load_feed_health():
+    """
+    Load the health rows for all feeds in one request.
+
+    Returns:
+        dict: A dictionary mapping each feed URL to its health row.
+    """
+    return {row['rss_feed']: row for row in fetch_table_data("rss_feed_health")}
+
+def save_feed_health(health_rows):
+    """
+    Write updated health rows back to the rss_feed_health table as a single upsert.
+
+    Args:
+        health_rows (list): The health rows to write, each with an 'rss_feed' key.
+
+    Returns:
+        None
+    """
+    if not health_rows:
+        return
+    supabase = get_supabase_client()
+    supabase.table(table_names['rss_feed_health']).upsert(health_rows, on_conflict="rss_feed").execute()
+
+def is_feed_in_backoff(health, now):
+    """
+    Check whether a feed is being skipped because it failed too many times in a row.
+
+    Args:
+        health (dict or None): The feed's health row.
+        now (datetime): The current UTC time.
+
+    Returns:
+        bool: True if the feed has a backoff_until time in the future.
+    """
+    if not health or not health.get('backoff_until'):
+        return False
+    return datetime.fromisoformat(health['backoff_until']) > now
+
+def record_feed_result(feed_url, health, succeeded, elapsed, error=None, now=None, settings=None):
+    """
+    Update a feed's health after a poll.
+
+    A success resets the failure count and closes the circuit. A failure increments the count, and once it reaches
+    failure_threshold the feed is backed off for backoff_base_minutes, doubling with each further failure up to backoff_max_minutes.
+
+    Args:
+        feed_url (str): The feed URL.
+        health (dict or None): The feed's current health row.
+        succeeded (bool): Whether the feed was downloaded and parsed without errors.
+        elapsed (float): The time the request took, in seconds.
+        error (str, optional): The error message for a failed poll.
+        now (datetime, optional): The current UTC time. Defaults to now.
+        settings (dict, optional): The health settings. Defaults to feed_health from config.yaml.
+
+    Returns:
+        dict: The updated health row.
+    """
+    settings = health_config if settings is None else settings
+    now = now or datetime.now(timezone.utc)
+    health = dict(health or {})
+    smoothing = settings.get('response_time_smoothing', 0.3)
+
+    previous_average = health.get('avg_response_seconds')
+    if previous_average is None:
+        health['avg_response_seconds'] = round(elapsed, 3)
+    else:
+        health['avg_response_seconds'] = round(smoothing * elapsed + (1 - smoothing) * previous_average, 3)
+
+    if succeeded:
+        health['consecutive_failures'] = 0
+        health['backoff_until'] = None
+        health['last_success_at'] = now.isoformat()
+    else:
+        failures = (health.get('consecutive_failures') or 0) + 1
+        health['consecutive_failures'] = failures
+        health['last_error'] = error
+        health['last_failure_at'] = now.isoformat()
+        threshold = settings.get('failure_threshold', 3)
+        if failures >= threshold:
+            backoff_minutes = min(
+                settings.get('backoff_base_minutes', 10) * 2 ** (failures - threshold),
+                settings.get('backoff_max_minutes', 1440)
+            )
+            health['backoff_until'] = (now + timedelta(minutes=backoff_minutes)).isoformat()
+
+    health['rss_feed'] = feed_url
+    health['updated_at'] = now.isoformat()
+    return health
+
+def feed_health_report(health_rows, limit=None):
+    """
+    List the feeds that are dragging the fetch cycle down: the slowest feeds by average response time and the feeds that are failing.
+
+    Args:
+        health_rows (iterable): Health rows for all feeds.
+        limit (int, optional): How many of the slowest feeds to list. Defaults to feed_health.report_size.
+
+    Returns:
+        dict: 'slowest' and 'failing' lists, each entry holding the feed URL and its health figures.
+    """
+    limit = limit or health_config.get('report_size', 10)
+    rows = list(health_rows)
+    slowest = sorted(rows, key=lambda row: row.get('avg_response_seconds') or 0, reverse=True)[:limit]
+    failing = sorted(
+        (row for row in rows if (row.get('consecutive_failures') or 0) > 0),
+        key=lambda row: row['consecutive_failures'],
+        reverse=True
+    )
+    return {
+        "slowest": [
+            {"feed": row['rss_feed'], "avg_response_seconds": row.get('avg_response_seconds')}
+            for row in slowest
+        ],
+        "failing": [
+            {
+                "feed": row['rss_feed'],
+                "consecutive_failures": row['consecutive_failures'],
+                "last_error": row.get('last_error'),
+                "backoff_until": row.get('backoff_until')
+            }
+            for row in failing
+        ]
+    }
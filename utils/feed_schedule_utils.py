@@ -0,0 +1,89 @@
+# utils/feed_schedule_utils.py
+# This module decides when each RSS feed should next be polled, from how often it publishes and how often polls find nothing new.
+
+import random
+import statistics
+from config.config_loader import load_config
+
+config = load_config()
+schedule_config = config.get('feed_scheduling', {})
+
+def is_feed_due(feed_state, now, settings=None):
+    """
+    Check whether a feed should be polled on this tick.
+
+    Args:
+        feed_state (dict): The stored state for the feed.
+        now (float): The current time as a Unix timestamp.
+        settings (dict, optional): The scheduling settings. Defaults to feed_scheduling from config.yaml.
+
+    Returns:
+        bool: True if the feed has never been scheduled, scheduling is disabled, or its next poll time has passed.
+    """
+    settings = schedule_config if settings is None else settings
+    if not settings.get('enabled', True):
+        return True
+    next_poll_at = feed_state.get('next_poll_at')
+    return next_poll_at is None or next_poll_at <= now
+
+def estimate_publish_interval(entry_timestamps):
+    """
+    Estimate how often a feed publishes from the timestamps of its entries.
+
+    Args:
+        entry_timestamps (list): Unix timestamps of the feed's entries. Entries without a timestamp should be left out.
+
+    Returns:
+        float or None: The median gap between consecutive entries in seconds, or None if there are fewer than two timestamps.
+    """
+    timestamps = sorted(set(entry_timestamps), reverse=True)
+    gaps = [newer - older for newer, older in zip(timestamps, timestamps[1:])]
+    if not gaps:
+        return None
+    return statistics.median(gaps)
+
+def schedule_next_poll(feed_state, entry_timestamps, new_entry_count, now, settings=None):
+    """
+    Work out the next poll time for a feed after a successful poll: a fraction of its publish interval if the poll found new entries,
+    or a longer interval (empty_poll_backoff) if it didn't.
+
+    Args:
+        feed_state (dict): The stored state for the feed.
+        entry_timestamps (list): Unix timestamps of the entries in the feed, or an empty list for a 304 response.
+        new_entry_count (int): The number of entries that were new to the database.
+        now (float): The current time as a Unix timestamp.
+        settings (dict, optional): The scheduling settings. Defaults to feed_scheduling from config.yaml.
+
+    Returns:
+        dict: State values to store for the feed: 'poll_interval_seconds', 'next_poll_at', 'publish_interval_seconds' and 'empty_polls'.
+    """
+    settings = schedule_config if settings is None else settings
+    min_interval = settings.get('min_interval_minutes', 2) * 60
+    max_interval = settings.get('max_interval_minutes', 240) * 60
+    jitter = settings.get('jitter_fraction', 0.1)
+
+    previous_interval = feed_state.get('poll_interval_seconds', min_interval)
+    publish_interval = estimate_publish_interval(entry_timestamps) or feed_state.get('publish_interval_seconds')
+
+    if new_entry_count > 0:
+        empty_polls = 0
+        if publish_interval:
+            interval = publish_interval * settings.get('poll_fraction', 0.5)
+        else:
+            interval = previous_interval / 2
+    else:
+        empty_polls = feed_state.get('empty_polls', 0) + 1
+        interval = previous_interval * settings.get('empty_poll_backoff', 1.5)
+        # A quiet spell can't push the interval far beyond how often the feed normally publishes.
+        if publish_interval:
+            interval = min(interval, publish_interval * 2)
+
+    interval = max(min_interval, min(max_interval, interval))
+    next_poll_at = now + interval * (1 + random.uniform(-jitter, jitter))
+
+    return {
+        "poll_interval_seconds": interval,
+        "next_poll_at": next_poll_at,
+        "publish_interval_seconds": publish_interval,
+        "empty_polls": empty_polls
+    }
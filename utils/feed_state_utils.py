@@ -0,0 +1,120 @@
+# utils/feed_state_utils.py
+# This module stores per-feed polling state, such as HTTP validators and the feed's watermark, as JSON objects in the local state database.
+
+import json
+import time
+from datetime import datetime, timezone
+from utils.local_state_utils import get_local_state_connection, ensure_table
+from config.config_loader import load_config
+
+config = load_config()
+watermark_config = config.get('feed_watermarks', {})
+
+FEED_STATE_TABLE = """
+CREATE TABLE IF NOT EXISTS feed_state (
+    feed_url TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+def load_feed_states(feed_urls):
+    """
+    Load the stored state for the given feeds.
+
+    Args:
+        feed_urls (list): The feed URLs to load state for.
+
+    Returns:
+        dict: A dictionary mapping each feed URL to its state dictionary. Feeds without stored state map to an empty dictionary.
+    """
+    states = {feed_url: {} for feed_url in feed_urls}
+    if not feed_urls:
+        return states
+
+    connection = get_local_state_connection()
+    try:
+        ensure_table(connection, FEED_STATE_TABLE)
+        rows = connection.execute("SELECT feed_url, state FROM feed_state").fetchall()
+        for row in rows:
+            if row['feed_url'] in states:
+                states[row['feed_url']] = json.loads(row['state'])
+    finally:
+        connection.close()
+    return states
+
+def save_feed_states(updates):
+    """
+    Merge new values into the stored state of each feed. Keys not present in an update are left untouched.
+
+    Args:
+        updates (dict): A dictionary mapping feed URLs to the state values to merge in.
+
+    Returns:
+        None
+    """
+    if not updates:
+        return
+
+    connection = get_local_state_connection()
+    try:
+        ensure_table(connection, FEED_STATE_TABLE)
+        now = datetime.now(timezone.utc).isoformat()
+        with connection:
+            for feed_url, values in updates.items():
+                row = connection.execute("SELECT state FROM feed_state WHERE feed_url = ?", (feed_url,)).fetchone()
+                state = json.loads(row['state']) if row else {}
+                state.update(values)
+                connection.execute(
+                    "INSERT INTO feed_state (feed_url, state, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(feed_url) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                    (feed_url, json.dumps(state), now)
+                )
+    finally:
+        connection.close()
+
+def is_entry_seen(watermark, entry_id, published):
+    """
+    Check whether a feed entry was already handled on an earlier poll.
+
+    Args:
+        watermark (dict): The feed's watermark, with 'published' (Unix timestamp) and 'entry_ids' (list).
+        entry_id (str): The entry's ID (its guid, or its link if it has none).
+        published (int or None): The entry's publish or update time as a Unix timestamp.
+
+    Returns:
+        bool: True if the entry's ID was seen before, or it is older than the newest entry seen before
+              by more than feed_watermarks.timestamp_grace_minutes (entries often appear in a feed a little after their publish time).
+    """
+    if not watermark:
+        return False
+    if entry_id in watermark.get('entry_ids', []):
+        return True
+    if published is None or watermark.get('published') is None:
+        return False
+    return published < watermark['published'] - watermark_config.get('timestamp_grace_minutes', 60) * 60
+
+def advance_watermark(watermark, entries):
+    """
+    Move a feed's watermark past the entries returned by this poll.
+
+    Args:
+        watermark (dict or None): The feed's current watermark.
+        entries (list): The new entries from this poll, each with '_entry_id' and '_published'.
+
+    Returns:
+        dict: The new watermark. Only the newest feed_watermarks.max_entry_ids IDs are kept, and the timestamp
+              never moves past the current time, so one entry with a future date can't hide everything after it.
+    """
+    watermark = watermark or {}
+    timestamps = [entry['_published'] for entry in entries if entry.get('_published') is not None]
+    if watermark.get('published') is not None:
+        timestamps.append(watermark['published'])
+
+    entry_ids = [entry['_entry_id'] for entry in entries if entry.get('_entry_id')]
+    entry_ids += [entry_id for entry_id in watermark.get('entry_ids', []) if entry_id not in entry_ids]
+
+    return {
+        "published": min(max(timestamps), time.time()) if timestamps else None,
+        "entry_ids": entry_ids[:watermark_config.get('max_entry_ids', 200)]
+    }
@@ -0,0 +1,259 @@
+# utils/fingerprint_utils.py
+# This module fingerprints article text with a 64-bit SimHash and keeps a local index of them,
+# so syndicated copies of a story can reuse the summary and tags of the copy already processed.
+
+import re
+import hashlib
+from datetime import datetime, timedelta, timezone
+from utils.local_state_utils import get_local_state_connection, ensure_table
+from config.config_loader import load_config
+
+config = load_config()
+table_names = config.get('tables', {})
+fingerprint_config = config.get('content_fingerprints', {})
+
+FINGERPRINT_BITS = 64
+# Two fingerprints within BANDS - 1 bits of each other always share at least one band exactly, so max_hamming_distance is capped at 3.
+BANDS = 4
+BAND_BITS = FINGERPRINT_BITS // BANDS
+
+FINGERPRINTS_TABLE = """
+CREATE TABLE IF NOT EXISTS content_fingerprints (
+    article_id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+)
+"""
+
+FINGERPRINT_BANDS_TABLE = """
+CREATE TABLE IF NOT EXISTS fingerprint_bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    article_id INTEGER NOT NULL,
+    PRIMARY KEY (band, value, article_id)
+)
+"""
+
+FINGERPRINTS_META_TABLE = """
+CREATE TABLE IF NOT EXISTS content_fingerprints_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+)
+"""
+
+def content_fingerprint(text, settings=None):
+    """
+    Compute the SimHash of an article's text from its overlapping word shingles.
+
+    Args:
+        text (str): The article text.
+        settings (dict, optional): The fingerprint settings. Defaults to content_fingerprints from config.yaml.
+
+    Returns:
+        str or None: The fingerprint as 16 hex characters, or None if fingerprinting is disabled or the text is shorter
+                     than content_fingerprints.min_chars (short texts match each other too easily).
+    """
+    settings = fingerprint_config if settings is None else settings
+    if not settings.get('enabled', True) or not text or len(text) < settings.get('min_chars', 500):
+        return None
+    words = re.findall(r"\w+", text.lower())
+    shingle_size = settings.get('shingle_words', 3)
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 1))]
+
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        shingle_hash = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if shingle_hash >> bit & 1 else -1
+    fingerprint = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    return f"{fingerprint:016x}"
+
+def hamming_distance(fingerprint_a, fingerprint_b):
+    """
+    Count the bits that differ between two fingerprints.
+
+    Args:
+        fingerprint_a (str): A fingerprint in hex.
+        fingerprint_b (str): Another fingerprint in hex.
+
+    Returns:
+        int: The number of differing bits, from 0 (identical) to 64.
+    """
+    return bin(int(fingerprint_a, 16) ^ int(fingerprint_b, 16)).count("1")
+
+def fingerprint_bands(fingerprint):
+    """
+    Split a fingerprint into BANDS values of BAND_BITS bits each.
+
+    Args:
+        fingerprint (str): The fingerprint in hex.
+
+    Returns:
+        list: (band number, band value) pairs.
+    """
+    value = int(fingerprint, 16)
+    mask = (1 << BAND_BITS) - 1
+    return [(band, value >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+def parse_timestamp(value):
+    """
+    Parse a timestamp returned by Supabase, which may end in 'Z' and have fewer than six digits of fractional seconds.
+    """
+    value = value.replace("Z", "+00:00")
+    match = re.match(r"(.*T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(.*)", value)
+    if match:
+        value = f"{match.group(1)}.{(match.group(2) or '').ljust(6, '0')[:6]}{match.group(3)}"
+    return datetime.fromisoformat(value)
+
+class FingerprintIndex:
+    """
+    A local index of the fingerprints of summarized articles, stored in the local state database.
+    New summaries are written through as they are made, and sync() pulls summaries made elsewhere from Supabase.
+    """
+    def __init__(self):
+        """
+        Open the index in the local state database.
+        """
+        self.connection = get_local_state_connection()
+        ensure_table(self.connection, FINGERPRINTS_TABLE)
+        ensure_table(self.connection, FINGERPRINT_BANDS_TABLE)
+        ensure_table(self.connection, FINGERPRINTS_META_TABLE)
+        row = self.connection.execute("SELECT value FROM content_fingerprints_meta WHERE key = 'synced_until'").fetchone()
+        self.synced_until = row['value'] if row else None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM content_fingerprints").fetchone()[0]
+
+    def add(self, article_id, fingerprint):
+        """
+        Add a summarized article's fingerprint to the index.
+
+        Args:
+            article_id (int): The article's ID in the summarizer_flow table.
+            fingerprint (str): The article's fingerprint.
+
+        Returns:
+            None
+        """
+        self.add_many([(article_id, fingerprint)])
+
+    def add_many(self, fingerprints):
+        """
+        Add the fingerprints of several summarized articles in one transaction.
+
+        Args:
+            fingerprints (list): (article ID, fingerprint) pairs.
+
+        Returns:
+            None
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO content_fingerprints (article_id, fingerprint) VALUES (?, ?)", fingerprints
+            )
+            self.connection.executemany(
+                "DELETE FROM fingerprint_bands WHERE article_id = ?", [(article_id,) for article_id, _ in fingerprints]
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO fingerprint_bands (band, value, article_id) VALUES (?, ?, ?)",
+                [(band, value, article_id) for article_id, fingerprint in fingerprints for band, value in fingerprint_bands(fingerprint)]
+            )
+
+    def find_duplicate(self, fingerprint, exclude_id=None, max_distance=None):
+        """
+        Find the indexed article whose fingerprint is closest to the given one, if it is close enough to be the same story.
+
+        Args:
+            fingerprint (str): The fingerprint to look up.
+            exclude_id (int, optional): An article ID to leave out, usually the article being looked up.
+            max_distance (int, optional): The most bits two duplicates may differ by. Defaults to content_fingerprints.max_hamming_distance.
+
+        Returns:
+            tuple or None: The matching article ID and its distance in bits, or None if no article is close enough.
+        """
+        max_distance = min(fingerprint_config.get('max_hamming_distance', 3) if max_distance is None else max_distance, BANDS - 1)
+        bands = fingerprint_bands(fingerprint)
+        conditions = " OR ".join(["(b.band = ? AND b.value = ?)"] * len(bands))
+        rows = self.connection.execute(
+            "SELECT DISTINCT f.article_id, f.fingerprint FROM fingerprint_bands b "
+            f"JOIN content_fingerprints f ON f.article_id = b.article_id WHERE {conditions}",
+            [part for band in bands for part in band]
+        ).fetchall()
+
+        best = None
+        for row in rows:
+            if row['article_id'] == exclude_id:
+                continue
+            distance = hamming_distance(fingerprint, row['fingerprint'])
+            if distance <= max_distance and (best is None or distance < best[1]):
+                best = (row['article_id'], distance)
+        return best
+
+    def sync(self, supabase, table_name=None):
+        """
+        Pull the fingerprints of articles summarized since the last sync, in order of summarized_at.
+        The first sync reads every summarized article by ID; later ones start content_fingerprints.sync_overlap_seconds before the last.
+
+        Args:
+            supabase (Client): The Supabase client to query.
+            table_name (str, optional): The table to sync from. Defaults to the summarizer_flow table.
+
+        Returns:
+            int: The number of rows read from the database.
+        """
+        table_name = table_name or table_names['summarizer_flow']
+        page_size = fingerprint_config.get('sync_page_size', 1000)
+        overlap = timedelta(seconds=fingerprint_config.get('sync_overlap_seconds', 300))
+        since = datetime.fromisoformat(self.synced_until) - overlap if self.synced_until else None
+        newest = self.synced_until
+        started = datetime.now(timezone.utc)
+        rows_read = 0
+        last_row = None
+
+        while True:
+            query = (
+                supabase.table(table_name).select("id, content_fingerprint, summarized_at")
+                .eq("summarized", True).not_.is_("content_fingerprint", "null")
+            )
+            if since is None:
+                query = query.order("id")
+                if last_row is not None:
+                    query = query.gt("id", last_row['id'])
+            else:
+                # Pages continue after the last (summarized_at, id) read, so articles summarized at the same moment aren't skipped.
+                query = query.order("summarized_at").order("id")
+                if last_row is None:
+                    query = query.gte("summarized_at", since.isoformat())
+                else:
+                    query = query.or_(
+                        f'summarized_at.gt."{last_row["summarized_at"]}",'
+                        f'and(summarized_at.eq."{last_row["summarized_at"]}",id.gt.{last_row["id"]})'
+                    )
+            rows = query.limit(page_size).execute().data or []
+            rows_read += len(rows)
+            # Each page is written in one transaction, as the first sync can read the whole table.
+            self.add_many([(row['id'], row['content_fingerprint']) for row in rows])
+            for row in rows:
+                if row.get('summarized_at') and (newest is None or parse_timestamp(row['summarized_at']) > parse_timestamp(newest)):
+                    newest = row['summarized_at']
+            if rows:
+                last_row = rows[-1]
+            if len(rows) < page_size:
+                break
+
+        if newest is None and since is None:
+            newest = (started - overlap).isoformat()
+        if newest is not None:
+            self.synced_until = parse_timestamp(newest).isoformat()
+            with self.connection:
+                self.connection.execute(
+                    "INSERT INTO content_fingerprints_meta (key, value) VALUES ('synced_until', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (self.synced_until,)
+                )
+        return rows_read
+
+    def close(self):
+        """
+        Close the connection to the local state database.
+        """
+        self.connection.close()
@@ -0,0 +1,167 @@
+# utils/hedging_utils.py
+# This module hedges slow LLM requests: a request the provider hasn't answered by its usual latency is also sent to the next provider,
+# and the first answer is used.
+
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.domain_limits_utils import percentile
+from config.config_loader import load_config
+
+config = load_config()
+hedging_config = config.get('llm_hedging', {})
+
+# The event set when the current hedged request is sent to its provider, or None outside a hedged request.
+_request_sent = contextvars.ContextVar('request_sent', default=None)
+
+def mark_request_sent():
+    """
+    Signal that the current request has finished waiting for its turn and is being sent to the provider,
+    which starts the hedge delay. Does nothing outside a hedged request.
+    """
+    sent = _request_sent.get()
+    if sent is not None:
+        sent.set()
+
+def signalling(request, sent):
+    """
+    Wrap a request so mark_request_sent() within it sets the given event.
+    """
+    def run():
+        _request_sent.set(sent)
+        return request()
+    return run
+
+class RequestHedger:
+    """
+    Recent latencies per provider and the hedged calls made from them. Latencies are kept for this process only,
+    so hedging starts once a provider has llm_hedging.min_samples successful calls in the run.
+    """
+    def __init__(self, settings=None):
+        """
+        Initialize the hedger.
+
+        Args:
+            settings (dict, optional): The hedging settings. Defaults to llm_hedging from config.yaml.
+        """
+        settings = hedging_config if settings is None else settings
+        self.enabled = settings.get('enabled', False)
+        self.latency_percentile = settings.get('latency_percentile', 0.9)
+        self.min_samples = settings.get('min_samples', 10)
+        self.latency_samples = settings.get('latency_samples', 200)
+        self.max_hedge_fraction = settings.get('max_hedge_fraction', 0.1)
+        self.max_threads = settings.get('max_threads', 16)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.latencies = {}
+        self.requests = 0
+        self.hedged = 0
+        self.backup_wins = 0
+
+    def record(self, provider, seconds):
+        """
+        Add a successful call's latency to its provider's recent latencies.
+
+        Args:
+            provider (str): The provider key, 'client_type/model'.
+            seconds (float): How long the call took.
+        """
+        with self.lock:
+            self.latencies.setdefault(provider, deque(maxlen=self.latency_samples)).append(seconds)
+
+    def hedge_delay(self, provider):
+        """
+        Return how long to wait for a provider before hedging.
+
+        Args:
+            provider (str): The provider key.
+
+        Returns:
+            float or None: The provider's latency percentile in seconds, or None if it has too few recent calls to judge.
+        """
+        with self.lock:
+            samples = list(self.latencies.get(provider, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, self.latency_percentile)
+
+    def call(self, primary, primary_provider, backup, failed=None):
+        """
+        Call primary, hedging with backup if it hasn't answered by primary_provider's hedge delay and the budget allows.
+
+        Args:
+            primary (function): The request to the first provider, taking no arguments.
+            primary_provider (str): The first provider's key, whose latencies set the hedge delay.
+            backup (function): The same request to the next provider, taking no arguments.
+            failed (list, optional): 1 is appended to this if the request was hedged and the backup failed before the result was known,
+                                     so the caller doesn't retry on the backup.
+
+        Returns:
+            tuple: The first successful result, and 0 if it came from primary or 1 if it came from backup.
+                   If both requests fail, primary's exception is raised.
+        """
+        delay = self.hedge_delay(primary_provider) if self.enabled else None
+        with self.lock:
+            self.requests += 1
+        if delay is None:
+            return primary(), 0
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="llm-hedge")
+            executor = self.executor
+        # Requests run with a copy of the caller's context, so a response format it expects is still checked (see expect_response_format).
+        sent = threading.Event()
+        primary_future = executor.submit(contextvars.copy_context().run, signalling(primary, sent))
+        # Requests answered without being sent, such as cache hits or rate limit rejections, end the wait as well.
+        primary_future.add_done_callback(lambda future: sent.set())
+        sent.wait()
+        done, _ = wait([primary_future], timeout=delay)
+        if done:
+            return primary_future.result(), 0
+        with self.lock:
+            # Hedges are counted against every request made, so bursts of slow calls can't hedge more than the budget.
+            allowed = self.hedged + 1 <= self.max_hedge_fraction * self.requests
+            if allowed:
+                self.hedged += 1
+        if not allowed:
+            return primary_future.result(), 0
+
+        futures = [primary_future, executor.submit(contextvars.copy_context().run, backup)]
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None and future is not primary_future and failed is not None:
+                    failed.append(1)
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    winner = futures.index(future)
+                    if winner:
+                        with self.lock:
+                            self.backup_wins += 1
+                    return future.result(), winner
+        return primary_future.result(), 0
+
+    def stats(self):
+        """
+        Return the hedging counters for this process.
+
+        Returns:
+            dict: The requests seen, the requests hedged and their share, how often the backup answered first,
+                  and each provider's current hedge delay in seconds.
+        """
+        with self.lock:
+            counters = {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedged_fraction": round(self.hedged / self.requests, 3) if self.requests else None,
+                "backup_wins": self.backup_wins
+            }
+            providers = list(self.latencies)
+        counters["hedge_delay_seconds"] = {
+            provider: round(self.hedge_delay(provider), 3) if self.hedge_delay(provider) is not None else None for provider in providers
+        }
+        return counters
@@ -0,0 +1,205 @@
+# utils/llm_cache_utils.py
+# This module caches LLM responses on the local disk, so a prompt that was already answered isn't paid for again.
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from utils.local_state_utils import get_local_state_connection, ensure_table
+from config.config_loader import load_config
+
+config = load_config()
+llm_cache_config = config.get('llm_cache', {})
+
+LLM_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+)
+"""
+
+def text_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def llm_cache_key(client_type, model, max_tokens, temperature, systemPrompt, content):
+    """
+    Build the cache key for an LLM request.
+
+    Args:
+        client_type (str): The type of client (e.g., 'groq', 'anthropic', 'gemini').
+        model (str): The model.
+        max_tokens (int): The maximum number of tokens.
+        temperature (float): The temperature setting.
+        systemPrompt (str): The system prompt.
+        content (str): The content sent to the model.
+
+    Returns:
+        str: A SHA-256 hex digest identifying the request.
+    """
+    parts = [client_type, model, max_tokens, temperature, text_hash(systemPrompt), text_hash(content)]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+def is_cacheable(temperature, settings=None):
+    """
+    Check whether responses to a request with this temperature should be cached.
+
+    Args:
+        temperature (float): The request's temperature setting.
+        settings (dict, optional): The cache settings. Defaults to llm_cache from config.yaml.
+
+    Returns:
+        bool: False if the cache is disabled, or if the temperature is above 0 and llm_cache.cache_nonzero_temperature is off.
+    """
+    settings = llm_cache_config if settings is None else settings
+    if not settings.get('enabled', True):
+        return False
+    return not temperature or settings.get('cache_nonzero_temperature', True)
+
+class LLMResponseCache:
+    """
+    LLM responses stored in the local state database. If the database can't be used, lookups miss and stores are skipped.
+    """
+    def __init__(self, settings=None):
+        """
+        Initialize the cache.
+
+        Args:
+            settings (dict, optional): The cache settings. Defaults to llm_cache from config.yaml.
+        """
+        settings = llm_cache_config if settings is None else settings
+        self.ttl_seconds = settings.get('ttl_hours', 168) * 3600
+        self.max_bytes = settings.get('max_size_mb', 100) * 1024 * 1024
+        self.lock = threading.Lock()
+        self.table_ready = False
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def connect(self):
+        connection = get_local_state_connection()
+        if not self.table_ready:
+            ensure_table(connection, LLM_CACHE_TABLE)
+            self.table_ready = True
+        return connection
+
+    def count(self, counter, amount=1):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): The request's cache key (see llm_cache_key).
+
+        Returns:
+            str or None: The cached response, or None if there is none younger than llm_cache.ttl_hours.
+        """
+        now = time.time()
+        try:
+            connection = self.connect()
+            try:
+                with connection:
+                    row = connection.execute(
+                        "SELECT response FROM llm_response_cache WHERE key = ? AND created_at >= ?", (key, now - self.ttl_seconds)
+                    ).fetchone()
+                    if row is not None:
+                        connection.execute("UPDATE llm_response_cache SET last_used_at = ? WHERE key = ?", (now, key))
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            self.count("errors")
+            row = None
+        self.count("hits" if row is not None else "misses")
+        return row['response'] if row is not None else None
+
+    def put(self, key, response):
+        """
+        Store a response, then evict expired responses and, if the cache is over llm_cache.max_size_mb, the least recently used ones.
+
+        Args:
+            key (str): The request's cache key.
+            response (str): The response text. Anything else is not cached.
+
+        Returns:
+            None
+        """
+        if not isinstance(response, str):
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            connection = self.connect()
+            try:
+                with connection:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO llm_response_cache (key, response, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, response, size, now, now)
+                    )
+                    evicted = self.evict(connection, now)
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            self.count("errors")
+            return
+        self.count("stores")
+        self.count("evictions", evicted)
+
+    def evict(self, connection, now):
+        evicted = connection.execute("DELETE FROM llm_response_cache WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM llm_response_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return evicted
+        keys = []
+        for row in connection.execute("SELECT key, size FROM llm_response_cache ORDER BY last_used_at"):
+            if total <= self.max_bytes:
+                break
+            keys.append((row['key'],))
+            total -= row['size']
+        connection.executemany("DELETE FROM llm_response_cache WHERE key = ?", keys)
+        return evicted + len(keys)
+
+    def discard(self, key):
+        """
+        Remove a response, so the request is sent to the LLM again next time. Used when a cached response turned out to be unusable.
+
+        Args:
+            key (str): The request's cache key.
+
+        Returns:
+            None
+        """
+        try:
+            connection = self.connect()
+            try:
+                with connection:
+                    connection.execute("DELETE FROM llm_response_cache WHERE key = ?", (key,))
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            self.count("errors")
+
+    def stats(self):
+        """
+        Return the cache's counters for this process.
+
+        Returns:
+            dict: Hits, misses, the hit rate, responses stored, responses evicted and database errors.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "errors": self.errors
+            }
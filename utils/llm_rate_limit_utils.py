@@ -0,0 +1,245 @@
+# utils/llm_rate_limit_utils.py
+# This module keeps every process using an LLM provider within its requests and tokens per minute, with token buckets
+# shared through the local state database or Redis.
+
+import json
+import time
+import threading
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from utils.local_state_utils import get_local_state_connection, ensure_table
+from config.config_loader import load_config
+
+config = load_config()
+rate_limit_config = config.get('llm_rate_limits', {})
+
+RATE_LIMIT_TABLE = """
+CREATE TABLE IF NOT EXISTS llm_rate_limits (
+    provider TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+)
+"""
+
+class LLMRateLimitExceeded(Exception):
+    """
+    Raised when a provider has no capacity within llm_rate_limits.max_wait_seconds, so the caller can move on to the next provider.
+    """
+
+def take_from_buckets(state, limits, tokens, now):
+    """
+    Refill a provider's buckets for the time since they were last used, and take one request and the given tokens if both are available.
+
+    Args:
+        state (dict or None): The buckets: 'requests', 'tokens', 'updated_at' and 'blocked_until'. None for buckets not used yet, which start full.
+        limits (dict): The provider's 'requests_per_minute' and 'tokens_per_minute'. A missing or zero limit isn't enforced.
+        tokens (int): The tokens the request is estimated to use.
+        now (float): The current time, in seconds since the epoch.
+
+    Returns:
+        tuple: The updated buckets, and the seconds to wait before trying again (0 if the request was taken).
+    """
+    state = dict(state or {"requests": None, "tokens": None, "updated_at": now, "blocked_until": 0})
+    elapsed = max(now - state["updated_at"], 0)
+    waits = [max(state["blocked_until"] - now, 0)]
+    needed = {"requests": 1, "tokens": tokens}
+    for name, limit in (("requests", limits.get('requests_per_minute')), ("tokens", limits.get('tokens_per_minute'))):
+        if not limit:
+            continue
+        available = limit if state[name] is None else min(state[name] + elapsed * limit / 60, limit)
+        state[name] = available
+        # A request bigger than a whole minute's tokens can never fit, so it waits for a full bucket instead.
+        needed[name] = min(needed[name], limit)
+        if available < needed[name]:
+            waits.append((needed[name] - available) * 60 / limit)
+    state["updated_at"] = now
+    wait = max(waits)
+    if wait == 0:
+        for name in ("requests", "tokens"):
+            if state[name] is not None:
+                state[name] -= needed[name]
+    return state, wait
+
+def retry_after_seconds(error, now=None):
+    """
+    Read the Retry-After header from a provider's error response, if the SDK's exception carries one.
+
+    Args:
+        error (Exception): The exception.
+        now (float, optional): The current time, used for headers given as a date. Defaults to time.time().
+
+    Returns:
+        float or None: The seconds to wait, or None if there is no usable Retry-After header.
+    """
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    value = headers.get('retry-after') if hasattr(headers, 'get') else None
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(retry_at.timestamp() - (time.time() if now is None else now), 0)
+
+class SQLiteBucketStore:
+    """
+    Buckets in the local state database, shared by every process on this server. Each update runs in an immediate transaction,
+    so two processes can't take the same capacity.
+    """
+    def __init__(self):
+        self.table_ready = False
+
+    def update(self, provider, change):
+        """
+        Apply change to a provider's buckets atomically.
+
+        Args:
+            provider (str): The provider.
+            change (function): Takes the stored buckets (or None) and returns the new buckets and a result.
+
+        Returns:
+            object: The result returned by change.
+        """
+        connection = get_local_state_connection()
+        try:
+            if not self.table_ready:
+                ensure_table(connection, RATE_LIMIT_TABLE)
+                self.table_ready = True
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT state FROM llm_rate_limits WHERE provider = ?", (provider,)).fetchone()
+            state, result = change(json.loads(row['state']) if row else None)
+            connection.execute(
+                "INSERT INTO llm_rate_limits (provider, state) VALUES (?, ?) ON CONFLICT(provider) DO UPDATE SET state = excluded.state",
+                (provider, json.dumps(state))
+            )
+            connection.commit()
+        finally:
+            connection.close()
+        return result
+
+class RedisBucketStore:
+    """
+    Buckets in Redis, shared by processes on every server using the same API keys. Needs the redis package.
+    """
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def update(self, provider, change):
+        """
+        Apply change to a provider's buckets atomically (see SQLiteBucketStore.update).
+        """
+        key = f"llm_rate_limits:{provider}"
+        with self.client.lock(f"{key}:lock", timeout=5, blocking_timeout=5):
+            stored = self.client.get(key)
+            state, result = change(json.loads(stored) if stored else None)
+            # Buckets unused for an hour are full again anyway, so they can expire.
+            self.client.set(key, json.dumps(state), ex=3600)
+        return result
+
+class LLMRateLimiter:
+    """
+    Requests and tokens per minute for each provider, from llm_rate_limits.per_provider. Providers without limits aren't limited
+    by rate, but are still paused when they answer 429 with a Retry-After header.
+    """
+    def __init__(self, settings=None, store=None):
+        """
+        Initialize the limiter.
+
+        Args:
+            settings (dict, optional): The rate limit settings. Defaults to llm_rate_limits from config.yaml.
+            store (object, optional): The bucket store. Defaults to the llm_rate_limits.backend store, created on first use.
+        """
+        settings = rate_limit_config if settings is None else settings
+        self.enabled = settings.get('enabled', True)
+        self.per_provider = settings.get('per_provider', {})
+        self.max_wait_seconds = settings.get('max_wait_seconds', 30)
+        self.backend = settings.get('backend', 'sqlite')
+        self.redis_url = settings.get('redis_url', 'redis://localhost:6379/0')
+        self.store = store
+        self.lock = threading.Lock()
+        self.counters = {"waits": 0, "seconds_waited": 0.0, "rejected": 0, "retry_after_pauses": 0}
+
+    def get_store(self):
+        with self.lock:
+            if self.store is None:
+                self.store = RedisBucketStore(self.redis_url) if self.backend == 'redis' else SQLiteBucketStore()
+            return self.store
+
+    def count(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def acquire(self, provider, tokens):
+        """
+        Take one request and the estimated tokens from a provider's buckets, waiting for capacity if there is none.
+
+        Args:
+            provider (str): The provider's client type, e.g. 'groq'.
+            tokens (int): The tokens the request is estimated to use.
+
+        Returns:
+            float: The seconds waited.
+
+        Raises:
+            LLMRateLimitExceeded: If the provider has no capacity within llm_rate_limits.max_wait_seconds.
+        """
+        if not self.enabled:
+            return 0
+        # Providers without limits still go through their buckets, so a Retry-After pause holds them back too.
+        limits = self.per_provider.get(provider) or {}
+        waited = 0
+        while True:
+            wait = self.get_store().update(provider, lambda state: take_from_buckets(state, limits, tokens, time.time()))
+            if wait == 0:
+                if waited:
+                    self.count("waits")
+                    self.count("seconds_waited", waited)
+                return waited
+            if waited + wait > self.max_wait_seconds:
+                self.count("rejected")
+                raise LLMRateLimitExceeded(
+                    f"{provider} rate limit reached: no capacity within {self.max_wait_seconds} seconds (next in {wait:.1f} seconds)"
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, provider, seconds):
+        """
+        Stop every process calling a provider for the given time, as asked for by its Retry-After header.
+
+        Args:
+            provider (str): The provider's client type.
+            seconds (float): How long to pause for.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+
+        def block(state):
+            state = dict(state or {"requests": None, "tokens": None, "updated_at": time.time(), "blocked_until": 0})
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+            return state, None
+
+        self.get_store().update(provider, block)
+        self.count("retry_after_pauses")
+
+    def stats(self):
+        """
+        Return the rate limit counters for this process.
+
+        Returns:
+            dict: Calls that waited for capacity, the total seconds waited, calls rejected after max_wait_seconds,
+                  and pauses made for Retry-After headers.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+        counters["seconds_waited"] = round(counters["seconds_waited"], 3)
+        return counters
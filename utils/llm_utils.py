@@ -5,8 +5,419 @@
 # Add new LLMs here as you use them, don't put them in other scripts
 
 import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from utils.llm_cache_utils import LLMResponseCache, llm_cache_key, is_cacheable
+from utils.provider_router_utils import ProviderRouter, is_rate_limit_error
+from utils.hedging_utils import RequestHedger, mark_request_sent
+from utils.adaptive_concurrency_utils import AdaptiveLimit, is_timeout_error
+from utils.llm_rate_limit_utils import LLMRateLimiter, LLMRateLimitExceeded, retry_after_seconds
+from utils.token_utils import estimate_tokens
+from utils.stream_format_utils import StreamFormatError
+from config.config_loader import load_config
 
-def call_llm_api(model, content, systemPrompt, max_tokens=4000, temperature=1, client_type="default"):
+config = load_config()
+llm_concurrency_config = config.get('llm_concurrency', {})
+llm_providers_config = config.get('llm_providers', {})
+llm_streaming_config = config.get('llm_streaming', {})
+
+# The response tokens requested when a caller doesn't set max_tokens.
+DEFAULT_MAX_TOKENS = 4000
+
+# Providers whose streams can be closed when a response is stopped early. The Gemini SDK doesn't expose a way to cancel
+# a streamed response, so one stopped early would keep generating (and billing) in the background; Gemini isn't streamed.
+STREAMING_CLIENT_TYPES = {"groq", "anthropic", "replicate", "togetherai"}
+
+_clients = {}
+_client_lock = threading.Lock()
+_client_stats = {}
+_provider_limits = {}
+_response_cache = LLMResponseCache()
+_router = ProviderRouter()
+_hedger = RequestHedger()
+_rate_limiter = LLMRateLimiter()
+# The cache key of the last response each thread got from call_llm_api, so a caller can discard a response it couldn't use.
+_last_response = threading.local()
+# The validator class streamed responses are checked with, set by callers that expect a format (see expect_response_format).
+_stream_validator = ContextVar('stream_validator', default=None)
+
+def create_llm_client(client_type, *settings):
+    """
+    Create the SDK client for a provider.
+
+    Args:
+        client_type (str): The type of client (e.g., 'groq', 'anthropic', 'gemini').
+        *settings: Settings that need their own client. Gemini models are built with their model name, generation config
+                   and system prompt, so they take (model, max_tokens, temperature, systemPrompt).
+
+    Returns:
+        object: The client.
+    """
+    if client_type == "groq":
+        from groq import Groq
+        return Groq(api_key=os.getenv("GROQ_API_KEY"))
+    elif client_type == "anthropic":
+        from anthropic import Anthropic
+        return Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    elif client_type == "gemini":
+        from google.generativeai import GenerativeModel
+        from google.generativeai import configure
+        from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
+        model, max_tokens, temperature, systemPrompt = settings
+        # configure() sets up the process-wide Gemini transport, so it only needs to run before the first model is built.
+        if not any(key[0] == "gemini" for key in _clients):
+            configure(api_key=os.environ["GEMINI_API_KEY"])
+
+        generation_config = {
+            "temperature": temperature, 
+            "top_p": 0.95,
+            "top_k": 64,
+            "max_output_tokens": max_tokens, 
+            "response_mime_type": "text/plain",
+        }
+
+        return GenerativeModel( 
+            model_name=model,
+            generation_config=generation_config,
+            system_instruction=systemPrompt, 
+            safety_settings={
+                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+        }
+        )
+    elif client_type == "replicate":
+        import replicate
+        return replicate.Client(api_token=os.getenv("REPLICATE_API_KEY"))
+    elif client_type == "togetherai":
+        from openai import OpenAI
+        return OpenAI(
+            api_key=os.getenv("TOGETHERAI_API_KEY"),  
+            base_url="https://api.together.xyz/v1",
+        )
+    else:
+        raise ValueError(f"Unsupported client type: {client_type}")
+
+def provider_stats(client_type):
+    return _client_stats.setdefault(client_type, {
+        "clients_created": 0, "calls": 0, "errors": 0, "total_seconds": 0.0, "first_call_seconds": None,
+        "streamed": 0, "stream_aborts": 0, "total_ttft_seconds": 0.0, "ttft_samples": 0
+    })
+
+def get_llm_client(client_type, *settings):
+    """
+    Return the shared client for a provider and settings, creating it on first use. Clients are kept for the life of the process.
+
+    Args:
+        client_type (str): The type of client (e.g., 'groq', 'anthropic', 'gemini').
+        *settings: Settings that need their own client (see create_llm_client).
+
+    Returns:
+        object: The client.
+    """
+    key = (client_type, *settings)
+    with _client_lock:
+        if key not in _clients:
+            client = create_llm_client(client_type, *settings)
+            _clients[key] = client
+            provider_stats(client_type)["clients_created"] += 1
+        return _clients[key]
+
+def provider_limit(client_type):
+    """
+    Return the limit on a provider's calls in flight. It starts at llm_concurrency.per_provider (or llm_concurrency.default)
+    and is adjusted from each call's outcome while llm_concurrency.adaptive.enabled is set.
+
+    Args:
+        client_type (str): The type of client.
+
+    Returns:
+        AdaptiveLimit: The provider's limit.
+    """
+    with _client_lock:
+        if client_type not in _provider_limits:
+            limit = llm_concurrency_config.get('per_provider', {}).get(client_type, llm_concurrency_config.get('default', 4))
+            _provider_limits[client_type] = AdaptiveLimit(client_type, limit)
+        return _provider_limits[client_type]
+
+def llm_concurrency_stats():
+    """
+    Return each provider's current limit on calls in flight and the adjustments made to it in this process.
+    """
+    with _client_lock:
+        limits = dict(_provider_limits)
+    return {client_type: limit.stats() for client_type, limit in limits.items()}
+
+def record_llm_call(client_type, elapsed, succeeded):
+    """
+    Add a call's latency to its provider's statistics.
+
+    Args:
+        client_type (str): The type of client.
+        elapsed (float): The time the call took, in seconds.
+        succeeded (bool): Whether the call returned a response.
+    """
+    with _client_lock:
+        stats = provider_stats(client_type)
+        stats["calls"] += 1
+        stats["total_seconds"] += elapsed
+        if not succeeded:
+            stats["errors"] += 1
+        # The first call on a new client includes the connection setup, so comparing it with the average shows what reuse saves.
+        if stats["first_call_seconds"] is None:
+            stats["first_call_seconds"] = round(elapsed, 3)
+
+def record_llm_stream(client_type, ttft, aborted):
+    """
+    Add a streamed call's time to first token to its provider's statistics.
+
+    Args:
+        client_type (str): The type of client.
+        ttft (float or None): The seconds until the first text arrived, or None if none did.
+        aborted (bool): Whether the stream was stopped because the response couldn't be parsed.
+    """
+    with _client_lock:
+        stats = provider_stats(client_type)
+        stats["streamed"] += 1
+        if aborted:
+            stats["stream_aborts"] += 1
+        if ttft is not None:
+            stats["total_ttft_seconds"] += ttft
+            stats["ttft_samples"] += 1
+
+def llm_client_stats():
+    """
+    Return per-provider client and latency statistics for this process.
+
+    Returns:
+        dict: For each provider, the clients created, calls made, errors, average call latency in seconds,
+              the latency of the first call (which included the connection setup), and for streamed calls,
+              the average time to first token and the streams stopped for being off-format.
+    """
+    with _client_lock:
+        return {
+            client_type: {
+                "clients_created": stats["clients_created"],
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "avg_seconds": round(stats["total_seconds"] / stats["calls"], 3) if stats["calls"] else None,
+                "first_call_seconds": stats["first_call_seconds"],
+                "streamed": stats["streamed"],
+                "avg_ttft_seconds": round(stats["total_ttft_seconds"] / stats["ttft_samples"], 3) if stats["ttft_samples"] else None,
+                "stream_aborts": stats["stream_aborts"]
+            }
+            for client_type, stats in _client_stats.items()
+        }
+
+def llm_cache_stats():
+    """
+    Return the response cache's hit, miss and eviction counters for this process.
+    """
+    return _response_cache.stats()
+
+def discard_cached_llm_response():
+    """
+    Remove the last response this thread got from call_llm_api from the cache, so a response that couldn't be parsed
+    is requested again when the article is retried instead of being served from the cache.
+    """
+    key = getattr(_last_response, 'cache_key', None)
+    if key is not None:
+        _response_cache.discard(key)
+        _last_response.cache_key = None
+
+def provider_key(client_type, model):
+    return f"{client_type}/{model}"
+
+def implementation_provider(task_name, implementation):
+    """
+    Return the llm_providers name of a task's implementation, e.g. 'groq_llama8b' for 'summarizer_groq_llama8b'.
+    """
+    return implementation[len(task_name) + 1:] if implementation and implementation.startswith(f"{task_name}_") else implementation
+
+def provider_call_func(provider_name):
+    """
+    Build an api_call_func for a provider listed under llm_providers in config.yaml.
+
+    Args:
+        provider_name (str): The provider's name, e.g. 'groq_llama8b'.
+
+    Returns:
+        function: A function taking (content, systemPrompt) that calls the provider's model.
+    """
+    settings = dict(llm_providers_config[provider_name])
+    model = settings.pop('model')
+    # The context window is only used to size requests (see request_token_budget), not passed to the provider.
+    settings.pop('context_tokens', None)
+    return lambda content, systemPrompt: call_llm_api(model, content, systemPrompt, **settings)
+
+def fallback_providers(task_name, script_name):
+    """
+    List the providers that come after a script in the task's primary and fallbacks under interfaces in config.yaml,
+    so an article that fails on the script's own provider can be retried on the next one straight away, in the same process.
+
+    Args:
+        task_name (str): The task, e.g. 'summarizer' or 'tagging'.
+        script_name (str): The running script's file name, e.g. 'summarizer_gemini_flash.py'.
+
+    Returns:
+        list: (script file name, api_call_func) pairs in fallback order. Implementations without an llm_providers entry are skipped,
+              and a script that isn't listed under interfaces, such as a test, gets no fallbacks.
+    """
+    task_config = config.get('interfaces', {}).get(task_name, {})
+    implementations = [task_config.get('primary')] + list(task_config.get('fallbacks', []))
+    current = os.path.splitext(script_name or "")[0]
+    if current not in implementations:
+        return []
+    implementations = implementations[implementations.index(current) + 1:]
+    providers = []
+    for implementation in implementations:
+        provider_name = implementation_provider(task_name, implementation)
+        if provider_name in llm_providers_config:
+            providers.append((f"{implementation}.py", provider_call_func(provider_name)))
+    return providers
+
+def script_provider_key(task_name, script_name):
+    """
+    Return the provider key ('client_type/model') of a summarizer or tagging script, or None if it has no llm_providers entry.
+    """
+    settings = llm_providers_config.get(implementation_provider(task_name, os.path.splitext(script_name or "")[0]))
+    return provider_key(settings['client_type'], settings['model']) if settings else None
+
+def request_token_budget(task_name, script_name, backup_name=None):
+    """
+    Return how many prompt tokens fit in one request to a task's provider (and its hedging backup), leaving max_tokens for the response.
+
+    Args:
+        task_name (str): The task, e.g. 'summarizer' or 'tagging'.
+        script_name (str): The provider's script file name, e.g. 'summarizer_groq_llama8b.py'.
+        backup_name (str, optional): The script file name of the provider the request is hedged with.
+
+    Returns:
+        int or None: The budget, or None if none of the providers has context_tokens set.
+    """
+    budgets = []
+    for name in [script_name] + ([backup_name] if backup_name and _hedger.enabled else []):
+        settings = llm_providers_config.get(implementation_provider(task_name, os.path.splitext(name or "")[0]), {})
+        if settings.get('context_tokens'):
+            budgets.append(settings['context_tokens'] - settings.get('max_tokens', DEFAULT_MAX_TOKENS))
+    return min(budgets) if budgets else None
+
+def route_providers(task_name, providers):
+    """
+    Order the providers an article is tried on by their recent latency, error rate and rate limiting (see ProviderRouter.order).
+
+    Args:
+        task_name (str): The task, e.g. 'summarizer' or 'tagging'.
+        providers (list): (script file name, api_call_func) pairs in their configured order, the running script first.
+
+    Returns:
+        tuple: The pairs in the order to try them, and the routing decision: 'configured', 'reordered' or 'explored'.
+    """
+    return _router.order(providers, [script_provider_key(task_name, script_name) for script_name, _ in providers])
+
+def provider_routing_stats():
+    """
+    Return the routing decisions made in this process and each provider's latency, error and rate limit averages and score.
+    """
+    return _router.stats()
+
+def save_provider_routing():
+    """
+    Save each provider's averages to the local state database, so the next run routes from them.
+    """
+    _router.save()
+
+def hedged_call_func(task_name, provider, backup, answered_by, failed_by=None):
+    """
+    Wrap a provider's api_call_func so a slow request is also sent to the backup provider and the first response is used (see RequestHedger.call).
+
+    Args:
+        task_name (str): The task, e.g. 'summarizer' or 'tagging'.
+        provider (tuple): The (script file name, api_call_func) pair to call.
+        backup (tuple): The (script file name, api_call_func) pair to hedge with, usually the next fallback.
+        answered_by (list): The script file name of the provider whose response was used is appended to this after each request.
+        failed_by (list, optional): The backup's script file name is appended to this when a hedged request to it failed.
+
+    Returns:
+        function: A function taking (content, systemPrompt), like api_call_func.
+    """
+    (provider_name, call_func), (backup_name, backup_func) = provider, backup
+    primary_key = script_provider_key(task_name, provider_name)
+
+    def call(content, systemPrompt):
+        def request(func):
+            # Requests may run in the hedger's threads, so the cache key is passed back for discard_cached_llm_response.
+            def run():
+                response = func(content, systemPrompt)
+                return response, getattr(_last_response, 'cache_key', None)
+            return run
+        if primary_key is None:
+            (response, cache_key), winner = request(call_func)(), 0
+        else:
+            failed = []
+            try:
+                (response, cache_key), winner = _hedger.call(request(call_func), primary_key, request(backup_func), failed)
+            finally:
+                if failed and failed_by is not None:
+                    failed_by.append(backup_name)
+        _last_response.cache_key = cache_key
+        answered_by.append(backup_name if winner else provider_name)
+        return response
+    return call
+
+def llm_hedging_stats():
+    """
+    Return how many requests were hedged, how often the backup answered first, and each provider's current hedge delay.
+    """
+    return _hedger.stats()
+
+def llm_rate_limit_stats():
+    """
+    Return how often calls waited for the shared rate limits, for how long, and how many gave up after llm_rate_limits.max_wait_seconds.
+    """
+    return _rate_limiter.stats()
+
+def log_llm_run_stats(status_entries):
+    """
+    Add the run's LLM statistics to the status log and save the provider averages for the next run.
+
+    Args:
+        status_entries (list): List to store status messages.
+    """
+    status_entries.append({
+        "message": "LLM client statistics",
+        "llm_clients": llm_client_stats(),
+        "llm_cache": llm_cache_stats(),
+        "provider_routing": provider_routing_stats(),
+        "llm_hedging": llm_hedging_stats(),
+        "llm_rate_limits": llm_rate_limit_stats(),
+        "llm_concurrency": llm_concurrency_stats()
+    })
+    # Routing is an optimisation, so a failure to save it is only logged.
+    try:
+        save_provider_routing()
+    except Exception as e:
+        status_entries.append({"message": f"Could not save provider routing state: {e}"})
+
+@contextmanager
+def expect_response_format(validator_class):
+    """
+    Check responses streamed by call_llm_api in this thread within the block with validator_class, which raises StreamFormatError.
+
+    Args:
+        validator_class (type): A class whose instances take the streamed text through feed(), e.g. SummaryStreamValidator.
+    """
+    token = _stream_validator.set(validator_class)
+    try:
+        yield
+    finally:
+        _stream_validator.reset(token)
+
+def call_llm_api(model, content, systemPrompt, max_tokens=DEFAULT_MAX_TOKENS, temperature=1, client_type="default"):
     """
     Call a specified LLM API to process the content (summarization or oitagging).
 
@@ -23,9 +434,189 @@ def call_llm_api(model, content, systemPrompt, max_tokens=4000, temperature=1, c
         str or dict: The parsed response content from the LLM API. 
                       The format depends on the LLM and the task.
     """
+    cache_key = llm_cache_key(client_type, model, max_tokens, temperature, systemPrompt, content) if is_cacheable(temperature) else None
+    _last_response.cache_key = cache_key
+    if cache_key is not None:
+        cached_response = _response_cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+    prompt_tokens = estimate_tokens(systemPrompt) + estimate_tokens(content)
+    # Waits for the provider's shared rate limit before taking a concurrency slot, so waiting calls don't hold one.
+    # Providers count the response against tokens per minute too, so the most it can use is taken up front.
+    try:
+        _rate_limiter.acquire(client_type, prompt_tokens + max_tokens)
+    except LLMRateLimitExceeded:
+        _router.record(provider_key(client_type, model), 0, False, True)
+        raise
+    limit = provider_limit(client_type)
+    limit.acquire()
+    # The hedge delay starts now, so the waits for the rate limit and the concurrency slot aren't mistaken for a slow provider.
+    mark_request_sent()
+    start_time = time.monotonic()
+    try:
+        if (llm_streaming_config.get('enabled', False) and client_type in llm_streaming_config.get('providers', [])
+                and client_type in STREAMING_CLIENT_TYPES):
+            response_content = stream_llm_response(model, content, systemPrompt, max_tokens, temperature, client_type)
+        else:
+            response_content = request_llm_response(model, content, systemPrompt, max_tokens, temperature, client_type)
+    except Exception as e:
+        elapsed = time.monotonic() - start_time
+        rate_limited = is_rate_limit_error(e)
+        # Rate limits and timeouts mean the provider is overloaded, so its concurrency is cut back.
+        limit.release(elapsed, overloaded=rate_limited or is_timeout_error(e), succeeded=False)
+        record_llm_call(client_type, elapsed, False)
+        _router.record(provider_key(client_type, model), elapsed, False, rate_limited)
+        # A 429 with Retry-After pauses the provider for every process, not just this call.
+        retry_after = retry_after_seconds(e) if rate_limited else None
+        if retry_after:
+            _rate_limiter.pause(client_type, retry_after)
+        raise
+    elapsed = time.monotonic() - start_time
+    # Latency grows with the prompt and the response, so the limit judges it per token.
+    response_tokens = estimate_tokens(str(response_content))
+    limit.release(elapsed, tokens=prompt_tokens + response_tokens)
+    record_llm_call(client_type, elapsed, True)
+    _router.record(provider_key(client_type, model), elapsed, True, tokens=response_tokens)
+    _hedger.record(provider_key(client_type, model), elapsed)
+    if cache_key is not None:
+        _response_cache.put(cache_key, response_content)
+    return response_content
+
+def stream_llm_response(model, content, systemPrompt, max_tokens, temperature, client_type):
+    """
+    Stream a response from the provider, stopping early if it drifts off the format expected by expect_response_format.
+    Takes the same arguments as call_llm_api.
+
+    Returns:
+        str: The full response text.
+
+    Raises:
+        StreamFormatError: If the stream was stopped for being off-format.
+    """
+    validator_class = _stream_validator.get()
+    validator = validator_class() if validator_class else None
+    start_time = time.monotonic()
+    ttft = None
+    parts = []
+    stream = stream_llm_chunks(model, content, systemPrompt, max_tokens, temperature, client_type)
+    try:
+        for text in stream:
+            if not text:
+                continue
+            if ttft is None:
+                ttft = time.monotonic() - start_time
+            parts.append(text)
+            if validator:
+                validator.feed(text)
+    except StreamFormatError:
+        record_llm_stream(client_type, ttft, True)
+        raise
+    finally:
+        # Closing the generator closes the provider's connection, so an aborted response stops generating.
+        stream.close()
+    record_llm_stream(client_type, ttft, False)
+    return "".join(parts)
+
+def stream_llm_chunks(model, content, systemPrompt, max_tokens, temperature, client_type):
+    """
+    Send one streaming request to the provider and yield the response text as it arrives. Closing the generator closes the stream.
+    Takes the same arguments as call_llm_api.
+    """
     if client_type == "groq":
-        from groq import Groq
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        client = get_llm_client("groq")
+        stream = client.chat.completions.create(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[
+                {"role": "user", "content": content},
+                {"role": "system", "content": systemPrompt}
+            ],
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+    elif client_type == "anthropic":
+        client = get_llm_client("anthropic")
+        with client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=systemPrompt,
+            messages=[{"role": "user", "content": content}]
+        ) as stream:
+            yield from stream.text_stream
+    elif client_type == "replicate":
+        # The prediction is created directly rather than through client.stream(), so it can be cancelled if the stream is stopped early.
+        client = get_llm_client("replicate")
+        prediction = client.models.predictions.create(
+            model=model, input=replicate_input(content, systemPrompt, max_tokens, temperature), stream=True
+        )
+        events = prediction.stream()
+        finished = False
+        try:
+            for event in events:
+                yield str(event)
+            finished = True
+        finally:
+            events.close()
+            if not finished:
+                try:
+                    prediction.cancel()
+                except Exception:
+                    # The prediction may have finished already; either way it is no longer read.
+                    pass
+    elif client_type == "togetherai":
+        client = get_llm_client("togetherai")
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": systemPrompt},
+                {"role": "user", "content": content},
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+    else:
+        raise ValueError(f"Unsupported client type: {client_type}")
+
+def replicate_input(content, systemPrompt, max_tokens, temperature):
+    """
+    Build the input for a Replicate Llama model. Commented out some unncessary additional code it sent, but we may need it for other models.
+    """
+    return {
+        "top_k": 0,
+        "top_p": 0.95,
+        "prompt": content, 
+        "max_tokens": max_tokens,  
+        "temperature": temperature,
+        "system_prompt": systemPrompt,  
+        #"length_penalty": 1,
+        #"max_new_tokens": 512,  
+        #"stop_sequences": "<|end_of_text|>,<|eot_id|>",
+        #"prompt_template": "<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n{system_prompt}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n",
+        "presence_penalty": 0,
+        "log_performance_metrics": False
+    }
+
+def request_llm_response(model, content, systemPrompt, max_tokens, temperature, client_type):
+    """
+    Send one request to the provider's API using its shared client and return the response text.
+    Takes the same arguments as call_llm_api.
+    """
+    if client_type == "groq":
+        client = get_llm_client("groq")
         chat_completion = client.chat.completions.create(
             model=model,
             max_tokens=max_tokens,
@@ -40,8 +631,7 @@ def call_llm_api(model, content, systemPrompt, max_tokens=4000, temperature=1, c
         response_content = chat_completion.choices[0].message.content
         return response_content
     elif client_type == "anthropic":
-        from anthropic import Anthropic
-        client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        client = get_llm_client("anthropic")
         chat_completion = client.messages.create(
             model=model,
             max_tokens=max_tokens,
@@ -57,35 +647,10 @@ def call_llm_api(model, content, systemPrompt, max_tokens=4000, temperature=1, c
         except (IndexError, AttributeError) as e: 
             raise ValueError(f"Error parsing Anthropic response: {e}")
     elif client_type == "gemini": 
-        from google.generativeai import GenerativeModel
-        from google.generativeai import configure
-        from google.generativeai.types import HarmCategory, HarmBlockThreshold
-
-        configure(api_key=os.environ["GEMINI_API_KEY"])
+        gemini_model = get_llm_client("gemini", model, max_tokens, temperature, systemPrompt)
 
-        generation_config = {
-            "temperature": temperature, 
-            "top_p": 0.95,
-            "top_k": 64,
-            "max_output_tokens": max_tokens, 
-            "response_mime_type": "text/plain",
-        }
-
-        gemini_model = GenerativeModel( 
-            model_name=model,
-            generation_config=generation_config,
-            system_instruction=systemPrompt, 
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-        )
-
-        chat_session = gemini_model.start_chat() 
-
-        chat_completion = chat_session.send_message(content)  
+        # A single-turn request, so no chat session is needed.
+        chat_completion = gemini_model.generate_content(content)
 
         # Parse the response for Gemini - extracting content from 'text' field , which is nested in other fields in JSON
         try:
@@ -94,26 +659,9 @@ def call_llm_api(model, content, systemPrompt, max_tokens=4000, temperature=1, c
         except (IndexError, AttributeError) as e: 
             raise ValueError(f"Error parsing Gemini response: {e}")
     elif client_type == "replicate":
-        # Set up for replicate which can call a bunch of LLMs. Commented out some unncessary additional code it sent, but we may need it for other models
-        import replicate
-        client = replicate.Client(api_token=os.getenv("REPLICATE_API_KEY"))
-        output = client.run(
-            model,
-            input={
-                "top_k": 0,
-                "top_p": 0.95,
-                "prompt": content, 
-                "max_tokens": max_tokens,  
-                "temperature": temperature,
-                "system_prompt": systemPrompt,  
-                #"length_penalty": 1,
-                #"max_new_tokens": 512,  
-                #"stop_sequences": "<|end_of_text|>,<|eot_id|>",
-                #"prompt_template": "<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n{system_prompt}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n",
-                "presence_penalty": 0,
-                "log_performance_metrics": False
-            }
-        )
+        # Set up for replicate which can call a bunch of LLMs. The input is built by replicate_input, which streaming uses too
+        client = get_llm_client("replicate")
+        output = client.run(model, input=replicate_input(content, systemPrompt, max_tokens, temperature))
 
         response_content = "".join(output) # Join the streamed output into a single string
         return response_content
@@ -139,12 +687,7 @@ def call_llm_api(model, content, systemPrompt, max_tokens=4000, temperature=1, c
         response_content = response.choices[0].message.content
         return response_content
     elif client_type == "togetherai":
-        from openai import OpenAI
-
-        client = OpenAI(
-            api_key=os.getenv("TOGETHERAI_API_KEY"),  
-            base_url="https://api.together.xyz/v1",
-        )
+        client = get_llm_client("togetherai")
 
         response = client.chat.completions.create(
             model=model, 
@@ -0,0 +1,40 @@
+# utils/local_state_utils.py
+# This module provides a small SQLite database on the local disk for state that only needs to live on the server running the pipeline.
+
+import os
+import sqlite3
+from config.config_loader import load_config
+
+config = load_config()
+local_state_config = config.get('local_state', {})
+
+def get_local_state_connection():
+    """
+    Open a connection to the local state SQLite database, creating the file and its folder if needed.
+    Several scripts can run at once, so a busy timeout is set to wait for locks instead of failing.
+
+    Returns:
+        sqlite3.Connection: An open connection to the local state database.
+    """
+    db_path = local_state_config.get('path', 'data/local_state.db')
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=local_state_config.get('busy_timeout_seconds', 30))
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+def ensure_table(connection, create_statement):
+    """
+    Create a table in the local state database if it does not exist yet.
+
+    Args:
+        connection (sqlite3.Connection): An open local state connection.
+        create_statement (str): A "CREATE TABLE IF NOT EXISTS" statement.
+
+    Returns:
+        None
+    """
+    connection.execute(create_statement)
+    connection.commit()
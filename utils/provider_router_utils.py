@@ -0,0 +1,252 @@
+# utils/provider_router_utils.py
+# This module orders the LLM providers each article is tried on by their recent latency, error rate and rate limit rate.
+
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from utils.local_state_utils import get_local_state_connection, ensure_table
+from config.config_loader import load_config
+
+config = load_config()
+routing_config = config.get('provider_routing', {})
+
+PROVIDER_HEALTH_TABLE = """
+CREATE TABLE IF NOT EXISTS provider_health (
+    provider TEXT PRIMARY KEY,
+    latency_seconds REAL,
+    error_rate REAL NOT NULL,
+    rate_limit_rate REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+def is_rate_limit_error(error):
+    """
+    Check whether an exception from a provider's SDK means the request was rate limited (HTTP 429).
+
+    Args:
+        error (Exception): The exception.
+
+    Returns:
+        bool: True if the provider rejected the request for exceeding its rate limit or quota.
+    """
+    for source in (error, getattr(error, 'response', None)):
+        if getattr(source, 'status_code', None) == 429 or getattr(source, 'code', None) == 429:
+            return True
+    if type(error).__name__ in ('RateLimitError', 'ResourceExhausted', 'TooManyRequests'):
+        return True
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message or 'too many requests' in message
+
+def health_from_row(row):
+    return {
+        "latency_seconds": row['latency_seconds'],
+        "error_rate": row['error_rate'],
+        "rate_limit_rate": row['rate_limit_rate'],
+        "samples": row['samples'],
+        "updated_at": row['updated_at']
+    }
+
+def merge_health(ours, saved, stored):
+    """
+    Combine this process's averages for a provider with those another process stored since this one loaded them.
+
+    Args:
+        ours (dict): This process's averages.
+        saved (dict or None): The averages this process loaded or last saved, which both started from.
+        stored (dict): The averages now in the database.
+
+    Returns:
+        dict: The merged averages.
+    """
+    base_samples = saved["samples"] if saved else 0
+    if saved is not None and stored["updated_at"] == saved["updated_at"]:
+        return ours
+    our_calls = ours["samples"] - base_samples
+    their_calls = stored["samples"] - base_samples if saved and stored["samples"] >= base_samples else stored["samples"]
+    if their_calls <= 0:
+        return ours
+    merged = {"samples": base_samples + our_calls + their_calls, "updated_at": max(ours["updated_at"], stored["updated_at"])}
+    for name in ("latency_seconds", "error_rate", "rate_limit_rate"):
+        if ours[name] is None or stored[name] is None:
+            merged[name] = stored[name] if ours[name] is None else ours[name]
+        else:
+            merged[name] = (ours[name] * our_calls + stored[name] * their_calls) / (our_calls + their_calls)
+    return merged
+
+class ProviderRouter:
+    """
+    Per-provider health averages, keyed by 'client_type/model', and the provider ordering built from them.
+    """
+    def __init__(self, settings=None, rng=None):
+        """
+        Initialize the router.
+
+        Args:
+            settings (dict, optional): The routing settings. Defaults to provider_routing from config.yaml.
+            rng (random.Random, optional): The random number generator used for exploration.
+        """
+        settings = routing_config if settings is None else settings
+        self.enabled = settings.get('enabled', True)
+        self.alpha = settings.get('ewma_alpha', 0.2)
+        self.exploration_rate = settings.get('exploration_rate', 0.1)
+        self.min_samples = settings.get('min_samples', 5)
+        self.error_weight = settings.get('error_weight', 4)
+        self.rate_limit_weight = settings.get('rate_limit_weight', 8)
+        self.max_age_seconds = settings.get('max_age_hours', 6) * 3600
+        self.rng = rng or random.Random()
+        self.lock = threading.Lock()
+        self.health = None
+        # The averages as loaded or last saved, so save() can tell this process's calls from other processes'.
+        self.saved = {}
+        self.decisions = {"configured": 0, "reordered": 0, "explored": 0}
+
+    def load(self):
+        # Averages older than provider_routing.max_age_hours are dropped, so a provider isn't held back by a bad hour long past.
+        if self.health is not None:
+            return
+        self.health = {}
+        connection = get_local_state_connection()
+        try:
+            ensure_table(connection, PROVIDER_HEALTH_TABLE)
+            for row in connection.execute("SELECT * FROM provider_health WHERE updated_at >= ?", (time.time() - self.max_age_seconds,)):
+                self.health[row['provider']] = health_from_row(row)
+                self.saved[row['provider']] = health_from_row(row)
+        finally:
+            connection.close()
+
+    def ewma(self, average, value):
+        return value if average is None else average + self.alpha * (value - average)
+
+    def record(self, provider, seconds, succeeded, rate_limited=False, tokens=None):
+        """
+        Add a call's outcome to its provider's averages.
+
+        Args:
+            provider (str): The provider key, 'client_type/model'.
+            seconds (float): How long the call took.
+            succeeded (bool): Whether the call returned a response.
+            rate_limited (bool): Whether the call failed because the provider rate limited it.
+            tokens (int, optional): The response's tokens, so a long response doesn't count against its provider.
+                                    Without it, latency is averaged per call.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.load()
+            health = self.health.setdefault(provider, {
+                "latency_seconds": None, "error_rate": 0.0, "rate_limit_rate": 0.0, "samples": 0, "updated_at": None
+            })
+            # Failed calls often return quickly, so only successful calls count towards latency.
+            if succeeded:
+                health["latency_seconds"] = self.ewma(health["latency_seconds"], seconds * 1000 / tokens if tokens else seconds)
+            health["error_rate"] = self.ewma(health["error_rate"] if health["samples"] else None, 0.0 if succeeded else 1.0)
+            health["rate_limit_rate"] = self.ewma(health["rate_limit_rate"] if health["samples"] else None, 1.0 if rate_limited else 0.0)
+            health["samples"] += 1
+            health["updated_at"] = time.time()
+
+    def score(self, provider):
+        """
+        Return a provider's score, its expected seconds per 1,000 tokens of successful response. Lower is better.
+
+        Args:
+            provider (str): The provider key.
+
+        Returns:
+            float or None: The score, or None if the provider has fewer than provider_routing.min_samples calls recorded.
+        """
+        with self.lock:
+            self.load()
+            health = self.health.get(provider)
+            if not health or health["samples"] < self.min_samples:
+                return None
+            # A provider that has only failed lately has no latency yet, so its failures are what rank it.
+            latency = health["latency_seconds"] if health["latency_seconds"] is not None else 1.0
+            return latency * (1 + self.error_weight * health["error_rate"]) * (1 + self.rate_limit_weight * health["rate_limit_rate"])
+
+    def order(self, providers, keys):
+        """
+        Order providers for one request by score, or try a random provider first with probability provider_routing.exploration_rate.
+        Providers with too few calls recorded keep their configured places.
+
+        Args:
+            providers (list): The providers in their configured order, of any type.
+            keys (list): The provider key of each provider, or None for providers that can't be scored.
+
+        Returns:
+            tuple: The providers in the order to try them, and the decision: 'configured', 'reordered' or 'explored'.
+        """
+        if not self.enabled or len(providers) < 2:
+            return list(providers), "configured"
+        if self.rng.random() < self.exploration_rate:
+            first = self.rng.randrange(1, len(providers))
+            ordered = [providers[first]] + [provider for index, provider in enumerate(providers) if index != first]
+            decision = "explored"
+        else:
+            scores = [self.score(key) if key else None for key in keys]
+            scored_slots = [index for index, score in enumerate(scores) if score is not None]
+            by_score = sorted(scored_slots, key=lambda index: scores[index])
+            ordered = list(providers)
+            for slot, index in zip(scored_slots, by_score):
+                ordered[slot] = providers[index]
+            decision = "reordered" if by_score != scored_slots else "configured"
+        with self.lock:
+            self.decisions[decision] += 1
+        return ordered, decision
+
+    def stats(self):
+        """
+        Return the routing decisions made in this process and each provider's current averages and score.
+
+        Returns:
+            dict: 'decisions' counts and 'providers' health by provider key.
+        """
+        with self.lock:
+            self.load()
+            providers = {provider: dict(health) for provider, health in self.health.items()}
+            decisions = dict(self.decisions)
+        for provider, health in providers.items():
+            health["score"] = round(self.score(provider), 3) if self.score(provider) is not None else None
+            for name in ("latency_seconds", "error_rate", "rate_limit_rate"):
+                health[name] = round(health[name], 3) if health[name] is not None else None
+            health["updated_at"] = datetime.fromtimestamp(health["updated_at"], timezone.utc).isoformat()
+        return {"decisions": decisions, "providers": providers}
+
+    def save(self):
+        """
+        Write the averages to the local state database, so the next run starts from them. A provider another process has saved since
+        this one loaded it gets the average of both processes' averages, weighted by the calls each recorded.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if not self.health:
+                return
+            connection = get_local_state_connection()
+            try:
+                ensure_table(connection, PROVIDER_HEALTH_TABLE)
+                connection.execute("BEGIN IMMEDIATE")
+                rows = []
+                for provider, health in self.health.items():
+                    saved = self.saved.get(provider)
+                    if saved is not None and health["samples"] == saved["samples"]:
+                        continue
+                    stored = connection.execute("SELECT * FROM provider_health WHERE provider = ?", (provider,)).fetchone()
+                    if stored is not None and stored['updated_at'] >= time.time() - self.max_age_seconds:
+                        health = merge_health(health, saved, health_from_row(stored))
+                    self.health[provider] = health
+                    self.saved[provider] = dict(health)
+                    rows.append((provider, health["latency_seconds"], health["error_rate"], health["rate_limit_rate"],
+                                 health["samples"], health["updated_at"]))
+                connection.executemany(
+                    "INSERT OR REPLACE INTO provider_health (provider, latency_seconds, error_rate, rate_limit_rate, samples, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                connection.commit()
+            finally:
+                connection.close()
@@ -0,0 +1,140 @@
+# utils/request_blocking_utils.py
+# This module decides which requests a Pyppeteer page may make while an article is scraped, and counts what was loaded and blocked.
+
+import asyncio
+import logging
+from urllib.parse import urlsplit
+from config.config_loader import load_config
+
+config = load_config()
+page_request_config = config.get('page_requests', {})
+
+logger = logging.getLogger("RequestBlocker")
+
+def matches_domain(host, domains):
+    """
+    Check whether a host is one of the given domains or a subdomain of one.
+
+    Args:
+        host (str): The host name to check.
+        domains (iterable): The domains to match against.
+
+    Returns:
+        bool: True if the host matches one of the domains.
+    """
+    host = (host or "").lower()
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+def javascript_disabled_for(url, settings=None):
+    """
+    Check whether a URL should be loaded with JavaScript disabled.
+
+    Args:
+        url (str): The page URL.
+        settings (dict, optional): The request settings. Defaults to page_requests from config.yaml.
+
+    Returns:
+        bool: True if the URL's domain is listed in javascript_disabled_domains.
+    """
+    settings = page_request_config if settings is None else settings
+    return matches_domain(urlsplit(url).hostname, settings.get('javascript_disabled_domains', []))
+
+class RequestBlocker:
+    """
+    Intercepts the requests of one page, aborting blocked resource types and domains and counting loaded and blocked requests.
+    """
+    def __init__(self, settings=None):
+        """
+        Initialize the blocker.
+
+        Args:
+            settings (dict, optional): The request settings. Defaults to page_requests from config.yaml.
+        """
+        settings = page_request_config if settings is None else settings
+        self.enabled = settings.get('enabled', True)
+        self.blocked_types = set(settings.get('block_resource_types', []))
+        self.blocked_domains = settings.get('block_domains', [])
+        self.estimated_bytes = settings.get('estimated_bytes_per_type', {})
+        self.requests_loaded = 0
+        self.bytes_loaded = 0
+        self.requests_blocked = 0
+        self.bytes_saved = 0
+
+    def block_reason(self, resource_type, url):
+        """
+        Decide whether a request should be aborted.
+
+        Args:
+            resource_type (str): The Chromium resource type, e.g. "image" or "script".
+            url (str): The request URL.
+
+        Returns:
+            str or None: Why the request is blocked, or None if it may go ahead.
+        """
+        if resource_type == "document":
+            # The article itself, and any frames, always load.
+            return None
+        if resource_type in self.blocked_types:
+            return resource_type
+        if matches_domain(urlsplit(url).hostname, self.blocked_domains):
+            return "blocked domain"
+        return None
+
+    async def attach(self, page):
+        """
+        Start intercepting the requests of a page. Must be called before the page navigates.
+
+        Args:
+            page (Page): The Pyppeteer page.
+        """
+        if not self.enabled:
+            return
+        await page.setRequestInterception(True)
+        page.on('request', lambda request: asyncio.ensure_future(self.handle_request(request)))
+        page.on('response', self.handle_response)
+
+    async def handle_request(self, request):
+        """
+        Abort or continue an intercepted request.
+
+        Args:
+            request (Request): The intercepted Pyppeteer request.
+        """
+        try:
+            if self.block_reason(request.resourceType, request.url):
+                self.requests_blocked += 1
+                # Blocked requests never reach the network, so their size is estimated from their resource type.
+                self.bytes_saved += self.estimated_bytes.get(request.resourceType, 0)
+                await request.abort()
+            else:
+                await request.continue_()
+        except Exception as e:
+            # The page may have closed or navigated away while the request was pending.
+            logger.debug(f"Could not handle request {request.url}: {e}")
+
+    def handle_response(self, response):
+        """
+        Count a response that was loaded, using its Content-Length header where the server sent one.
+
+        Args:
+            response (Response): The Pyppeteer response.
+        """
+        self.requests_loaded += 1
+        try:
+            self.bytes_loaded += int(response.headers.get('content-length', 0))
+        except ValueError:
+            pass
+
+    def stats(self):
+        """
+        Return the request counts for the page.
+
+        Returns:
+            dict: Requests and bytes loaded, and requests blocked with their estimated size.
+        """
+        return {
+            "requests_loaded": self.requests_loaded,
+            "bytes_loaded": self.bytes_loaded,
+            "requests_blocked": self.requests_blocked,
+            "estimated_bytes_saved": self.bytes_saved
+        }
@@ -6,14 +6,73 @@
 import asyncio
 from utils.db_utils import fetch_table_data, update_table_data
 from utils.logging_utils import log_status, log_duration
+from utils.content_extraction_utils import extract_main_content
+from utils.fingerprint_utils import content_fingerprint
+from utils.domain_state_utils import url_domain
+from utils.domain_limits_utils import DomainRateLimiter, domain_scrape_timeout, record_scrape_time, scrape_deadline
 from datetime import datetime
 from task_management.celery_app import app
 from config.config_loader import load_config
 
 config = load_config()
 table_names = config.get('tables', {})
+scraping_config = config.get('scraping', {})
 
-# Fetches URLs from a specified table, processes them by scraping content, and updates the table with the results.
+# Scrapes a single record inside the global and per-domain concurrency limits and writes the result back as soon as it completes.
+# Returns the record's log entries and whether it failed, so the caller can log every record in its original order.
+async def scrape_record(record, scraping_function, update_fields, table_name, global_semaphore, domain_semaphores, rate_limiter):
+    url = record['url']
+    log_entries = []
+    domain = url_domain(url)
+    domain_semaphore = domain_semaphores.setdefault(domain, asyncio.Semaphore(scraping_config.get('per_domain_concurrency', 2)))
+    # Waits for the domain first, so URLs queued behind a busy domain don't hold global slots other domains could use.
+    async with domain_semaphore:
+        # Waits for the domain's rate limit before taking a global slot, for the same reason.
+        await rate_limiter.acquire(domain)
+        async with global_semaphore:
+            return await scrape_within_limits(record, scraping_function, update_fields, table_name, domain, log_entries)
+
+# Scrapes a record once it holds its concurrency slots, with a timeout derived from the domain's recent scrape times.
+async def scrape_within_limits(record, scraping_function, update_fields, table_name, domain, log_entries):
+    url = record['url']
+    try:
+        # Attempts to scrape the content of the URL with a per-domain timeout, and records how long it took for future timeouts.
+        # Domain state is read and written in a thread, so a busy state database doesn't stall the other scrapes.
+        timeout = await asyncio.to_thread(domain_scrape_timeout, domain)
+        started = asyncio.get_running_loop().time()
+        scrape_deadline.set(started + timeout)
+        try:
+            content = await asyncio.wait_for(scraping_function(url), timeout=timeout)
+        except asyncio.TimeoutError:
+            await asyncio.to_thread(record_scrape_time, domain, timeout, timed_out=True)
+            log_entries.append({"message": f"Timeout reached while scraping {url} after {timeout:.1f}s"})
+            return log_entries, True
+        await asyncio.to_thread(record_scrape_time, domain, asyncio.get_running_loop().time() - started)
+
+        # Keeps only the article body, recording the page and article sizes so the saving in summarizer tokens can be measured.
+        # Extraction and fingerprinting are CPU-bound, so they run in a thread to keep the other scrapes' I/O moving.
+        content, content_sizes = await asyncio.to_thread(extract_main_content, content)
+        # Prepares the data to update in the database.
+        update_data = {field: content for field in update_fields}
+        update_data.update(content_sizes)
+        # Fingerprints the article so syndicated copies can reuse one summary (see utils/fingerprint_utils.py).
+        update_data['content_fingerprint'] = await asyncio.to_thread(content_fingerprint, content)
+        # Marks the URL as scraped.
+        update_data['scraped'] = True
+        # Updates the table with the scraped content and logs success. The update runs in a thread so other scrapes keep going.
+        await asyncio.to_thread(update_table_data, table_name, update_data, ('id', record['id']))
+        log_entries.append({
+            "message": f"Content updated successfully for URL {url} "
+                       f"(kept {content_sizes['content_extracted_chars']} of {content_sizes['content_original_chars']} characters)"
+        })
+        return log_entries, False
+    # Catches any exceptions during scraping and logs the failure.
+    except Exception as e:
+        log_entries.append({"message": f"Failed to scrape {url}: {str(e)}", "error": str(e)})
+        return log_entries, True
+
+# Fetches URLs from a specified table, scrapes them concurrently (at most scraping.concurrency at once, and scraping.per_domain_concurrency
+# per domain), and updates the table with each result as it completes.
 async def fetch_and_process_urls(table_name_key, fetch_condition, scraping_function, update_fields, script_name):
     # Logs the start time and initializes log entries.
     start_time = datetime.now()
@@ -35,30 +94,22 @@ async def fetch_and_process_urls(table_name_key, fetch_condition, scraping_funct
         log_duration(script_name, start_time, datetime.now())
         return "Success"
 
-    # Iterates over each URL, attempts to scrape content, and updates the database.
-    for record in urls_to_scrape:
-        # Extracts the URL from the record.
-        url = record['url']
-        total_items += 1
-        try:
-            # Attempts to scrape the content of the URL with a per-URL timeout.
-            try:
-                content = await asyncio.wait_for(scraping_function(url), timeout=20)
-            except asyncio.TimeoutError:
-                log_entries.append({"message": f"Timeout reached while scraping {url}"})
-                failed_items += 1
-                continue
+    # Scrapes every URL concurrently within the limits and updates the database as each one finishes.
+    global_semaphore = asyncio.Semaphore(scraping_config.get('concurrency', 4))
+    domain_semaphores = {}
+    rate_limiter = DomainRateLimiter()
+    results = await asyncio.gather(*(
+        scrape_record(record, scraping_function, update_fields, table_name, global_semaphore, domain_semaphores, rate_limiter)
+        for record in urls_to_scrape
+    ))
+    if rate_limiter.seconds_waited:
+        log_entries.append({"message": f"Waited {rate_limiter.seconds_waited:.1f}s in total for per-domain rate limits"})
 
-            # Prepares the data to update in the database.
-            update_data = {field: content for field in update_fields}
-            # Marks the URL as scraped.
-            update_data['scraped'] = True
-            # Updates the table with the scraped content and logs success.
-            update_table_data(table_name, update_data, ('id', record['id']))
-            log_entries.append({"message": f"Content updated successfully for URL {url}"})
-        # Catches any exceptions during scraping and logs the failure.
-        except Exception as e:
-            log_entries.append({"message": f"Failed to scrape {url}: {str(e)}", "error": str(e)})
+    # Collects the log entries in the order the URLs were fetched, so the log reads the same however the scrapes finished.
+    for record_log_entries, failed in results:
+        total_items += 1
+        log_entries.extend(record_log_entries)
+        if failed:
             failed_items += 1
 
     # Determines the overall status based on the number of failed items and logs it.
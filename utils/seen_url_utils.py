@@ -0,0 +1,108 @@
+# utils/seen_url_utils.py
+# This module keeps a local index of the canonical keys of URLs already stored in the summarizer_flow table, so fetch_urls can deduplicate
+# feed entries without querying Supabase for each feed.
+
+from utils.local_state_utils import get_local_state_connection, ensure_table
+from utils.url_canonical_utils import canonical_url_key
+from config.config_loader import load_config
+
+config = load_config()
+table_names = config.get('tables', {})
+seen_url_config = config.get('seen_url_index', {})
+
+SEEN_URL_KEYS_TABLE = """
+CREATE TABLE IF NOT EXISTS seen_url_keys (
+    url_key TEXT PRIMARY KEY
+)
+"""
+
+SEEN_URL_KEYS_META_TABLE = """
+CREATE TABLE IF NOT EXISTS seen_url_keys_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+)
+"""
+
+class SeenUrlIndex:
+    """
+    A local set of the URL keys already stored in the database. Membership checks are in-memory set lookups,
+    and new keys are written through to the local state database so later runs start with them.
+    """
+    def __init__(self):
+        """
+        Load the stored URL keys and the high-water mark from the local state database.
+        """
+        self.connection = get_local_state_connection()
+        ensure_table(self.connection, SEEN_URL_KEYS_TABLE)
+        ensure_table(self.connection, SEEN_URL_KEYS_META_TABLE)
+        self.keys = {row['url_key'] for row in self.connection.execute("SELECT url_key FROM seen_url_keys")}
+        row = self.connection.execute("SELECT value FROM seen_url_keys_meta WHERE key = 'high_water_mark'").fetchone()
+        self.high_water_mark = row['value'] if row else None
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, keys):
+        """
+        Add URL keys to the index and persist them.
+
+        Args:
+            keys (iterable): The URL keys to add.
+
+        Returns:
+            None
+        """
+        new_keys = {key for key in keys if key not in self.keys}
+        if not new_keys:
+            return
+        self.keys.update(new_keys)
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO seen_url_keys (url_key) VALUES (?)", [(key,) for key in new_keys])
+
+    def sync(self, supabase, table_name=None):
+        """
+        Pull URLs added to the database since the high-water mark, page by page, and add their keys. The first run backfills the table.
+
+        Args:
+            supabase (Client): The Supabase client to query.
+            table_name (str, optional): The table to sync from. Defaults to the summarizer_flow table.
+
+        Returns:
+            int: The number of rows read from the database.
+        """
+        table_name = table_name or table_names['summarizer_flow']
+        page_size = seen_url_config.get('sync_page_size', 1000)
+        rows_read = 0
+
+        while True:
+            query = supabase.table(table_name).select("url, created_at").order("created_at").limit(page_size)
+            # gte rather than gt, so rows sharing the boundary timestamp are never skipped; re-adding them is harmless.
+            if self.high_water_mark:
+                query = query.gte("created_at", self.high_water_mark)
+            rows = query.execute().data or []
+            rows_read += len(rows)
+            self.add(canonical_url_key(row['url']) for row in rows if row.get('url'))
+
+            previous_mark = self.high_water_mark
+            if rows:
+                self.high_water_mark = rows[-1]['created_at']
+            # Stops on a short page, or when a full page shares one timestamp and the mark cannot move forward.
+            if len(rows) < page_size or self.high_water_mark == previous_mark:
+                break
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO seen_url_keys_meta (key, value) VALUES ('high_water_mark', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (self.high_water_mark,)
+            )
+        return rows_read
+
+    def close(self):
+        """
+        Close the connection to the local state database.
+        """
+        self.connection.close()
@@ -0,0 +1,73 @@
+# utils/stream_format_utils.py
+# This module checks a streamed summary as it arrives, so a response that drifts off the expected format can be stopped early.
+
+from config.config_loader import load_config
+
+config = load_config()
+streaming_config = config.get('llm_streaming', {})
+
+SUMMARY_LABELS = ["IntroParagraph:", "BulletPointSummary:", "ConcludingParagraph:"]
+
+class StreamFormatError(Exception):
+    """
+    Raised when a streamed response can no longer match the expected format, to stop the stream.
+    """
+
+class SummaryStreamValidator:
+    """
+    An incremental parser for the IntroParagraph/BulletPointSummary/ConcludingParagraph format. Text is fed in as it is streamed,
+    and StreamFormatError is raised as soon as the sections are missing, out of order or malformed.
+    """
+    def __init__(self, settings=None):
+        """
+        Initialize the validator.
+
+        Args:
+            settings (dict, optional): The streaming settings. Defaults to llm_streaming from config.yaml.
+        """
+        settings = streaming_config if settings is None else settings
+        self.max_preamble_chars = settings.get('max_preamble_chars', 200)
+        self.max_section_chars = settings.get('max_section_chars', 4000)
+        self.text = ""
+
+    def feed(self, chunk):
+        """
+        Add the next streamed text and check the response so far.
+
+        Args:
+            chunk (str): The text received.
+
+        Raises:
+            StreamFormatError: If the response can't be parsed whatever follows.
+        """
+        self.text += chunk
+        self.check()
+
+    def check(self):
+        intro, bullets, conclusion = (self.text.find(label) for label in SUMMARY_LABELS)
+        # Only a little text, such as whitespace or markdown, may come before the first label.
+        if intro == -1 or intro > self.max_preamble_chars:
+            if intro > self.max_preamble_chars or len(self.text.strip()) > self.max_preamble_chars:
+                raise StreamFormatError("response doesn't start with IntroParagraph:")
+            if bullets != -1 or conclusion != -1:
+                raise StreamFormatError("a later section started before IntroParagraph:")
+            return
+
+        if bullets == -1:
+            if conclusion != -1:
+                raise StreamFormatError("ConcludingParagraph: came before BulletPointSummary:")
+            if len(self.text) - intro > self.max_section_chars:
+                raise StreamFormatError("IntroParagraph ran on without a BulletPointSummary:")
+            return
+        if bullets < intro:
+            raise StreamFormatError("BulletPointSummary: came before IntroParagraph:")
+
+        bullet_text = self.text[bullets + len(SUMMARY_LABELS[1]):].lstrip()
+        if bullet_text and not bullet_text.startswith("{"):
+            raise StreamFormatError("BulletPointSummary: isn't followed by JSON")
+        if conclusion == -1:
+            if len(self.text) - bullets > self.max_section_chars:
+                raise StreamFormatError("BulletPointSummary ran on without a ConcludingParagraph:")
+            return
+        if conclusion < bullets:
+            raise StreamFormatError("ConcludingParagraph: came before BulletPointSummary:")
@@ -2,12 +2,20 @@
 # This module provides utility functions for summarizing articles. It includes functions for escaping quotes, extracting sections from content, and summarizing articles using different APIs. The summaries are then updated in a Supabase table.
 
 import re
+import asyncio
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from utils.db_utils import get_supabase_client, fetch_articles_with_logic
+from utils.db_utils import get_supabase_client, fetch_articles_with_logic, fetch_table_data
 from utils.logging_utils import log_status, log_duration
-from utils.llm_utils import call_llm_api
+from utils.llm_utils import (
+    call_llm_api, fallback_providers, discard_cached_llm_response, route_providers, hedged_call_func,
+    expect_response_format, request_token_budget, log_llm_run_stats
+)
+from utils.stream_format_utils import SummaryStreamValidator
+from utils.token_utils import estimate_tokens, split_into_chunks
+from utils.fingerprint_utils import FingerprintIndex, fingerprint_config, hamming_distance
 from config.config_loader import load_config
 from task_management.celery_app import app
 
@@ -16,6 +24,8 @@ supabase = get_supabase_client()
 
 config = load_config()
 table_names = config.get('tables', {})
+summarization_config = config.get('summarization', {})
+map_reduce_config = summarization_config.get('map_reduce', {})
 
 def custom_escape_quotes(json_str):
     """
@@ -54,10 +64,74 @@ def extract_section(content, start_key, end_key=None):
         end_idx = len(content)  # No end_key provided, take until end
     return content[start_idx:end_idx].strip()
 
-def summarize_article(article_id, content, status_entries, systemPrompt, api_call_func):
+def combine_notes(notes):
+    """
+    Join the notes of consecutive parts of an article into one text, each headed with its part number.
+    """
+    return "\n\n".join(f"Part {number} of {len(notes)}:\n{note.strip()}" for number, note in enumerate(notes, start=1))
+
+def group_notes(notes, max_tokens, max_notes):
+    """
+    Split notes into runs of consecutive notes that fit max_tokens (estimated) and max_notes when combined.
+    """
+    groups = [[]]
+    for note in notes:
+        group = groups[-1]
+        if group and (len(group) >= max_notes or estimate_tokens(combine_notes(group + [note])) > max_tokens):
+            groups.append([note])
+        else:
+            group.append(note)
+    return groups
+
+def request_summary(content, systemPrompt, api_call_func, settings=None, token_budget=None):
+    """
+    Get a summary from the LLM. Articles too long for one request are condensed to notes chunk by chunk (map-reduce),
+    and the notes are summarized with the usual system prompt.
+
+    Args:
+        content (str): The content of the article.
+        systemPrompt (str): The system prompt for the LLM.
+        api_call_func (function): The function to call the specific LLM API.
+        settings (dict, optional): The map-reduce settings. Defaults to summarization.map_reduce from config.yaml.
+        token_budget (int, optional): The tokens of prompt and content the provider can take in one request (see request_token_budget).
+
+    Returns:
+        tuple: The response text, and the number of chunks the article was split into (1 if it was sent whole).
+    """
+    settings = map_reduce_config if settings is None else settings
+    chunk_prompt = config['systemPrompt-Chunk']
+    reduce_preamble = settings.get('reduce_preamble', '').strip()
+    max_input_tokens = settings.get('max_input_tokens', 12000)
+    chunk_tokens = settings.get('chunk_tokens', 6000)
+    if token_budget:
+        usable_tokens = int(token_budget * settings.get('context_fill', 0.8))
+        max_input_tokens = min(max_input_tokens, usable_tokens - estimate_tokens(systemPrompt))
+        chunk_tokens = min(chunk_tokens, usable_tokens - estimate_tokens(chunk_prompt))
+    if not settings.get('enabled', True) or estimate_tokens(content) <= max_input_tokens:
+        return api_call_func(content, systemPrompt), 1
+
+    chunks = split_into_chunks(content, max(chunk_tokens, 1))
+    concurrency = settings.get('chunk_concurrency', 4)
+
+    def condense(texts):
+        with ThreadPoolExecutor(max_workers=min(len(texts), concurrency)) as executor:
+            return list(executor.map(lambda text: api_call_func(text, chunk_prompt), texts))
+
+    notes = condense(chunks)
+    max_notes = max(settings.get('max_notes_per_reduce', 8), 2)
+    reduce_tokens = max_input_tokens - estimate_tokens(reduce_preamble)
+    while True:
+        groups = group_notes(notes, reduce_tokens, max_notes)
+        # Stops once the notes fit one request, or when no two notes fit together, as condensing again wouldn't shorten them.
+        if len(groups) == 1 or len(groups) == len(notes):
+            break
+        notes = condense([combine_notes(group) for group in groups])
+    return api_call_func(f"{reduce_preamble}\n\n{combine_notes(notes)}", systemPrompt), len(chunks)
+
+def summarize_article(article_id, content, status_entries, systemPrompt, api_call_func, summarized_by=None, fallbacks=None):
     """
     Summarize an article using a specified API call function and update the 
-    summarizer_flow table in Supabase.
+    summarizer_flow table in Supabase, retrying on each fallback provider in turn if it fails.
     
     Args:
         article_id (int): The ID of the article to summarize.
@@ -65,22 +139,61 @@ def summarize_article(article_id, content, status_entries, systemPrompt, api_cal
         status_entries (list): List to store status messages.
         systemPrompt (str): The system prompt for the LLM.
         api_call_func (function): The function to call the specific LLM API.
-    """
-    try:
-        response_content = api_call_func(content, systemPrompt)
-        intro_paragraph = extract_section(response_content, "IntroParagraph:", "BulletPointSummary:")
-        bullet_point_summary = extract_section(response_content, "BulletPointSummary:", "ConcludingParagraph:")
-        bullet_point_summary = custom_escape_quotes(bullet_point_summary)
+        summarized_by (str, optional): The summarizer script, stored with the summary so content sizes can be compared per provider.
+        fallbacks (list, optional): (script file name, api_call_func) pairs to retry the article on, in order.
 
+    Returns:
+        bool: True if a complete summary was stored.
+    """
+    providers = [(summarized_by, api_call_func)] + list(fallbacks or [])
+    # Providers that already failed as the backup of a hedged request aren't retried.
+    failed_backups = []
+    for position, (provider, call_func) in enumerate(providers):
+        if provider in failed_backups:
+            continue
+        next_provider = providers[position + 1][0] if position + 1 < len(providers) else None
+        answered_by = []
+        token_budget = request_token_budget('summarizer', provider, next_provider)
+        if next_provider:
+            call_func = hedged_call_func('summarizer', providers[position], providers[position + 1], answered_by, failed_backups)
         try:
-            json.loads(bullet_point_summary)
-            valid_json = True
-        except json.JSONDecodeError:
-            valid_json = False
-            bullet_point_summary = None
-            status_entries.append({"message": f"Invalid JSON detected for BulletPointSummary in article ID {article_id}"})
+            # Streamed summaries are checked as they arrive, and one that drifts off-format fails over to the next provider straight away.
+            with expect_response_format(SummaryStreamValidator):
+                response_content, chunk_count = request_summary(content, systemPrompt, call_func, token_budget=token_budget)
+            if chunk_count > 1:
+                status_entries.append({"message": f"Article ID {article_id} is about {estimate_tokens(content)} tokens, summarized in {chunk_count} chunks on {provider}"})
+            # The summary was written by whichever provider answered the final request first.
+            if answered_by and answered_by[-1] != provider:
+                status_entries.append({"message": f"Hedged request for ID {article_id} answered first by {answered_by[-1]} instead of {provider}"})
+                provider = answered_by[-1]
+            intro_paragraph = extract_section(response_content, "IntroParagraph:", "BulletPointSummary:")
+            bullet_point_summary = extract_section(response_content, "BulletPointSummary:", "ConcludingParagraph:")
+            bullet_point_summary = custom_escape_quotes(bullet_point_summary)
 
-        concluding_paragraph = extract_section(response_content, "ConcludingParagraph:")
+            try:
+                json.loads(bullet_point_summary)
+                valid_json = True
+            except json.JSONDecodeError:
+                valid_json = False
+                bullet_point_summary = None
+
+            concluding_paragraph = extract_section(response_content, "ConcludingParagraph:")
+        except Exception as e:
+            next_provider = next((name for name, _ in providers[position + 1:] if name not in failed_backups), None)
+            if next_provider:
+                status_entries.append({"message": f"Summarization failed for ID {article_id} on {provider}, retrying on {next_provider}: {e}"})
+                continue
+            status_entries.append({"message": f"Error during summarization for ID {article_id}", "error": str(e)})
+            return False
+
+        if not valid_json:
+            # The same prompt would get the same unusable response from the cache when the article is retried.
+            discard_cached_llm_response()
+            next_provider = next((name for name, _ in providers[position + 1:] if name not in failed_backups), None)
+            if next_provider:
+                status_entries.append({"message": f"Invalid JSON detected for BulletPointSummary in article ID {article_id} from {provider}, retrying on {next_provider}"})
+                continue
+            status_entries.append({"message": f"Invalid JSON detected for BulletPointSummary in article ID {article_id}"})
 
         update_data = {
             "IntroParagraph": intro_paragraph,
@@ -90,6 +203,10 @@ def summarize_article(article_id, content, status_entries, systemPrompt, api_cal
         if valid_json:
             update_data["BulletPointSummary"] = bullet_point_summary
             update_data["summarized"] = True
+            # Other hosts' fingerprint indexes sync on summarized_at (see FingerprintIndex.sync).
+            update_data["summarized_at"] = datetime.now(timezone.utc).isoformat()
+        if provider:
+            update_data["summarized_by"] = provider
 
         try:
             supabase.table(table_names['summarizer_flow']).update(update_data).eq("id", article_id).execute()
@@ -97,14 +214,161 @@ def summarize_article(article_id, content, status_entries, systemPrompt, api_cal
                 status_entries.append({"message": f"Summary updated successfully for ID {article_id}"})
             else:
                 status_entries.append({"message": f"Summary updated without BulletPointSummary for ID {article_id}"})
+            return valid_json
         except Exception as update_error:
             status_entries.append({
                 "message": f"Error updating summary for ID {article_id}",
                 "error": str(update_error)
             })
+            return False
+    return False
+
+def open_fingerprint_index(status_entries):
+    """
+    Open the local fingerprint index and pull in any summaries made elsewhere. Duplicate detection is an optimisation,
+    so if the index can't be opened or synced, articles are summarized as usual.
 
+    Args:
+        status_entries (list): List to store status messages.
+
+    Returns:
+        FingerprintIndex or None: The index, or None if duplicate detection is disabled or unavailable.
+    """
+    if not fingerprint_config.get('enabled', True):
+        return None
+    try:
+        fingerprint_index = FingerprintIndex()
+    except Exception as e:
+        status_entries.append({"message": f"Could not open the fingerprint index, near-duplicates will be summarized: {e}"})
+        return None
+    try:
+        fingerprint_index.sync(supabase)
     except Exception as e:
-        status_entries.append({"message": f"Error during summarization for ID {article_id}", "error": str(e)})
+        status_entries.append({"message": f"Could not sync the fingerprint index: {e}"})
+    return fingerprint_index
+
+def find_duplicate_original(article, fingerprint_index):
+    """
+    Find an already summarized near-duplicate (a syndicated copy of the same story) of an article in the fingerprint index.
+
+    Args:
+        article (dict): The article row, with 'id' and 'content_fingerprint'.
+        fingerprint_index (FingerprintIndex or None): The index of summarized articles.
+
+    Returns:
+        tuple or None: The original's ID and its Hamming distance, or None if there is no near-duplicate.
+    """
+    fingerprint = article.get('content_fingerprint')
+    if fingerprint_index is None or not fingerprint:
+        return None
+    return fingerprint_index.find_duplicate(fingerprint, exclude_id=article['id'])
+
+def copy_duplicate_summary(article, match, status_entries):
+    """
+    Give an article the summary of its near-duplicate. The article's duplicate_of column is set to the original,
+    so tagging can copy its tags too. Makes blocking Supabase calls, so it runs in a worker thread.
+
+    Args:
+        article (dict): The article row.
+        match (tuple): The original's ID and its Hamming distance, from find_duplicate_original.
+        status_entries (list): List to store status messages.
+
+    Returns:
+        bool: True if the article doesn't need summarizing: its summary was copied, or copying it failed with an error entry.
+    """
+    original_id, distance = match
+    originals = fetch_table_data(
+        "summarizer_flow",
+        filters={"id": original_id, "summarized": True},
+        columns=["IntroParagraph", "BulletPointSummary", "ConcludingParagraph"]
+    )
+    if not originals:
+        return False
+    update_data = {**originals[0], "summarized": True, "duplicate_of": original_id, "summarized_at": datetime.now(timezone.utc).isoformat()}
+    try:
+        supabase.table(table_names['summarizer_flow']).update(update_data).eq("id", article['id']).execute()
+    except Exception as e:
+        status_entries.append({"message": f"Error copying summary of ID {original_id} to ID {article['id']}", "error": str(e)})
+        return True
+    status_entries.append({
+        "message": f"Summary copied from near-duplicate ID {original_id} to ID {article['id']} ({distance} bits apart), no LLM call made"
+    })
+    return True
+
+def split_batch_duplicates(articles):
+    """
+    Split a batch into articles to summarize first and near-duplicates of them within the batch, which wait to reuse their summary.
+
+    Args:
+        articles (list): The articles to summarize.
+
+    Returns:
+        tuple: The indices of the first copies (and articles without a fingerprint), and the indices of the later copies.
+    """
+    max_distance = fingerprint_config.get('max_hamming_distance', 3)
+    leaders, followers = [], []
+    leader_fingerprints = []
+    for index, article in enumerate(articles):
+        fingerprint = article.get('content_fingerprint')
+        if fingerprint and any(hamming_distance(fingerprint, other) <= max_distance for other in leader_fingerprints):
+            followers.append(index)
+            continue
+        leaders.append(index)
+        if fingerprint:
+            leader_fingerprints.append(fingerprint)
+    return leaders, followers
+
+async def summarize_articles(articles, system_prompt, api_call_func, script_name, fingerprint_index, fallbacks=None):
+    """
+    Summarize articles concurrently, at most summarization.concurrency at once. api_call_func is blocking, so each call runs
+    in a worker thread; summaries are written to the database as each one completes.
+
+    Args:
+        articles (list): The articles to summarize.
+        system_prompt (str): The system prompt for the LLM.
+        api_call_func (function): The function to call the specific LLM API.
+        script_name (str): The summarizer script, stored with each summary.
+        fingerprint_index (FingerprintIndex or None): The index of summarized articles, used to reuse summaries of near-duplicates.
+        fallbacks (list, optional): (script file name, api_call_func) pairs an article is retried on when its summary fails.
+
+    Returns:
+        list: One (status entries, failed) pair per article, in the order the articles were given.
+    """
+    semaphore = asyncio.Semaphore(summarization_config.get('concurrency', 8))
+    results = [None] * len(articles)
+    providers = [(script_name, api_call_func)] + list(fallbacks or [])
+
+    async def summarize(index):
+        article = articles[index]
+        article_entries = []
+        # The fingerprint index is only used from the event loop thread, as its SQLite connection can't be shared between threads.
+        match = find_duplicate_original(article, fingerprint_index)
+        copied = False
+        if match is not None:
+            async with semaphore:
+                copied = await asyncio.to_thread(copy_duplicate_summary, article, match, article_entries)
+            if copied and "error" not in article_entries[-1]:
+                fingerprint_index.add(article['id'], article['content_fingerprint'])
+        if not copied:
+            # Each article is routed when it starts, so it goes to whichever provider has been doing best in this run so far.
+            routed, decision = route_providers('summarizer', providers)
+            (provider, call_func), *chain = routed
+            if provider != script_name:
+                article_entries.append({"message": f"Article ID {article['id']} routed to {provider} first ({decision})"})
+            async with semaphore:
+                summarized = await asyncio.to_thread(
+                    summarize_article, article['id'], article['content'], article_entries, system_prompt, call_func, provider, chain
+                )
+            if summarized and fingerprint_index is not None and article.get('content_fingerprint'):
+                fingerprint_index.add(article['id'], article['content_fingerprint'])
+        # An article counts as failed when its last status entry is an error, as when articles were summarized one by one.
+        results[index] = (article_entries, "error" in article_entries[-1].keys())
+
+    leaders, followers = split_batch_duplicates(articles)
+    await asyncio.gather(*(summarize(index) for index in leaders))
+    # Near-duplicates within the batch go second, so they find their original's summary in the index.
+    await asyncio.gather(*(summarize(index) for index in followers))
+    return results
 
 # Process articles for summarization and log the status and duration of the operation.
 def process_articles(script_name, api_call_func=None):
@@ -121,11 +385,24 @@ def process_articles(script_name, api_call_func=None):
 
     # If articles are found, summarize each one.
     if articles:
-        for article in articles:
+        # Articles that fail on this script's provider are retried on the providers after it under interfaces.summarizer, in this
+        # process, so only articles that failed everywhere are left for the fallback scripts to fetch again.
+        fallbacks = fallback_providers('summarizer', script_name) if summarization_config.get('in_process_fallback', True) else []
+        fingerprint_index = open_fingerprint_index(status_entries)
+        try:
+            # Syndicated copies of an article that is already summarized reuse its summary instead of calling the LLM.
+            results = asyncio.run(summarize_articles(articles, system_prompt, api_call_func, script_name, fingerprint_index, fallbacks))
+        finally:
+            if fingerprint_index is not None:
+                fingerprint_index.close()
+        # Collects the status entries in the order the articles were fetched, so the log reads the same however the calls finished.
+        for article_entries, failed in results:
             total_items += 1
-            summarize_article(article['id'], article['content'], status_entries, system_prompt, api_call_func)
-            if "error" in status_entries[-1].keys():
+            status_entries.extend(article_entries)
+            if failed:
                 failed_items += 1
+        # Logs the run's LLM statistics and saves the provider averages for the next run.
+        log_llm_run_stats(status_entries)
     else:
         status_entries.append({"message": "No articles to summarize"})
         
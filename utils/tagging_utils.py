@@ -7,16 +7,19 @@ import json
 from datetime import datetime, timezone
 from utils.db_utils import get_supabase_client, fetch_table_data
 from utils.logging_utils import log_status, log_duration
-from utils.llm_utils import call_llm_api
+from utils.llm_utils import (
+    call_llm_api, fallback_providers, discard_cached_llm_response, route_providers, hedged_call_func, log_llm_run_stats
+)
 from config.config_loader import load_config
 from task_management.celery_app import app
 
 config = load_config()
 table_names = config.get('tables', {})
+tagging_config = config.get('tagging', {})
 
 def process_tags(article_id, response_content, status_entries):
     """
-    Process the tags generated by the LLM and update the database.
+    Process the tags generated by the LLM and update the database. If an insert fails, the tags already inserted are removed.
     
     Args:
         article_id (int): The ID of the article being tagged.
@@ -30,30 +33,24 @@ def process_tags(article_id, response_content, status_entries):
     supabase = get_supabase_client()
     
     try:
-        # Parse the JSON response (already done in call_llm_api)
-        response_json = response_content 
-        
         # Parse the JSON response
         response_json = json.loads(response_content)
 
-        # Track statuses for each tag insertion
-        successful_insertions = []
+        # Check every tag before inserting any, so a malformed tag late in the response doesn't leave the earlier ones inserted
+        tag_rows = [{"article_id": article_id, "tag": tag_data["tag"], "score": int(tag_data["score"])} for tag_data in response_json["tags"]]
+    except Exception as e:
+        return {"message": f"Error during tag generation for ID {article_id}", "error": str(e)}
 
-        # Flag to track if at least one tag was inserted successfully
-        at_least_one_tag_inserted = False 
+    # Tags inserted by this response, deleted again if a later insert fails
+    inserted_tags = []
 
-        for tag_data in response_json["tags"]:
-            tag = tag_data["tag"]
-            score = int(tag_data["score"])  # Convert the score to an integer
+    try:
+        for tag_row in tag_rows:
+            tag = tag_row["tag"]
             try:
                 # Insert the tag and score into the article_tags table
-                supabase.table(table_names['article_tags']).insert({
-                    "article_id": article_id,
-                    "tag": tag,
-                    "score": score
-                }).execute()
-                successful_insertions.append({"tag": tag, "status": "success"})
-                at_least_one_tag_inserted = True  # Set the flag to True if insertion succeeds
+                supabase.table(table_names['article_tags']).insert(tag_row).execute()
+                inserted_tags.append(tag)
             except Exception as insert_error:
                 if "duplicate key value violates unique constraint" in str(insert_error):
                     # Log the rejected tag, but don't raise an exception
@@ -64,12 +61,17 @@ def process_tags(article_id, response_content, status_entries):
                     raise Exception(f"Failed to insert tag {tag} for article {article_id}: {insert_error}")
 
         # Only update ProductionReady status if at least one tag was successfully inserted
-        if at_least_one_tag_inserted:
+        if inserted_tags:
             supabase.table(table_names['summarizer_flow']).update({"ProductionReady": True}).eq("id", article_id).execute()
 
         return {"message": f"Tags generated and updated successfully for ID {article_id}"}
 
     except Exception as e:
+        if inserted_tags:
+            try:
+                supabase.table(table_names['article_tags']).delete().eq("article_id", article_id).in_("tag", inserted_tags).execute()
+            except Exception as delete_error:
+                status_entries.append({"message": f"Could not remove partially inserted tags for ID {article_id}", "error": str(delete_error)})
         return {"message": f"Error during tag generation for ID {article_id}", "error": str(e)}
 
 def construct_system_prompt():
@@ -103,9 +105,74 @@ def fetch_articles():
         "summarizer_flow", 
         filters={"summarized": True}, 
         complex_filters="ProductionReady.is.false", 
-        columns=["id", "ArticleTitle", "IntroParagraph", "BulletPointSummary", "ConcludingParagraph"]
+        columns=["id", "ArticleTitle", "IntroParagraph", "BulletPointSummary", "ConcludingParagraph", "duplicate_of"]
     )
 
+def fetch_duplicate_tags(article):
+    """
+    Fetch the tags of the article this one is a near-duplicate of, so they can be copied instead of calling the LLM.
+
+    Args:
+        article (dict): The article row, with 'duplicate_of' set when its summary was copied from another article.
+
+    Returns:
+        str or None: The original's tags in the same JSON format the LLM returns, or None if there are none to copy.
+    """
+    original_id = article.get("duplicate_of")
+    if not original_id:
+        return None
+    tags = fetch_table_data("article_tags", filters={"article_id": original_id}, columns=["tag", "score"])
+    if not tags:
+        return None
+    return json.dumps({"tags": [{"tag": tag["tag"], "score": tag["score"]} for tag in tags]})
+
+def tag_article(article_id, content, system_prompt, status_entries, api_call_func, provider=None, fallbacks=None):
+    """
+    Generate tags for an article and store them, retrying on each fallback provider in turn if the call fails or its tags can't be stored.
+
+    Args:
+        article_id (int): The ID of the article being tagged.
+        content (str): The article's title and summary.
+        system_prompt (str): The system prompt for the LLM.
+        status_entries (list): A list to store status messages.
+        api_call_func (function): The function to call the specific LLM API.
+        provider (str, optional): The name of the tagging script, used in status messages.
+        fallbacks (list, optional): (script file name, api_call_func) pairs to retry the article on, in order.
+
+    Returns:
+        dict: The result of process_tags for the last provider tried, or an error message if every call failed.
+    """
+    providers = [(provider, api_call_func)] + list(fallbacks or [])
+    # Providers that already failed as the backup of a hedged request aren't retried
+    failed_backups = []
+    for position, (provider_name, call_func) in enumerate(providers):
+        if provider_name in failed_backups:
+            continue
+        next_provider = providers[position + 1][0] if position + 1 < len(providers) else None
+        answered_by = []
+        if next_provider:
+            # Hedges a slow request with the next provider when llm_hedging is enabled
+            call_func = hedged_call_func('tagging', providers[position], providers[position + 1], answered_by, failed_backups)
+        try:
+            result = call_func(content, system_prompt)
+            if answered_by and answered_by[-1] != provider_name:
+                status_entries.append({"message": f"Hedged request for ID {article_id} answered first by {answered_by[-1]} instead of {provider_name}"})
+        except Exception as e:
+            next_provider = next((name for name, _ in providers[position + 1:] if name not in failed_backups), None)
+            if next_provider:
+                status_entries.append({"message": f"Tag generation failed for ID {article_id} on {provider_name}, retrying on {next_provider}: {e}"})
+                continue
+            return {"message": f"Error during tag generation for ID {article_id}", "error": str(e)}
+        process_result = process_tags(article_id, result, status_entries)
+        if "error" in process_result:
+            # Keeps a response that couldn't be used out of the cache, so a retry asks the LLM again.
+            discard_cached_llm_response()
+            next_provider = next((name for name, _ in providers[position + 1:] if name not in failed_backups), None)
+        if "error" in process_result and next_provider:
+            status_entries.append({"message": f"Tags from {provider_name} could not be stored for ID {article_id}, retrying on {next_provider}: {process_result['error']}"})
+            continue
+        return process_result
+
 # Main function to process articles: fetches articles, calls LLM API to generate tags, and updates the database.
 def process_articles(script_name, primary=True, api_call_func=None):
     # Record the start time for the process
@@ -119,19 +186,31 @@ def process_articles(script_name, primary=True, api_call_func=None):
     system_prompt = construct_system_prompt()
     # Fetch articles that need to be processed
     articles = fetch_articles()
+    # Articles that fail on this script's provider are retried on the providers after it, so the fallback scripts only see what failed everywhere
+    fallbacks = fallback_providers('tagging', script_name) if tagging_config.get('in_process_fallback', True) else []
 
     if articles:
         for article in articles:
             total_items += 1
             article_id = article["id"]
             content = f"{article['ArticleTitle']} {article['IntroParagraph']} {article['BulletPointSummary']} {article['ConcludingParagraph']}"
-            # Call the LLM API to generate tags for the article
-            result = api_call_func(content, system_prompt)
-            # Process the generated tags and update the database
-            process_result = process_tags(article_id, result, status_entries)
+            # Copies the tags of the original when the summary was copied from a near-duplicate, otherwise calls the LLM API to generate tags
+            result = fetch_duplicate_tags(article)
+            if result is not None:
+                status_entries.append({"message": f"Tags copied from near-duplicate ID {article['duplicate_of']} to ID {article_id}, no LLM call made"})
+                process_result = process_tags(article_id, result, status_entries)
+            else:
+                # Generate the tags on the provider that has been doing best lately, falling back to the next one if needed, and update the database
+                routed, decision = route_providers('tagging', [(script_name, api_call_func)] + fallbacks)
+                (provider, call_func), *chain = routed
+                if provider != script_name:
+                    status_entries.append({"message": f"Article ID {article_id} routed to {provider} first ({decision})"})
+                process_result = tag_article(article_id, content, system_prompt, status_entries, call_func, provider, chain)
             # Check if the processing was successful and update the failed items count accordingly
             if not process_result.get("message").startswith("Tags generated and updated successfully"):
                 failed_items += 1
+        # Logs the run's LLM statistics and saves the provider averages for the next run.
+        log_llm_run_stats(status_entries)
     else:
         status_entries.append({"message": "No articles to tag"})
 
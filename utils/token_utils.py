@@ -0,0 +1,69 @@
+# utils/token_utils.py
+# This module estimates how many tokens a text will use and splits long texts into chunks that fit a token budget.
+
+import re
+import math
+from config.config_loader import load_config
+
+config = load_config()
+map_reduce_config = config.get('summarization', {}).get('map_reduce', {})
+
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text, chars_per_token=None):
+    """
+    Estimate the tokens a text will use. English prose averages about four characters per token across the providers we use.
+
+    Args:
+        text (str): The text.
+        chars_per_token (float, optional): Characters per token. Defaults to summarization.map_reduce.chars_per_token.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    chars_per_token = chars_per_token or map_reduce_config.get('chars_per_token', 4)
+    return math.ceil(len(text or "") / chars_per_token)
+
+def split_pieces(text, max_chars):
+    """
+    Split text into pieces no longer than max_chars: paragraphs, then sentences of paragraphs that are too long,
+    then fixed-size slices of sentences that are still too long.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in SENTENCE_END_PATTERN.split(paragraph):
+            pieces.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+    return pieces
+
+def split_into_chunks(text, chunk_tokens, chars_per_token=None):
+    """
+    Split a text into chunks of at most chunk_tokens (estimated), breaking between paragraphs where possible
+    and between sentences otherwise, so each chunk reads as a continuous part of the article.
+
+    Args:
+        text (str): The text.
+        chunk_tokens (int): The most tokens a chunk may use.
+        chars_per_token (float, optional): Characters per token. Defaults to summarization.map_reduce.chars_per_token.
+
+    Returns:
+        list: The chunks, in order.
+    """
+    chars_per_token = chars_per_token or map_reduce_config.get('chars_per_token', 4)
+    max_chars = max(int(chunk_tokens * chars_per_token), 1)
+    chunks, current, current_chars = [], [], 0
+    for piece in split_pieces(text, max_chars):
+        # Pieces are joined by a blank line, which counts towards the chunk's length.
+        if current and current_chars + 2 + len(piece) > max_chars:
+            chunks.append("\n\n".join(current))
+            current, current_chars = [], 0
+        current_chars += len(piece) + (2 if current else 0)
+        current.append(piece)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
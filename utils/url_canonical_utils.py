@@ -0,0 +1,129 @@
+# utils/url_canonical_utils.py
+# This module turns article URLs into a canonical form and a short hash key, so the same article reached through different URLs is stored once.
+
+import hashlib
+from fnmatch import fnmatch
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from config.config_loader import load_config
+
+config = load_config()
+canonical_config = config.get('url_canonicalization', {})
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def get_domain_rules(host, rules=None):
+    """
+    Find the per-domain rules for a host. A rule for "example.com" also applies to its subdomains.
+
+    Args:
+        host (str): The lowercased host name of the URL.
+        rules (dict, optional): The canonicalization settings. Defaults to url_canonicalization from config.yaml.
+
+    Returns:
+        dict: The matching domain rules, or an empty dictionary if none apply.
+    """
+    rules = canonical_config if rules is None else rules
+    domain_rules = rules.get('domain_rules') or {}
+    # The longest matching domain wins, so a rule for news.example.com beats one for example.com.
+    for domain in sorted(domain_rules, key=len, reverse=True):
+        if host == domain or host.endswith("." + domain):
+            return domain_rules[domain] or {}
+    return {}
+
+def canonicalize_url(url, rules=None):
+    """
+    Return the canonical form of a URL.
+
+    Args:
+        url (str): The URL to canonicalize.
+        rules (dict, optional): The canonicalization settings. Defaults to url_canonicalization from config.yaml.
+
+    Returns:
+        str: The canonical URL.
+    """
+    rules = canonical_config if rules is None else rules
+    url = url.strip()
+    if not rules.get('enabled', True):
+        return url
+
+    parts = urlsplit(url)
+    try:
+        port = parts.port
+    except ValueError:
+        # A malformed port (not a number, or out of range) can't be normalized, so the URL is kept as it is.
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    domain_rules = get_domain_rules(host, rules)
+
+    if scheme == "http" and domain_rules.get('force_https', rules.get('force_https', True)):
+        scheme = "https"
+    if host.startswith("www.") and domain_rules.get('strip_www', rules.get('strip_www', True)):
+        host = host[len("www."):]
+
+    netloc = host
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+
+    path = parts.path or "/"
+    if path != "/" and path.endswith("/") and domain_rules.get('strip_trailing_slash', rules.get('strip_trailing_slash', True)):
+        path = path.rstrip("/") or "/"
+
+    # Drops tracking parameters, or keeps only the listed ones for domains that set keep_params, then sorts what is left.
+    query = ""
+    if not domain_rules.get('drop_query', False):
+        strip_params = list(rules.get('strip_params') or []) + list(domain_rules.get('strip_params') or [])
+        keep_params = domain_rules.get('keep_params')
+        params = []
+        for key, value in parse_qsl(parts.query, keep_blank_values=True):
+            if keep_params is not None:
+                if key in keep_params:
+                    params.append((key, value))
+            elif not any(fnmatch(key.lower(), pattern) for pattern in strip_params):
+                params.append((key, value))
+        query = urlencode(sorted(params))
+
+    fragment = parts.fragment if domain_rules.get('keep_fragment', False) else ""
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+def url_key(canonical_url):
+    """
+    Return a compact, fixed-length key for a canonical URL.
+
+    Args:
+        canonical_url (str): A URL already passed through canonicalize_url.
+
+    Returns:
+        str: A 16 character hexadecimal hash of the URL.
+    """
+    return hashlib.blake2b(canonical_url.encode("utf-8"), digest_size=8).hexdigest()
+
+def canonical_url_key(url, rules=None):
+    """
+    Canonicalize a URL and return its key in one step.
+
+    Args:
+        url (str): The URL to canonicalize.
+        rules (dict, optional): The canonicalization settings. Defaults to url_canonicalization from config.yaml.
+
+    Returns:
+        str: The key of the canonical URL.
+    """
+    return url_key(canonicalize_url(url, rules))
+
+def canonicalize_entries(entries, rules=None):
+    """
+    Add 'canonical_url' and 'url_key' to each feed entry. The original 'url' is kept as the address to scrape.
+
+    Args:
+        entries (list): Feed entries, each with a 'url' key.
+        rules (dict, optional): The canonicalization settings. Defaults to url_canonicalization from config.yaml.
+
+    Returns:
+        list: The entries with canonical_url and url_key added.
+    """
+    canonical_entries = []
+    for entry in entries:
+        canonical_url = canonicalize_url(entry['url'], rules)
+        canonical_entries.append({**entry, 'url': entry['url'].strip(), 'canonical_url': canonical_url, 'url_key': url_key(canonical_url)})
+    return canonical_entries
@@ -1,65 +1,101 @@
 # utils/url_fetch_utils.py
 # This file provides utility functions for fetching and handling URLs, specifically for processing RSS feeds (Or other sources which may be added later) and updating a database with new entries. It includes functions for fetching existing URLs from a database, deduplicating new URLs, inserting new entries, and processing feeds with logging and error handling.
 
+import asyncio
+import time
+import httpx
 from utils.logging_utils import log_status, log_duration
 from datetime import datetime, timezone
 from utils.db_utils import get_supabase_client, fetch_table_data, update_table_data
+from utils.feed_state_utils import load_feed_states, save_feed_states, advance_watermark, watermark_config
+from utils.seen_url_utils import SeenUrlIndex
+from utils.url_canonical_utils import canonicalize_entries
+from utils.feed_schedule_utils import is_feed_due, schedule_next_poll
+from utils.feed_health_utils import load_feed_health, save_feed_health, is_feed_in_backoff, record_feed_result, feed_health_report
 from config.config_loader import load_config
 
 config = load_config()
 table_names = config.get('tables', {})
+feed_polling_config = config.get('feed_polling', {})
+url_insertion_config = config.get('url_insertion', {})
 
 # Initialize Supabase client using environment variables
 supabase = get_supabase_client()
 
-def fetch_existing_urls(batch_size=1000):
+def deduplicate_urls(new_urls, existing_urls):
     """
-    Fetch existing URLs from the specified table in batches.
+    Remove URLs whose canonical key already exists in the existing keys, along with repeats within new_urls.
+    Two URLs that only differ by tracking parameters, fragments and similar noise share a key, so only the first is kept.
     
     Args:
-        batch_size (int): The number of records to fetch per batch.
+        new_urls (list): List of new URL entries to be checked.
+        existing_urls (set or SeenUrlIndex): Set of existing URL keys, or the local seen URL index.
     
     Returns:
-        set: A set of existing URLs.
+        list: A list of deduplicated URL entries, each with 'canonical_url' and 'url_key' set.
     """
-    existing_urls = set()
-    existing_urls_response = supabase.table(table_names['summarizer_flow']).select("url").order("created_at", desc=True).limit(batch_size).execute()
-    if existing_urls_response.data:
-        existing_urls = {item['url'].strip() for item in existing_urls_response.data}
+    new_urls_cleaned = canonicalize_entries(new_urls)  # Ensure URLs are trimmed and carry their canonical key
+    deduplicated_urls = []
+    batch_keys = set()
+    for url in new_urls_cleaned:
+        if url['url_key'] not in existing_urls and url['url_key'] not in batch_keys:
+            batch_keys.add(url['url_key'])
+            deduplicated_urls.append(url)
     
-    return existing_urls
+    return deduplicated_urls   
 
-def deduplicate_urls(new_urls, existing_urls):
+def entry_row(entry):
     """
-    Remove URLs that already exist in the existing URLs set.
+    Return the database columns of a feed entry. Keys starting with an underscore (such as '_published')
+    carry feed metadata for fetch_urls itself and are not written to the table.
     
     Args:
-        new_urls (list): List of new URLs to be checked.
-        existing_urls (set): Set of existing URLs.
+        entry (dict): A feed entry.
     
     Returns:
-        list: A list of deduplicated URLs.
+        dict: The entry without its metadata keys.
+    """
+    return {key: value for key, value in entry.items() if not key.startswith('_')}
+
+def insert_new_entries(table_name, new_entries, log_entries, failed_entries=None):
     """
-    new_urls_cleaned = [{**url, 'url': url['url'].strip()} for url in new_urls]  # Ensure URLs are trimmed
-    deduplicated_urls = [url for url in new_urls_cleaned if url['url'] not in existing_urls]
+    Insert new entries into the specified table, in chunks that skip duplicate url_keys (url_insertion.bulk_upsert)
+    or one by one.
     
-    return deduplicated_urls   
+    Args:
+        table_name (str): The name of the table to insert entries into.
+        new_entries (list): List of new entries to be inserted.
+        log_entries (list): List to store log entries.
+        failed_entries (list, optional): List to store entries that could not be written because of an error.
+    
+    Returns:
+        list: The rows that were actually inserted, as returned by Supabase.
+    """
+    if failed_entries is None:
+        failed_entries = []
+    if url_insertion_config.get('bulk_upsert', True):
+        return bulk_upsert_entries(table_name, new_entries, log_entries, failed_entries)
+    return insert_entries_individually(table_name, new_entries, log_entries, failed_entries)
 
-def insert_new_entries(table_name, new_entries, log_entries):
+def insert_entries_individually(table_name, new_entries, log_entries, failed_entries):
     """
-    Insert new entries into the specified table one by one.
+    Insert entries one request at a time, treating unique constraint violations as duplicates.
     
     Args:
         table_name (str): The name of the table to insert entries into.
         new_entries (list): List of new entries to be inserted.
         log_entries (list): List to store log entries.
+        failed_entries (list): List to store entries that could not be written because of an error.
+    
+    Returns:
+        list: The rows that were actually inserted.
     """
-    inserted_count = 0
+    inserted_rows = []
     for entry in new_entries:
         try:
-            insert_response = supabase.table(table_name).insert(entry).execute()
+            insert_response = supabase.table(table_name).insert(entry_row(entry)).execute()
             if insert_response.data:  # Check if data was actually inserted
-                inserted_count += 1
+                inserted_rows.extend(insert_response.data)
                 log_entries.append(f"Data inserted successfully for {entry['url']}.")
             else:
                 log_entries.append(f"No data inserted for {entry['url']}. Response: {insert_response}")
@@ -67,23 +103,129 @@ def insert_new_entries(table_name, new_entries, log_entries):
             if "duplicate key value violates unique constraint" in str(e):
                 log_entries.append(f"Duplicate URL rejected by Supabase: {entry['url']}. Skipping insertion.")
             else:
+                failed_entries.append(entry)
                 log_entries.append(f"Error inserting data for {entry['url']}: {str(e)}")
-    return inserted_count
+    return inserted_rows
 
-# Processes RSS feeds by fetching enabled feeds from the database, parsing them, deduplicating new entries, and inserting them into the specified table. Logs the process and returns the total count of new URLs added.
+def bulk_upsert_entries(table_name, new_entries, log_entries, failed_entries):
+    """
+    Insert entries in chunks of url_insertion.batch_size, ignoring conflicts on url_key. A rejected chunk is retried one entry at a time.
+    
+    Args:
+        table_name (str): The name of the table to insert entries into.
+        new_entries (list): List of new entries to be inserted.
+        log_entries (list): List to store log entries.
+        failed_entries (list): List to store entries from chunks that failed.
+    
+    Returns:
+        list: The rows that were actually inserted.
+    """
+    batch_size = url_insertion_config.get('batch_size', 100)
+    inserted_rows = []
+    for i in range(0, len(new_entries), batch_size):
+        chunk = new_entries[i:i + batch_size]
+        try:
+            upsert_response = supabase.table(table_name).upsert([entry_row(entry) for entry in chunk], on_conflict="url_key", ignore_duplicates=True).execute()
+        except Exception as e:
+            log_entries.append(f"Error inserting batch of {len(chunk)} entries, retrying one by one: {str(e)}")
+            inserted_rows.extend(insert_entries_individually(table_name, chunk, log_entries, failed_entries))
+            continue
+
+        chunk_rows = upsert_response.data or []
+        inserted_rows.extend(chunk_rows)
+        for row in chunk_rows:
+            log_entries.append(f"Data inserted successfully for {row['url']}.")
+        skipped = len(chunk) - len(chunk_rows)
+        if skipped:
+            log_entries.append(f"{skipped} duplicate URLs skipped by Supabase in batch of {len(chunk)}.")
+    return inserted_rows
+
+async def fetch_feed(client, semaphore, feed_url, feed_state, conditional_get=True):
+    """
+    Download a single feed, sending the stored ETag/Last-Modified validators so an unchanged feed answers with a 304.
+    
+    Args:
+        client (httpx.AsyncClient): The shared HTTP client used for all feeds.
+        semaphore (asyncio.Semaphore): Limits how many feeds are downloaded at once.
+        feed_url (str): The URL of the feed to download.
+        feed_state (dict): The stored state for this feed, holding 'etag' and 'last_modified' if known.
+        conditional_get (bool): Whether to send the stored validators.
+    
+    Returns:
+        dict: The feed URL, a status of "ok", "not_modified" or "error", the body (for "ok"), any new validators,
+              the error message (for "error") and the time taken in seconds.
+    """
+    headers = {}
+    if conditional_get:
+        if feed_state.get('etag'):
+            headers['If-None-Match'] = feed_state['etag']
+        if feed_state.get('last_modified'):
+            headers['If-Modified-Since'] = feed_state['last_modified']
+
+    async with semaphore:
+        start = time.monotonic()
+        try:
+            response = await client.get(feed_url, headers=headers)
+        except Exception as e:
+            return {"feed_url": feed_url, "status": "error", "error": str(e), "elapsed": time.monotonic() - start}
+        elapsed = time.monotonic() - start
+
+    if response.status_code == 304:
+        return {"feed_url": feed_url, "status": "not_modified", "elapsed": elapsed}
+    if response.status_code >= 400:
+        return {"feed_url": feed_url, "status": "error", "error": f"HTTP {response.status_code}", "elapsed": elapsed}
+
+    return {
+        "feed_url": feed_url,
+        "status": "ok",
+        "body": response.content,
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified'),
+        "elapsed": elapsed
+    }
+
+async def poll_feeds(feed_urls, feed_states):
+    """
+    Download all feeds concurrently, with at most feed_polling.concurrency downloads in flight.
+    The whole poll takes roughly as long as the slowest feed rather than the sum of all of them.
+    
+    Args:
+        feed_urls (list): The feed URLs to download.
+        feed_states (dict): Stored state for each feed URL, as returned by load_feed_states.
+    
+    Returns:
+        list: One result dictionary per feed (see fetch_feed), in the same order as feed_urls.
+    """
+    concurrency = feed_polling_config.get('concurrency', 20)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(
+        timeout=feed_polling_config.get('timeout_seconds', 15),
+        follow_redirects=True,
+        headers={"User-Agent": feed_polling_config.get('user_agent', 'article-summarizer')},
+        limits=httpx.Limits(max_connections=concurrency)
+    ) as client:
+        return await asyncio.gather(*(
+            fetch_feed(client, semaphore, feed_url, feed_states.get(feed_url, {}), feed_polling_config.get('conditional_get', True))
+            for feed_url in feed_urls
+        ))
+
+# Processes RSS feeds by fetching enabled feeds from the database, downloading them concurrently, parsing them, deduplicating new entries, and inserting them into the specified table. Logs the process, including per-feed timings, and returns the total count of new URLs added.
 def process_feeds(table_name="summarizer_flow", parse_feed=None, script_name="script", app=None):
     # Records the start time for the feed processing.
     start_time = datetime.now(timezone.utc)
-    # Initializes the log entries list and counters for total items, failed items, and new URLs.
+    # Initializes the log entries list and counters for total items, failed feeds, and new URLs.
     log_entries = []
+    feed_timings = []
     total_items = 0
-    failed_items = 0
+    failed_feeds = 0
     total_new_urls = 0
 
     # Checks if the parse_feed function is provided, raising an error if not.
     if parse_feed is None:
         raise ValueError("A parse_feed function must be provided")
 
+    seen_urls = None
+
     # Tries to fetch the RSS feed URLs from the database.
     try:
         rss_feeds_response = fetch_table_data("rss_feed_list", {"isEnabled": 'TRUE'})
@@ -95,34 +237,127 @@ def process_feeds(table_name="summarizer_flow", parse_feed=None, script_name="sc
             log_duration(script_name, start_time, datetime.now(timezone.utc))
             return 0
 
-        # Iterates over each feed in the response.
-        for feed in rss_feeds_response:
-            feed_url = feed['rss_feed']
-            new_entries = parse_feed(feed_url)
-            # Parses the feed URL to get new entries and updates the total item count.
+        # Loads the local seen URL index once and pulls in any rows added since the last run.
+        seen_urls = SeenUrlIndex()
+        synced_rows = seen_urls.sync(supabase, table_names.get(table_name, table_name))
+        log_entries.append(f"Seen URL index synced {synced_rows} rows, {len(seen_urls)} URLs known.")
+
+        # Loads feed health in one request. Health tracking is best effort, so a failure here doesn't stop the fetch.
+        try:
+            feed_health = load_feed_health()
+        except Exception as e:
+            feed_health = None
+            log_entries.append(f"Could not load feed health, circuit breaker disabled for this run: {e}")
+
+        # Only polls the feeds whose next poll time has come and that aren't backed off after repeated failures,
+        # then downloads them concurrently using the stored validators for conditional requests.
+        all_feed_urls = [feed['rss_feed'] for feed in rss_feeds_response]
+        feed_states = load_feed_states(all_feed_urls)
+        poll_time = time.time()
+        health_time = datetime.now(timezone.utc)
+        due_feed_urls = [feed_url for feed_url in all_feed_urls if is_feed_due(feed_states[feed_url], poll_time)]
+        feed_urls = [feed_url for feed_url in due_feed_urls if not is_feed_in_backoff((feed_health or {}).get(feed_url), health_time)]
+        log_entries.append(
+            f"{len(due_feed_urls)} of {len(all_feed_urls)} feeds due for polling, "
+            f"{len(due_feed_urls) - len(feed_urls)} skipped while backed off after repeated failures."
+        )
+        poll_start = time.monotonic()
+        poll_results = asyncio.run(poll_feeds(feed_urls, feed_states))
+        poll_elapsed = time.monotonic() - poll_start
+        state_updates = {}
+        health_updates = {}
+
+        # Iterates over each downloaded feed.
+        for result in poll_results:
+            feed_url = result['feed_url']
+            feed_timings.append({"feed": feed_url, "status": result['status'], "seconds": round(result['elapsed'], 3)})
+            previous_health = (feed_health or {}).get(feed_url)
+
+            if result['status'] == "error":
+                failed_feeds += 1
+                log_entries.append(f"Error fetching feed {feed_url}: {result['error']}")
+                health_updates[feed_url] = record_feed_result(feed_url, previous_health, False, result['elapsed'], result['error'], health_time)
+                continue
+            # A 304 means nothing changed since the last poll, so parsing is skipped entirely and the feed is polled less often.
+            if result['status'] == "not_modified":
+                log_entries.append(f"Feed not modified since last poll: {feed_url}.")
+                state_updates[feed_url] = schedule_next_poll(feed_states[feed_url], [], 0, poll_time)
+                health_updates[feed_url] = record_feed_result(feed_url, previous_health, True, result['elapsed'], now=health_time)
+                continue
+
+            # Passes the feed's watermark so parsing only returns entries newer than the last poll.
+            watermark = feed_states[feed_url].get('watermark') if watermark_config.get('enabled', True) else None
+            try:
+                new_entries = parse_feed(result['body'], watermark)
+            except Exception as e:
+                failed_feeds += 1
+                log_entries.append(f"Error parsing feed {feed_url}: {e}")
+                health_updates[feed_url] = record_feed_result(feed_url, previous_health, False, result['elapsed'], f"Parse error: {e}", health_time)
+                continue
+            health_updates[feed_url] = record_feed_result(feed_url, previous_health, True, result['elapsed'], now=health_time)
+            # Parses the feed body to get new entries and updates the total item count.
             total_items += len(new_entries)
-            # Fetches existing URLs and deduplicates the new entries.
-            existing_urls = fetch_existing_urls()
-            deduplicated_entries = deduplicate_urls(new_entries, existing_urls)
+            # Canonicalizes the new entries and deduplicates them by key against the local seen URL index, with no database round trip.
+            deduplicated_entries = deduplicate_urls(new_entries, seen_urls)
 
             # Inserts the deduplicated entries into the database.
             if deduplicated_entries:
-                new_url_count = insert_new_entries(table_name, deduplicated_entries, log_entries)
-                total_new_urls += new_url_count
-                # Log "New entry added" ONLY if insertion was successful:
-                for entry in deduplicated_entries:
-                    if any(f"Data inserted successfully for {entry['url']}" in log for log in log_entries):
-                        log_entries.append(f"New entry added: {entry['url']}") 
+                failed_entries = []
+                inserted_rows = insert_new_entries(table_name, deduplicated_entries, log_entries, failed_entries)
+                total_new_urls += len(inserted_rows)
+                for row in inserted_rows:
+                    if row.get('scraped'):
+                        log_entries.append(f"New entry added with its full text from the feed, no scrape needed: {row['url']}")
+                    else:
+                        log_entries.append(f"New entry added: {row['url']}")
+                # Inserted and duplicate-skipped URLs are both in the database now, so neither needs checking again.
+                failed_urls = {entry['url'] for entry in failed_entries}
+                seen_urls.add(entry['url_key'] for entry in deduplicated_entries if entry['url'] not in failed_urls)
+                # Entries that could not be written must be seen again next run, so the feed's validators are not stored.
+                if failed_entries:
+                    continue
             else:
                 log_entries.append(f"No new URLs to add for {feed_url}.")
 
-        # Logs the overall status based on the count of failed items.
-        if failed_items == 0:
-            log_status(script_name, {"messages": log_entries}, "Success")
-        elif failed_items > 0 and failed_items < total_items:
-            log_status(script_name, {"messages": log_entries}, "Partial")
+            # Only keeps the new validators and schedule once the feed has been processed, so a failed run downloads it again on the next tick.
+            # The previous watermark's timestamp is included so a poll with a single new entry still gives a publish gap.
+            entry_timestamps = [entry['_published'] for entry in new_entries if entry.get('_published')]
+            if watermark and watermark.get('published'):
+                entry_timestamps.append(watermark['published'])
+            state_updates[feed_url] = {
+                "etag": result['etag'],
+                "last_modified": result['last_modified'],
+                "watermark": advance_watermark(watermark, new_entries),
+                **schedule_next_poll(feed_states[feed_url], entry_timestamps, len(deduplicated_entries), poll_time)
+            }
+
+        # Stores the new validators so the next poll can send conditional requests.
+        save_feed_states(state_updates)
+
+        # Writes the feed health back in one upsert and reports the feeds dragging the cycle down.
+        health_report = None
+        if feed_health is not None:
+            try:
+                save_feed_health(list(health_updates.values()))
+                health_report = feed_health_report({**feed_health, **health_updates}.values())
+            except Exception as e:
+                log_entries.append(f"Could not save feed health: {e}")
+
+        # Reports the slowest feeds, which now decide how long the polling step takes.
+        feed_timings.sort(key=lambda timing: timing['seconds'], reverse=True)
+        log_entries.append(
+            f"Polled {len(feed_urls)} feeds in {poll_elapsed:.2f}s "
+            f"(sum of per-feed times {sum(timing['seconds'] for timing in feed_timings):.2f}s)."
+        )
+
+        # Logs the overall status based on the count of failed feeds.
+        log_details = {"messages": log_entries, "feed_timings": feed_timings, "feed_health_report": health_report}
+        if failed_feeds == 0:
+            log_status(script_name, log_details, "Success")
+        elif failed_feeds < len(feed_urls):
+            log_status(script_name, log_details, "Partial")
         else:
-            log_status(script_name, {"messages": log_entries}, "Error")
+            log_status(script_name, log_details, "Error")
 
         # Logs the duration of the feed processing.
         log_duration(script_name, start_time, datetime.now(timezone.utc))
@@ -134,3 +369,7 @@ def process_feeds(table_name="summarizer_flow", parse_feed=None, script_name="sc
         log_status(script_name, {"messages": log_entries}, "Error")
         log_duration(script_name, start_time, datetime.now(timezone.utc))
         return 0
+
+    finally:
+        if seen_urls is not None:
+            seen_urls.close()